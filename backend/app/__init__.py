@@ -1,24 +1,79 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_migrate import Migrate
 from flask_cors import CORS
 from .config import Config
 
+
+class RoutingSession(Session):
+    """
+    Сессия, которая отправляет операторы читающих запросов на реплику,
+    выбранную для запроса (app/replicas.py); остальное идёт на основную базу.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            from .replicas import replicas
+            replica = replicas.current()
+            if replica is not None:
+                return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
 # Initialize SQLAlchemy instance
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+
+    from .encoding import FastJSONProvider
+    app.json = FastJSONProvider(app)
     
+    # Метрики и класс пула настраиваются до создания движка
+    from .metrics import metrics
+    metrics.init_app(app)
+
+    from .pool import pool_monitor
+    pool_monitor.init_app(app)
+
+    from .replicas import replicas
+    replicas.init_app(app)
+
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
     CORS(app)
+
+    from .cache import cache
+    cache.init_app(app)
+
+    from .compression import compression
+    compression.init_app(app)
+
+    from .queries import queries
+    queries.init_app(app)
+
+    from .book_ids import book_ids
+    book_ids.init_app(app)
+
+    from .report_cache import report_cache
+    report_cache.init_app(app)
+
+    from .rollup import rollup
+    rollup.init_app(app)
+
+    from .report_jobs import report_jobs
+    report_jobs.init_app(app)
     
     # Import and register blueprints
     from .routes import routes
     app.register_blueprint(routes.bp)
+
+    from .commands import availability_cli, rollup_cli
+    app.cli.add_command(availability_cli)
+    app.cli.add_command(rollup_cli)
     
     return app
\ No newline at end of file
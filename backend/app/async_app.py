@@ -0,0 +1,25 @@
+from quart import Quart
+from quart_cors import cors
+
+from .config import Config
+
+
+def create_async_app():
+    """
+    Асинхронное приложение (Quart, ASGI) для читающих маршрутов: отчёты,
+    справочники и поиск. Запросы к базе идут через пул asyncpg
+    (app/async_db.py), поэтому медленный отчёт не занимает поток, и один
+    процесс обслуживает много одновременных клиентов. Изменяющие маршруты
+    остаются в синхронном приложении (create_app).
+    """
+    app = Quart(__name__)
+    app.config.from_object(Config)
+    app = cors(app)
+
+    from .async_db import async_db
+    async_db.init_app(app)
+
+    from . import async_routes
+    app.register_blueprint(async_routes.bp)
+
+    return app
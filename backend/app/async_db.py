@@ -0,0 +1,102 @@
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from .queries import to_positional
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+
+def encode_date(value):
+    # Даты из JSON фильтров приходят строками, как и в psycopg2
+    return value if isinstance(value, str) else value.isoformat()
+
+
+async def init_connection(connection):
+    # Типы результатов как у psycopg2: json - объекты Python, date - datetime.date
+    await connection.set_type_codec(
+        'json', encoder=json.dumps, decoder=json.loads, schema='pg_catalog'
+    )
+    await connection.set_type_codec(
+        'date', encoder=encode_date, decoder=date.fromisoformat, schema='pg_catalog', format='text'
+    )
+
+
+class AsyncDatabase:
+    """
+    Пул соединений asyncpg для асинхронного приложения (app/async_app.py),
+    отдельный от пула Flask-SQLAlchemy. Пул создаётся при запуске сервера
+    и закрывается при остановке. Запросы пишутся так же, как для
+    синхронного приложения (:name), и переводятся в позиционную форму;
+    asyncpg сам подготавливает их и кэширует операторы на соединении
+    (за PgBouncer кэш отключается, как и QUERY_PREPARE).
+    """
+
+    def __init__(self):
+        self.pool = None
+        self.config = None
+        self._positional = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if asyncpg is None:
+            raise RuntimeError('Для асинхронного приложения требуется asyncpg')
+        self.config = app.config
+        app.before_serving(self.connect)
+        app.after_serving(self.close)
+
+    async def connect(self):
+        config = self.config
+        # URL SQLAlchemy может содержать драйвер (postgresql+psycopg2://)
+        dsn = config['SQLALCHEMY_DATABASE_URI'].replace('+psycopg2', '', 1)
+        self.pool = await asyncpg.create_pool(
+            dsn,
+            min_size=config['ASYNC_DB_POOL_MIN_SIZE'],
+            max_size=config['ASYNC_DB_POOL_MAX_SIZE'],
+            max_inactive_connection_lifetime=config['DB_POOL_RECYCLE'],
+            statement_cache_size=0 if config['DB_PGBOUNCER'] else 1024,
+            init=init_connection
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    def positional(self, sql):
+        with self._lock:
+            compiled = self._positional.get(sql)
+            if compiled is not None:
+                self._positional.move_to_end(sql)
+                return compiled
+        compiled = to_positional(sql)
+        with self._lock:
+            self._positional[sql] = compiled
+            while len(self._positional) > self.config['QUERY_VARIANT_LIMIT']:
+                self._positional.popitem(last=False)
+        return compiled
+
+    async def fetch(self, sql, params=None):
+        """Строки результата (asyncpg.Record, доступ по имени колонки)."""
+        positional, names = self.positional(sql)
+        values = [(params or {})[name] for name in names]
+        async with self.pool.acquire() as connection:
+            return await connection.fetch(positional, *values)
+
+    def stats(self):
+        if self.pool is None:
+            return {'connected': False}
+        return {
+            'connected': True,
+            'size': self.pool.get_size(),
+            'idle': self.pool.get_idle_size(),
+            'min_size': self.pool.get_min_size(),
+            'max_size': self.pool.get_max_size()
+        }
+
+
+async_db = AsyncDatabase()
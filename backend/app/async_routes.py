@@ -0,0 +1,99 @@
+import asyncio
+
+from quart import Blueprint, current_app, jsonify, request
+
+from .async_db import async_db
+from .lookup import LOOKUPS
+from .reports import REPORTS
+from .search import parse_autocomplete, parse_search, search_page, search_query, suggestions
+
+bp = Blueprint('async', __name__)
+
+
+async def run_search(text, types, scopes, limit, offset):
+    prepared = search_query(text, types, scopes, limit, offset)
+    if prepared is None:
+        return []
+    query, params = prepared
+    return [dict(row) for row in await async_db.fetch(query.sql, params)]
+
+
+async def run_report(name, filters):
+    report = REPORTS[name]
+    sql, params = report.sql(filters)
+    return report.collect(await async_db.fetch(sql, params))
+
+
+@bp.route('/report/<name>', methods=['POST'])
+async def report(name):
+    if name not in REPORTS:
+        return jsonify({'error': f'Отчёт {name} не найден'}), 404
+    try:
+        return jsonify(await run_report(name, await request.get_json()))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception(f'Ошибка отчёта {name}')
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/reports', methods=['POST'])
+async def reports():
+    """
+    Несколько отчётов одним запросом: {"имя отчёта": фильтры, ...}.
+    Запросы отчётов выполняются параллельно на разных соединениях пула.
+    """
+    requested = await request.get_json() or {}
+    unknown = [name for name in requested if name not in REPORTS]
+    if unknown:
+        return jsonify({'error': f'Отчёты не найдены: {", ".join(unknown)}'}), 404
+    try:
+        results = await asyncio.gather(*(run_report(name, filters) for name, filters in requested.items()))
+        return jsonify(dict(zip(requested, results)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.exception('Ошибка отчётов')
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/lookup/<entity>', methods=['GET'])
+async def lookup(entity):
+    lookup = LOOKUPS.get(entity)
+    if lookup is None:
+        return jsonify({'error': f'Справочник {entity} не найден'}), 404
+    params = {}
+    if lookup.parent is not None:
+        value = request.args.get(lookup.parent, type=int)
+        if value is None:
+            return jsonify({'error': f'Требуется целочисленный параметр {lookup.parent}'}), 400
+        params[lookup.parent] = value
+    try:
+        return jsonify([list(row) for row in await async_db.fetch(lookup.query.sql, params)])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/search', methods=['GET'])
+async def search():
+    try:
+        text, types, scopes, limit, offset = parse_search(request.args, current_app.config)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        hits = await run_search(text, types, scopes, limit + 1, offset)
+        return jsonify(search_page(hits, limit, offset))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/search/autocomplete/<entity>', methods=['GET'])
+async def search_autocomplete(entity):
+    try:
+        args = parse_autocomplete(entity, request.args, current_app.config)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        return jsonify(suggestions(entity, await run_search(*args)))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/health/pool', methods=['GET'])
+async def pool_health():
+    return jsonify(async_db.stats())
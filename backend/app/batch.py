@@ -0,0 +1,342 @@
+from flask import current_app, jsonify, request
+from sqlalchemy.exc import DBAPIError
+
+from . import db
+from .bulk import SQL_TYPES, error_message, is_foreign_key_violation
+from .cache import cache
+
+NOT_FOUND = 'Запись не найдена'
+
+
+class BatchTable:
+    """
+    Таблица, доступная для /batch: ключ строки и изменяемые колонки
+    (имя -> тип), условия, при которых удаление запрещено (над строкой t),
+    и таблицы, кэш которых сбрасывается после изменений.
+    """
+
+    def __init__(self, table, key, columns, guards=(), invalidates=()):
+        self.table = table
+        self.key = key
+        self.columns = columns
+        self.guards = list(guards)
+        self.invalidates = (table,) + tuple(invalidates)
+
+
+BATCH_TABLES = {
+    'books': BatchTable(
+        'books',
+        key={'library_id': 'integer', 'book_id': 'integer'},
+        columns={
+            'genre_id': 'integer',
+            'author': 'text',
+            'title': 'text',
+            'publisher': 'text',
+            'publication_place': 'text',
+            'publication_year': 'integer',
+            'quantity': 'integer'
+        },
+        guards=[(
+            '''EXISTS (
+                SELECT 1 FROM loans l
+                WHERE l.library_id = t.library_id
+                AND l.book_id = t.book_id
+                AND l.return_date IS NULL
+            )''',
+            'Невозможно удалить книгу с активными абонементами'
+        )],
+        # Абонементы и тематики удалённой книги удаляет delete_book_related_data_trigger
+        invalidates=('loans', 'book_topics')
+    ),
+    'readers': BatchTable(
+        'readers',
+        key={'reader_id': 'integer'},
+        columns={'full_name': 'text', 'address': 'text', 'phone': 'text'},
+        guards=[(
+            'EXISTS (SELECT 1 FROM loans l WHERE l.reader_id = t.reader_id AND l.return_date IS NULL)',
+            'Невозможно удалить читателя с активными абонементами'
+        )]
+    ),
+    'libraries': BatchTable(
+        'libraries',
+        key={'library_id': 'integer'},
+        columns={'name': 'text', 'address': 'text'},
+        guards=[(
+            'EXISTS (SELECT 1 FROM books b WHERE b.library_id = t.library_id)',
+            'Невозможно удалить библиотеку, содержащую книги'
+        )]
+    ),
+    'loans': BatchTable(
+        'loans',
+        key={'library_id': 'integer', 'book_id': 'integer', 'reader_id': 'integer', 'issue_date': 'date'},
+        columns={'due_date': 'date', 'return_date': 'date', 'deposit': 'numeric'}
+    ),
+    'book_topics': BatchTable(
+        'book_topics',
+        key={'library_id': 'integer', 'book_id': 'integer', 'topic_id': 'integer'},
+        columns={}
+    )
+}
+
+OPERATIONS = ('edit', 'add', 'delete')
+
+
+class Operation:
+    def __init__(self, index, op, spec, key, values):
+        self.index = index
+        self.op = op
+        self.spec = spec
+        self.key = key
+        self.values = values
+
+    @property
+    def group(self):
+        return (self.op, self.spec.table, tuple(self.values))
+
+    @property
+    def row(self):
+        return tuple(self.key[name] for name in self.spec.key)
+
+
+def parse_operations(payload):
+    if not isinstance(payload, dict) or not isinstance(payload.get('operations'), list):
+        raise ValueError('Ожидается объект с массивом operations')
+    items = payload['operations']
+    if len(items) > current_app.config['BATCH_MAX_OPERATIONS']:
+        raise ValueError(f'Не больше {current_app.config["BATCH_MAX_OPERATIONS"]} операций за запрос')
+
+    operations = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f'Операция {index}: ожидается объект')
+        op = item.get('op')
+        if op not in OPERATIONS:
+            raise ValueError(f'Операция {index}: неизвестный тип {op}')
+        spec = BATCH_TABLES.get(item.get('table'))
+        if spec is None:
+            raise ValueError(f'Операция {index}: таблица {item.get("table")} недоступна')
+
+        key = item.get('key') or {}
+        values = item.get('values') or {}
+        if op == 'add':
+            # Новая строка задаётся целиком в values; номер книги назначает счётчик
+            allowed = dict(spec.key, **spec.columns)
+            if spec.table == 'books':
+                allowed.pop('book_id')
+            key = {}
+        else:
+            allowed = spec.columns if op == 'edit' else {}
+            missing = [name for name in spec.key if key.get(name) is None]
+            if missing:
+                raise ValueError(f'Операция {index}: не указан ключ {", ".join(missing)}')
+            key = {name: key[name] for name in spec.key}
+
+        unknown = [name for name in values if name not in allowed]
+        if unknown:
+            raise ValueError(f'Операция {index}: недопустимые поля {", ".join(unknown)}')
+        if op == 'edit' and not values:
+            raise ValueError(f'Операция {index}: нет изменяемых полей')
+
+        operations.append(Operation(index, op, spec, key, dict(sorted(values.items()))))
+    return operations
+
+
+def group_operations(operations):
+    """
+    Подряд идущие однотипные операции (тип, таблица, набор полей)
+    объединяются в группу; повтор строки внутри группы начинает новую,
+    чтобы порядок изменений одной строки сохранялся.
+    """
+    groups = []
+    rows = set()
+    for operation in operations:
+        if operation.op != 'add' and groups and groups[-1][0].group == operation.group \
+                and operation.row not in rows:
+            groups[-1].append(operation)
+            rows.add(operation.row)
+        else:
+            groups.append([operation])
+            rows = {operation.row} if operation.op != 'add' else set()
+    return groups
+
+
+def values_clause(group, columns, params):
+    rows = []
+    for operation in group:
+        items = [f':i_{operation.index}']
+        params[f'i_{operation.index}'] = operation.index
+        for name, (source, sql_type) in columns.items():
+            param = f'{name}_{operation.index}'
+            params[param] = source(operation)[name]
+            items.append(f'CAST(:{param} AS {SQL_TYPES[sql_type]})')
+        rows.append(f'({", ".join(items)})')
+    names = ', '.join(['idx'] + list(columns))
+    return f'(VALUES {", ".join(rows)}) AS v({names})'
+
+
+def key_match(spec):
+    return ' AND '.join(f't.{name} = v.{name}' for name in spec.key)
+
+
+def run_edit(group):
+    spec = group[0].spec
+    params = {}
+    key = lambda operation: operation.key
+    values = lambda operation: operation.values
+    columns = {name: (key, sql_type) for name, sql_type in spec.key.items()}
+    columns.update({name: (values, spec.columns[name]) for name in group[0].values})
+
+    query = f'''
+        UPDATE {spec.table} t
+        SET {", ".join(f"{name} = v.{name}" for name in group[0].values)}
+        FROM {values_clause(group, columns, params)}
+        WHERE {key_match(spec)}
+        RETURNING v.idx
+    '''
+    updated = set(db.session.execute(query, params).scalars())
+    return {
+        operation.index: {'status': 'updated'} if operation.index in updated
+        else {'status': 'not_found', 'error': NOT_FOUND}
+        for operation in group
+    }
+
+
+def run_delete(group):
+    spec = group[0].spec
+    params = {}
+    key = lambda operation: operation.key
+    columns = {name: (key, sql_type) for name, sql_type in spec.key.items()}
+
+    guards = ' OR '.join(f'({condition})' for condition, _ in spec.guards) or 'FALSE'
+    # Строки блокируются до проверки, как в одиночных маршрутах удаления
+    query = f'''
+        WITH v AS (
+            SELECT * FROM {values_clause(group, columns, params)}
+        ),
+        target AS (
+            SELECT v.idx, {guards} AS blocked
+            FROM {spec.table} t
+            JOIN v ON {key_match(spec)}
+            FOR UPDATE OF t
+        ),
+        deleted AS (
+            DELETE FROM {spec.table} t
+            USING v, target
+            WHERE {key_match(spec)}
+            AND target.idx = v.idx
+            AND NOT target.blocked
+            RETURNING v.idx
+        )
+        SELECT
+            v.idx,
+            CASE
+                WHEN target.blocked THEN 'blocked'
+                WHEN deleted.idx IS NOT NULL THEN 'deleted'
+                ELSE 'not_found'
+            END AS status
+        FROM v
+        LEFT JOIN target ON target.idx = v.idx
+        LEFT JOIN deleted ON deleted.idx = v.idx
+    '''
+    results = {}
+    for row in db.session.execute(query, params):
+        results[row.idx] = {'status': row.status}
+        if row.status == 'not_found':
+            results[row.idx]['error'] = NOT_FOUND
+        elif row.status == 'blocked':
+            results[row.idx]['error'] = blocked_message(spec)
+    return results
+
+
+def blocked_message(spec):
+    return ' / '.join(message for _, message in spec.guards)
+
+
+def run_add(group):
+    results = {}
+    for operation in group:
+        spec = operation.spec
+        names = list(operation.values)
+        query = f'''
+            INSERT INTO {spec.table} ({", ".join(names)})
+            VALUES ({", ".join(f":{name}" for name in names)})
+            RETURNING {", ".join(spec.key)}
+        '''
+        row = db.session.execute(query, operation.values).fetchone()
+        results[operation.index] = {'status': 'added', 'key': dict(row)}
+    return results
+
+
+RUNNERS = {'edit': run_edit, 'add': run_add, 'delete': run_delete}
+
+
+def failure(operation, e):
+    # Ссылку, зафиксированную параллельно с проверкой, отклоняет внешний ключ:
+    # ответ тот же, что при сработавшей проверке (как в одиночных удалениях)
+    if operation.op == 'delete' and operation.spec.guards and is_foreign_key_violation(e):
+        return {'status': 'blocked', 'error': blocked_message(operation.spec)}
+    return {'status': 'error', 'error': error_message(e)}
+
+
+def run_group(group):
+    """
+    Группа выполняется одним оператором в точке сохранения. Если оператор
+    падает, группа повторяется по одной операции (каждая в своей точке
+    сохранения), чтобы найти виноватую.
+    """
+    runner = RUNNERS[group[0].op]
+    if len(group) > 1:
+        try:
+            with db.session.begin_nested():
+                return runner(group)
+        except DBAPIError:
+            pass
+
+    results = {}
+    for operation in group:
+        try:
+            with db.session.begin_nested():
+                results.update(runner([operation]))
+        except DBAPIError as e:
+            results[operation.index] = failure(operation, e)
+    return results
+
+
+def batch_response():
+    """
+    Набор операций edit/add/delete над несколькими таблицами в одной
+    транзакции. По умолчанию успешные операции фиксируются, а ошибки
+    возвращаются по номерам операций; при "atomic": true любая ошибка
+    откатывает весь набор.
+    """
+    # Тело не JSON (или другой Content-Type) - та же ошибка 400, что и для неверной структуры
+    payload = request.get_json(silent=True)
+    try:
+        operations = parse_operations(payload)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    atomic = bool(payload.get('atomic'))
+
+    results = {}
+    for group in group_operations(operations):
+        results.update(run_group(group))
+
+    ordered = [dict(results[operation.index], index=operation.index) for operation in operations]
+    failed = [result for result in ordered if result['status'] in ('error', 'not_found', 'blocked')]
+
+    if atomic and failed:
+        db.session.rollback()
+        return jsonify({'committed': False, 'results': ordered}), 400
+
+    db.session.commit()
+    applied = [
+        operation
+        for operation, result in zip(operations, ordered)
+        if result['status'] in ('updated', 'added', 'deleted')
+    ]
+    changed = {table for operation in applied for table in operation.spec.invalidates}
+    # Если каждая операция относится к известной библиотеке, сбрасываются только они
+    libraries = {operation.key.get('library_id', operation.values.get('library_id')) for operation in applied}
+    if changed:
+        cache.invalidate(*sorted(changed), libraries=None if None in libraries else libraries)
+    return jsonify({'committed': True, 'results': ordered})
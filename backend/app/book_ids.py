@@ -0,0 +1,53 @@
+import threading
+
+from sqlalchemy import text
+
+from . import db
+from .queries import queries
+
+ALLOCATE_BOOK_ID = queries.register('allocate_book_id', 'SELECT allocate_book_ids(:library_id, 1)')
+
+
+class BookIdAllocator:
+    """
+    Выдача номеров книг внутри библиотеки через счётчик book_id_counters
+    (schema/book_id_counters.sql).
+
+    При BOOK_ID_BLOCK_SIZE = 1 номер берётся в транзакции запроса: строка
+    счётчика заблокирована до фиксации, зато номера идут без пропусков.
+    При большем размере процесс резервирует блок номеров в отдельной
+    короткой транзакции и раздаёт его из памяти; конкурирующие воркеры
+    почти не ждут друг друга, а неиспользованный остаток блока при
+    перезапуске становится пропуском в нумерации.
+    """
+
+    def __init__(self):
+        self.block_size = 1
+        self._blocks = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.block_size = app.config['BOOK_ID_BLOCK_SIZE']
+
+    def allocate(self, library_id):
+        if self.block_size <= 1:
+            return ALLOCATE_BOOK_ID.execute({'library_id': library_id}).scalar()
+
+        with self._lock:
+            next_id, last_id = self._blocks.get(library_id, (1, 0))
+            if next_id > last_id:
+                next_id = self._reserve(library_id)
+                last_id = next_id + self.block_size - 1
+            self._blocks[library_id] = (next_id + 1, last_id)
+            return next_id
+
+    def _reserve(self, library_id):
+        # Отдельное соединение: блокировка счётчика снимается сразу после резервирования
+        with db.engine.begin() as connection:
+            return connection.execute(
+                text('SELECT allocate_book_ids(:library_id, :count)'),
+                {'library_id': library_id, 'count': self.block_size}
+            ).scalar()
+
+
+book_ids = BookIdAllocator()
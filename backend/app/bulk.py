@@ -0,0 +1,437 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from flask import current_app, jsonify, request
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from . import db
+from .cache import cache
+
+Column = namedtuple('Column', ['name', 'type', 'required'])
+Column.__new__.__defaults__ = (False,)
+
+SQL_TYPES = {'integer': 'INTEGER', 'text': 'TEXT', 'date': 'DATE', 'numeric': 'NUMERIC'}
+
+INTEGER_MIN, INTEGER_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+class BulkTable:
+    """
+    Описание таблицы для массовой загрузки: принимаемые колонки, ключ
+    дубликатов (SQL-выражения над staging-таблицей s), проверки вида
+    (условие ошибки, сообщение), выполняемые над всей загрузкой сразу,
+    и необязательный шаг prepare, выполняемый перед вставкой каждой пачки.
+    """
+
+    def __init__(self, table, columns, key, checks, prepare=None, extra=()):
+        self.table = table
+        self.columns = columns
+        self.key = key
+        self.checks = checks
+        self.prepare = prepare
+        # Колонки staging-таблицы, которые заполняются на сервере
+        self.extra = list(extra)
+
+    @property
+    def names(self):
+        return [column.name for column in self.columns]
+
+
+BULK_TABLES = {
+    'books': BulkTable(
+        'books',
+        columns=[
+            Column('library_id', 'integer', True),
+            Column('genre_id', 'integer', True),
+            Column('author', 'text', True),
+            Column('title', 'text', True),
+            Column('publisher', 'text'),
+            Column('publication_place', 'text'),
+            Column('publication_year', 'integer'),
+            Column('quantity', 'integer', True)
+        ],
+        key=['s.library_id', 's.title', 's.author', 's.publication_year'],
+        checks=[
+            ('NOT EXISTS (SELECT 1 FROM libraries l WHERE l.library_id = s.library_id)',
+             'Библиотека не найдена'),
+            ('NOT EXISTS (SELECT 1 FROM genres g WHERE g.genre_id = s.genre_id)',
+             'Жанр не найден'),
+            ('s.quantity < 0', 'Количество не может быть отрицательным'),
+            ('''EXISTS (
+                SELECT 1 FROM books b
+                WHERE b.library_id = s.library_id
+                AND b.title = s.title
+                AND b.author = s.author
+                AND b.publication_year IS NOT DISTINCT FROM s.publication_year
+            )''', 'Такая книга уже существует в этой библиотеке')
+        ],
+        # Номера книг резервируются блоком на библиотеку (schema/book_id_counters.sql)
+        # и раздаются подряд в порядке строк файла. allocate_book_ids вызывается
+        # в MATERIALIZED CTE: в подзапросе соединения планировщик мог бы
+        # пересчитать его повторно и зарезервировать блок дважды
+        prepare='''
+            WITH allocated AS MATERIALIZED (
+                SELECT library_id, allocate_book_ids(library_id, COUNT(*)::int) AS first_id
+                FROM bulk_staging
+                WHERE error IS NULL
+                AND row_no BETWEEN :first_row AND :last_row
+                GROUP BY library_id
+            ),
+            numbered AS (
+                SELECT
+                    row_no,
+                    library_id,
+                    ROW_NUMBER() OVER (PARTITION BY library_id ORDER BY row_no) AS position
+                FROM bulk_staging
+                WHERE error IS NULL
+                AND row_no BETWEEN :first_row AND :last_row
+            )
+            UPDATE bulk_staging s
+            SET book_id = a.first_id + n.position - 1
+            FROM numbered n
+            JOIN allocated a ON a.library_id = n.library_id
+            WHERE s.row_no = n.row_no
+        ''',
+        extra=[Column('book_id', 'integer')]
+    ),
+    'readers': BulkTable(
+        'readers',
+        columns=[
+            Column('full_name', 'text', True),
+            Column('address', 'text'),
+            Column('phone', 'text')
+        ],
+        key=['s.full_name', 's.address', 's.phone'],
+        checks=[
+            ('''EXISTS (
+                SELECT 1 FROM readers r
+                WHERE r.full_name = s.full_name
+                AND r.address IS NOT DISTINCT FROM s.address
+                AND r.phone IS NOT DISTINCT FROM s.phone
+            )''', 'Такой читатель уже существует')
+        ]
+    ),
+    'loans': BulkTable(
+        'loans',
+        columns=[
+            Column('library_id', 'integer', True),
+            Column('book_id', 'integer', True),
+            Column('reader_id', 'integer', True),
+            Column('issue_date', 'date'),
+            Column('due_date', 'date'),
+            Column('return_date', 'date'),
+            Column('deposit', 'numeric')
+        ],
+        key=['s.library_id', 's.book_id', 's.reader_id', 'COALESCE(s.issue_date, CURRENT_DATE)'],
+        checks=[
+            ('''NOT EXISTS (
+                SELECT 1 FROM books b
+                WHERE b.library_id = s.library_id AND b.book_id = s.book_id
+            )''', 'Книга не найдена'),
+            ('NOT EXISTS (SELECT 1 FROM readers r WHERE r.reader_id = s.reader_id)',
+             'Читатель не найден'),
+            ('s.return_date < COALESCE(s.issue_date, CURRENT_DATE)',
+             'Дата возврата не может быть раньше даты выдачи'),
+            ('''EXISTS (
+                SELECT 1 FROM loans l
+                WHERE l.library_id = s.library_id
+                AND l.book_id = s.book_id
+                AND l.reader_id = s.reader_id
+                AND l.issue_date = COALESCE(s.issue_date, CURRENT_DATE)
+            )''', 'Такой абонемент уже существует')
+        ]
+    )
+}
+
+
+def parse_value(column, raw):
+    if raw is None or (isinstance(raw, str) and not raw.strip()):
+        if column.required:
+            raise ValueError(f'Не заполнено поле {column.name}')
+        return None
+
+    if column.type == 'integer':
+        if isinstance(raw, bool) or not isinstance(raw, (int, str)):
+            raise ValueError(f'Поле {column.name}: ожидается целое число')
+        try:
+            value = int(raw)
+        except ValueError:
+            raise ValueError(f'Поле {column.name}: ожидается целое число')
+        if not INTEGER_MIN <= value <= INTEGER_MAX:
+            raise ValueError(f'Поле {column.name}: число вне допустимого диапазона')
+        return value
+
+    if column.type == 'date':
+        try:
+            return date.fromisoformat(str(raw).strip())
+        except ValueError:
+            raise ValueError(f'Поле {column.name}: ожидается дата в формате ГГГГ-ММ-ДД')
+
+    if column.type == 'numeric':
+        if isinstance(raw, bool):
+            raise ValueError(f'Поле {column.name}: ожидается число')
+        try:
+            value = Decimal(str(raw).strip())
+        except InvalidOperation:
+            raise ValueError(f'Поле {column.name}: ожидается число')
+        if not value.is_finite():
+            raise ValueError(f'Поле {column.name}: ожидается число')
+        return value
+
+    return str(raw)
+
+
+def parse_record(spec, record):
+    return [parse_value(column, record.get(column.name)) for column in spec.columns]
+
+
+def input_format(upload):
+    fmt = request.args.get('format')
+    if not fmt:
+        mimetype = upload.mimetype if upload else request.mimetype
+        filename = (upload.filename or '') if upload else ''
+        if mimetype in ('application/x-ndjson', 'application/jsonl') or filename.endswith(('.ndjson', '.jsonl')):
+            fmt = 'ndjson'
+        else:
+            fmt = 'csv'
+    if fmt not in ('csv', 'ndjson'):
+        raise ValueError(f'Неподдерживаемый формат: {fmt}')
+    return fmt
+
+
+def read_records(spec, stream, fmt, errors):
+    """
+    Строки загрузки как (номер строки, значения колонок). Заголовок CSV
+    проверяется сразу; строки с ошибками разбора попадают в errors и
+    пропускаются.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+
+    if fmt == 'ndjson':
+        return ndjson_records(spec, text, errors)
+
+    reader = csv.reader(text)
+    header = [name.strip() for name in next(reader, [])]
+    unknown = [name for name in header if name not in spec.names]
+    if unknown:
+        raise ValueError(f'Неизвестные колонки: {", ".join(unknown)}')
+    missing = [column.name for column in spec.columns if column.required and column.name not in header]
+    if missing:
+        raise ValueError(f'Нет обязательных колонок: {", ".join(missing)}')
+    return csv_records(spec, reader, header, errors)
+
+
+def csv_records(spec, reader, header, errors):
+    for row_no, values in enumerate(reader, start=1):
+        if not values:
+            continue
+        if len(values) != len(header):
+            errors.append({'row': row_no, 'error': f'Ожидается колонок: {len(header)}, получено: {len(values)}'})
+            continue
+        try:
+            yield row_no, parse_record(spec, dict(zip(header, values)))
+        except ValueError as e:
+            errors.append({'row': row_no, 'error': str(e)})
+
+
+def ndjson_records(spec, text, errors):
+    for row_no, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError('Строка должна быть JSON-объектом')
+            unknown = [name for name in record if name not in spec.names]
+            if unknown:
+                raise ValueError(f'Неизвестные поля: {", ".join(unknown)}')
+            yield row_no, parse_record(spec, record)
+        except ValueError as e:
+            errors.append({'row': row_no, 'error': str(e)})
+
+
+class CopySource:
+    """Файлоподобный объект для COPY FROM STDIN поверх генератора строк."""
+
+    def __init__(self, lines):
+        self._lines = lines
+        self._buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0 or size > len(self._buffer):
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def csv_lines(records):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for row_no, values in records:
+        writer.writerow([row_no] + ['' if value is None else value for value in values])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def error_message(e):
+    return str(getattr(e, 'orig', e)).strip().split('\n')[0]
+
+
+# foreign_key_violation: на удаляемую строку ссылается другая таблица
+FOREIGN_KEY_VIOLATION = '23503'
+
+
+def is_foreign_key_violation(e):
+    return getattr(getattr(e, 'orig', None), 'pgcode', None) == FOREIGN_KEY_VIOLATION
+
+
+def load_staging(connection, spec, records):
+    columns = spec.columns + spec.extra
+    connection.execute(text('DROP TABLE IF EXISTS bulk_staging'))
+    connection.execute(text('CREATE TEMP TABLE bulk_staging ({}, error TEXT)'.format(', '.join(
+        ['row_no INTEGER PRIMARY KEY'] + [f'{column.name} {SQL_TYPES[column.type]}' for column in columns]
+    ))))
+    cursor = connection.connection.cursor()
+    cursor.copy_expert(
+        'COPY bulk_staging (row_no, {}) FROM STDIN WITH (FORMAT csv)'.format(', '.join(spec.names)),
+        CopySource(csv_lines(records))
+    )
+
+
+def validate_staging(connection, spec):
+    for condition, message in spec.checks:
+        connection.execute(
+            text(f'UPDATE bulk_staging s SET error = :message WHERE s.error IS NULL AND ({condition})'),
+            {'message': message}
+        )
+
+    # Повтор внутри файла: ошибка у всех строк, кроме первой с тем же ключом
+    connection.execute(text('''
+        UPDATE bulk_staging s
+        SET error = 'Повторяет строку ' || d.first_row
+        FROM (
+            SELECT row_no, MIN(row_no) OVER (PARTITION BY {}) AS first_row
+            FROM bulk_staging s
+            WHERE s.error IS NULL
+        ) d
+        WHERE s.row_no = d.row_no AND d.first_row < d.row_no
+    '''.format(', '.join(spec.key))))
+
+
+def insert_rows(connection, spec, first_row, last_row):
+    bounds = {'first_row': first_row, 'last_row': last_row}
+    if spec.prepare:
+        connection.execute(text(spec.prepare), bounds)
+    columns = ', '.join(spec.names + [column.name for column in spec.extra])
+    result = connection.execute(text(f'''
+        INSERT INTO {spec.table} ({columns})
+        SELECT {columns} FROM bulk_staging
+        WHERE error IS NULL AND row_no BETWEEN :first_row AND :last_row
+    '''), bounds)
+    return result.rowcount
+
+
+def insert_batch(connection, spec, first_row, last_row, errors):
+    """
+    Вставка пачки одним оператором; если он падает (ограничение или
+    триггер), пачка повторяется построчно, чтобы найти виноватые строки.
+    """
+    try:
+        with connection.begin():
+            return insert_rows(connection, spec, first_row, last_row)
+    except DBAPIError:
+        pass
+
+    rows = connection.execute(text('''
+        SELECT row_no FROM bulk_staging
+        WHERE error IS NULL AND row_no BETWEEN :first_row AND :last_row
+        ORDER BY row_no
+    '''), {'first_row': first_row, 'last_row': last_row}).scalars().all()
+
+    inserted = 0
+    with connection.begin():
+        for row_no in rows:
+            try:
+                with connection.begin_nested():
+                    inserted += insert_rows(connection, spec, row_no, row_no)
+            except DBAPIError as e:
+                errors.append({'row': row_no, 'error': error_message(e)})
+    return inserted
+
+
+def bulk_import(spec, stream, fmt, batch_size):
+    errors = []
+    inserted = 0
+    # Временная таблица живёт в соединении, поэтому загрузка идёт
+    # в отдельном соединении, а не в сессии запроса
+    with db.engine.connect() as connection:
+        try:
+            records = read_records(spec, stream, fmt, errors)
+            with connection.begin():
+                load_staging(connection, spec, records)
+                validate_staging(connection, spec)
+            parse_failed = len(errors)
+
+            errors.extend(
+                {'row': row.row_no, 'error': row.error}
+                for row in connection.execute(
+                    text('SELECT row_no, error FROM bulk_staging WHERE error IS NOT NULL')
+                )
+            )
+            total_rows, first_row, last_row = connection.execute(
+                text('SELECT COUNT(*), MIN(row_no), MAX(row_no) FROM bulk_staging')
+            ).fetchone()
+
+            # Каждая пачка фиксируется отдельно: ошибка в поздней пачке
+            # не откатывает уже загруженные строки
+            if first_row is not None:
+                for start in range(first_row, last_row + 1, batch_size):
+                    inserted += insert_batch(connection, spec, start, start + batch_size - 1, errors)
+        finally:
+            connection.execute(text('DROP TABLE IF EXISTS bulk_staging'))
+
+    errors.sort(key=lambda error: error['row'])
+    return {
+        'table': spec.table,
+        'rows': total_rows + parse_failed,
+        'inserted': inserted,
+        'failed': len(errors),
+        'errors': errors
+    }
+
+
+def bulk_response(table):
+    """
+    Массовая загрузка строк из CSV (первая строка - заголовок с именами
+    колонок) или NDJSON, телом запроса или файлом multipart/form-data.
+    Ответ содержит число добавленных строк и ошибки по номерам строк.
+    """
+    spec = BULK_TABLES.get(table)
+    if spec is None:
+        return jsonify({'error': f'Массовая загрузка недоступна для таблицы {table}'}), 400
+
+    upload = next(iter(request.files.values()), None)
+    try:
+        fmt = input_format(upload)
+        batch_size = int(request.args.get('batch_size', current_app.config['BULK_BATCH_SIZE']))
+        if batch_size < 1:
+            raise ValueError('batch_size должен быть положительным')
+        stream = upload.stream if upload else request.stream
+        report = bulk_import(spec, stream, fmt, batch_size)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if report['inserted']:
+        cache.invalidate(spec.table)
+    return jsonify(report)
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+from . import db
+from .streaming import wants_stream
+from .versions import table_versions
+
+
+class MemoryBackend:
+    """LRU-кэш в памяти процесса с TTL для каждой записи."""
+
+    name = 'memory'
+    # Поколения видны только этому процессу: ключи ответов строятся из
+    # table_versions, а не из них (см. ResponseCache)
+    shared = False
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Поколения таблиц хранятся отдельно и не вытесняются
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generations(self, tables):
+        with self._lock:
+            return [self._generations.get(table, 0) for table in tables]
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Общий для всех воркеров кэш в Redis (или совместимом сервере)."""
+
+    name = 'redis'
+    shared = True
+
+    def __init__(self, url, prefix='librariesdb:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        return self._client.get(self._prefix + key)
+
+    def set(self, key, value, ttl):
+        self._client.set(self._prefix + key, value, ex=ttl)
+
+    def generations(self, tables):
+        values = self._client.mget([f'{self._prefix}gen:{table}' for table in tables])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tables):
+        pipeline = self._client.pipeline()
+        for table in tables:
+            pipeline.incr(f'{self._prefix}gen:{table}')
+        pipeline.execute()
+
+    def size(self):
+        return None
+
+
+# Заголовки, которые строятся заново для каждого ответа
+UNCACHED_HEADERS = {'Content-Type', 'Content-Length', 'X-Cache'}
+
+
+class ResponseCache:
+    """
+    Кэш ответов GET-эндпоинтов. Ключ строится из эндпоинта, аргументов
+    запроса и версий таблиц, которые читает эндпоинт (table_versions в БД:
+    их увеличивают триггеры при фиксации записи, они общие для всех
+    воркеров и те же, что в ETag). После записи старые ключи перестают
+    находиться в любом воркере и вытесняются по LRU/TTL. Без таблицы
+    версий ключ строится из поколений бэкенда, которые увеличивает
+    invalidate(таблицы) - только в этом процессе, если бэкенд в памяти.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.default_ttl = 300
+        self.hits = Counter()
+        self.misses = Counter()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        if app.config['CACHE_BACKEND'] == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = MemoryBackend(app.config['CACHE_MAX_ENTRIES'])
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+
+    def _key(self, tables):
+        args = [request.view_args, sorted(request.args.items(multi=True))]
+        digest = hashlib.sha1(json.dumps(args, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        try:
+            versions = table_versions(tables)
+        except Exception:
+            # schema/table_versions.sql не применён (conditional_response пишет это в лог)
+            db.session.rollback()
+            versions = ['g'] + self.backend.generations(tables)
+        return f'response:{request.endpoint}:{digest}:{".".join(str(v) for v in versions)}'
+
+    def _count(self, counter, endpoint):
+        with self._lock:
+            counter[endpoint] += 1
+
+    def cached(self, *tables, ttl=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None or wants_stream():
+                    return view(*args, **kwargs)
+
+                try:
+                    key = self._key(tables)
+                    stored = self.backend.get(key)
+                except Exception as e:
+                    current_app.logger.warning(f'Кэш недоступен: {e}')
+                    return view(*args, **kwargs)
+
+                if stored is not None:
+                    self._count(self.hits, request.endpoint)
+                    header, body = stored.split(b'\n', 1)
+                    meta = json.loads(header)
+                    response = current_app.response_class(
+                        body, status=meta['status'], mimetype=meta['mimetype'], headers=meta.get('headers')
+                    )
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._count(self.misses, request.endpoint)
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    # Заголовки ответа сохраняются вместе с телом: в них бывают
+                    # данные ответа (X-Next-Cursor у форматов arrow и parquet)
+                    header = json.dumps({
+                        'status': response.status_code,
+                        'mimetype': response.mimetype,
+                        'headers': [
+                            [name, value] for name, value in response.headers
+                            if name not in UNCACHED_HEADERS
+                        ]
+                    })
+                    try:
+                        self.backend.set(key, header.encode('utf-8') + b'\n' + response.get_data(), ttl or self.default_ttl)
+                    except Exception as e:
+                        current_app.logger.warning(f'Кэш недоступен: {e}')
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tables, libraries=None):
+        """
+        Сбросить кэш таблиц. libraries - библиотеки, которых касается
+        изменение (если известны): кроме общих поколений таблиц увеличиваются
+        поколения этих библиотек, иначе - поколения "всех библиотек" (@*).
+        По ним кэш отчётов сбрасывает только отчёты затронутых библиотек.
+        """
+        if self.backend is None:
+            return
+        if libraries is None:
+            scoped = [f'{table}@*' for table in tables]
+        else:
+            scoped = [f'{table}@{library}' for table in tables for library in sorted(set(map(str, libraries)))]
+        try:
+            self.backend.bump(list(tables) + scoped)
+        except Exception as e:
+            current_app.logger.warning(f'Не удалось сбросить кэш {tables}: {e}')
+
+    def generations(self, tables, library=None):
+        """Поколения таблиц; для library - изменения этой библиотеки и неадресные."""
+        if library is None:
+            return self.backend.generations(list(tables))
+        return self.backend.generations(
+            [f'{table}@{library}' for table in tables] + [f'{table}@*' for table in tables]
+        )
+
+    def stats(self):
+        with self._lock:
+            endpoints = sorted(set(self.hits) | set(self.misses))
+            return {
+                'backend': self.backend.name if self.backend else None,
+                'size': self.backend.size() if self.backend else None,
+                'hits': sum(self.hits.values()),
+                'misses': sum(self.misses.values()),
+                'endpoints': {
+                    endpoint: {'hits': self.hits[endpoint], 'misses': self.misses[endpoint]}
+                    for endpoint in endpoints
+                }
+            }
+
+
+cache = ResponseCache()
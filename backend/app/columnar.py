@@ -0,0 +1,51 @@
+from flask import current_app
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+COLUMNAR_FORMATS = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+def require_pyarrow(fmt):
+    if pa is None:
+        raise ValueError(f'Формат {fmt} недоступен: не установлен pyarrow')
+
+
+def build_table(columns, rows, metadata=None):
+    """
+    Таблица Arrow из строк результата. Строковые колонки кодируются
+    словарём: названия библиотек, жанров и авторов повторяются в строках,
+    а передаются один раз.
+    """
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    arrays = []
+    for column in values:
+        array = pa.array(column)
+        if pa.types.is_string(array.type):
+            array = array.dictionary_encode()
+        arrays.append(array)
+    encoded = {key: current_app.json.dumps(value) for key, value in (metadata or {}).items()}
+    return pa.Table.from_arrays(arrays, names=list(columns), metadata=encoded)
+
+
+def columnar_response(fmt, columns, rows, metadata=None, headers=None):
+    """Ответ в формате Arrow IPC (поток) или Parquet; metadata - в схеме таблицы (JSON)."""
+    require_pyarrow(fmt)
+    table = build_table(columns, rows, metadata)
+    sink = pa.BufferOutputStream()
+    if fmt == 'arrow':
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink)
+    return current_app.response_class(
+        sink.getvalue().to_pybytes(),
+        mimetype=COLUMNAR_FORMATS[fmt],
+        headers=headers
+    )
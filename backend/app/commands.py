@@ -0,0 +1,48 @@
+import click
+from flask.cli import AppGroup
+
+from . import db
+
+availability_cli = AppGroup('availability', help='Счётчик доступных экземпляров книг.')
+
+
+@availability_cli.command('check')
+@click.pass_context
+def check_availability(ctx):
+    """Сравнить book_availability с фактическими данными."""
+    rows = db.session.execute('SELECT * FROM book_availability_mismatches').fetchall()
+    if not rows:
+        click.echo('Расхождений нет')
+        return
+
+    for row in rows:
+        click.echo(
+            f'Библиотека {row.library_id}, книга {row.book_id}: '
+            f'сохранено {row.stored_quantity}, фактически {row.actual_quantity}'
+        )
+    click.echo(f'Всего расхождений: {len(rows)}')
+    ctx.exit(1)
+
+
+@availability_cli.command('rebuild')
+def rebuild_availability():
+    """Пересчитать book_availability по таблицам books и loans."""
+    fixed = db.session.execute('SELECT rebuild_book_availability()').scalar()
+    db.session.commit()
+    click.echo(f'Исправлено записей: {fixed}')
+
+
+rollup_cli = AppGroup('rollup', help='Дневные агрегаты абонементов для отчётов.')
+
+
+@rollup_cli.command('backfill')
+@click.option('--rebuild', is_flag=True, help='Пересчитать все дни с нуля.')
+def backfill_rollup(rebuild):
+    """Закрыть дни по вчерашний включительно в loan_daily_stats."""
+    if rebuild:
+        rows = db.session.execute('SELECT rebuild_loan_daily_stats()').scalar()
+    else:
+        rows = db.session.execute('SELECT close_loan_daily_stats(CURRENT_DATE - 1)').scalar()
+    db.session.commit()
+    closed = db.session.execute('SELECT closed_through FROM loan_daily_stats_state').scalar()
+    click.echo(f'Записано агрегатов: {rows}, дни закрыты по {closed}')
@@ -0,0 +1,97 @@
+import gzip
+
+from flask import g, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/vnd.apache.arrow.stream',
+    'text/csv',
+    'text/plain'
+}
+
+
+def gzip_compress(data, level):
+    return gzip.compress(data, compresslevel=level)
+
+
+def brotli_compress(data, level):
+    return brotli.compress(data, quality=level)
+
+
+def zstd_compress(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+# Кодировщик и уровень по умолчанию: быстрые уровни, ответы сжимаются на лету
+ENCODERS = {
+    'zstd': (zstd_compress, 3, lambda: zstandard is not None),
+    'br': (brotli_compress, 4, lambda: brotli is not None),
+    'gzip': (gzip_compress, 6, lambda: True)
+}
+
+
+class Compression:
+    """
+    Сжатие ответов blueprint по Accept-Encoding: zstd, brotli или gzip
+    (порядок предпочтения - COMPRESS_ALGORITHMS, при равном q клиента).
+    zstd и brotli используются, если установлены zstandard и brotli.
+    Сжимаются только готовые (не потоковые) ответы текстовых и Arrow
+    форматов размером от COMPRESS_MIN_SIZE байт.
+    """
+
+    def __init__(self):
+        self.min_size = 1024
+        self.algorithms = ['gzip']
+
+    def init_app(self, app):
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.algorithms = [
+            name for name in app.config['COMPRESS_ALGORITHMS']
+            if name in ENCODERS and ENCODERS[name][2]()
+        ]
+
+    def choose(self):
+        best = None
+        best_quality = 0
+        for name in self.algorithms:
+            quality = request.accept_encodings[name]
+            if quality > best_quality:
+                best, best_quality = name, quality
+        return best
+
+    def after_request(self, response):
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (
+            response.status_code not in (200, 201)
+            or response.is_streamed
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or (response.content_length or 0) < self.min_size
+        ):
+            return response
+
+        encoding = self.choose()
+        if encoding is None:
+            return response
+        compress, level, _ = ENCODERS[encoding]
+        # Метрика размера ответов (app/metrics.py) считает несжатый размер
+        g.uncompressed_length = response.content_length
+        response.set_data(compress(response.get_data(), level))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+compression = Compression()
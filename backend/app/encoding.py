@@ -0,0 +1,53 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON-провайдер приложения на orjson (если установлен, иначе стандартный
+    json Flask). Ответ кодируется сразу в байты UTF-8, без экранирования
+    кириллицы. Decimal и даты по умолчанию кодируются как у Flask (строка
+    и дата HTTP), чтобы не менять формат ответов; JSON_ISO_DATES = True
+    включает собственное кодирование дат orjson (ISO 8601), которое быстрее.
+    Порядок ключей, как и у Flask, отсортирован.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.iso_dates = app.config['JSON_ISO_DATES']
+
+    def _options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+        if not self.iso_dates:
+            options |= orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def encode(self, obj, indent=False):
+        """Байты JSON для obj."""
+        if orjson is None:
+            return super().dumps(obj, indent=2 if indent else None).encode('utf-8')
+        return orjson.dumps(obj, default=self.default, option=self._options(indent))
+
+    def dumps(self, obj, **kwargs):
+        # Нестандартные аргументы json.dumps поддерживает только стандартный путь
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.encode(obj, indent) + b'\n', mimetype=self.mimetype)
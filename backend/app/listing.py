@@ -0,0 +1,199 @@
+from flask import current_app, jsonify, request
+
+from .columnar import COLUMNAR_FORMATS, columnar_response, require_pyarrow
+from .queries import queries
+from .pagination import (
+    Key, build_query, decode_cursor, encode_cursor, keyset_condition, parse_limit
+)
+from .streaming import stream_response, wants_stream
+
+LIST_FORMATS = ('json', 'columns') + tuple(COLUMNAR_FORMATS)
+
+
+class ListSpec:
+    """
+    Описание списочного эндпоинта: запрос с плейсхолдером {where},
+    белый список полей (поле ответа -> SQL-выражение), порядок по
+    умолчанию, который должен однозначно упорядочивать строки, и
+    таблицы, из которых читает запрос (для ETag). search - текстовые поля
+    одной таблицы, по которым ищет ?q=: выражение поиска тогда неизменяемое
+    и может совпадать с выражением триграммного индекса; без него ?q= ищет
+    по всем полям через concat_ws, который индексом не покрыть.
+    """
+
+    def __init__(self, query, columns, order, tables, nullable=(), conditions=(), search=None):
+        self.query = query
+        self.columns = columns
+        self.order = order
+        self.tables = tuple(tables)
+        self.nullable = set(nullable)
+        self.conditions = list(conditions)
+        self.search = search
+
+    def search_condition(self):
+        if self.search is None:
+            return f"concat_ws(' ', {', '.join(self.columns.values())}) ILIKE :search"
+        return f'({search_expression(self.columns[field] for field in self.search)}) ILIKE :search'
+
+    def key(self, field, direction='asc'):
+        return Key(self.columns[field], field, direction, field in self.nullable)
+
+    def keys(self, sort=None):
+        keys = [self.key(field, direction) for field, direction in sort or []]
+        used = {key.field for key in keys}
+        keys += [self.key(field, direction) for field, direction in self.order if field not in used]
+        return keys
+
+
+def search_expression(columns):
+    # Вместо concat_ws (STABLE) - coalesce и ||, чтобы выражение годилось для индекса
+    return " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+
+
+def parse_sort(spec):
+    # ?sort=title,-issue_date: минус означает сортировку по убыванию
+    sort = []
+    for item in request.args.get('sort', '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        direction = 'desc' if item.startswith('-') else 'asc'
+        field = item.lstrip('+-')
+        if field not in spec.columns:
+            raise ValueError(f'Недопустимое поле сортировки: {field}')
+        if field not in {f for f, _ in sort}:
+            sort.append((field, direction))
+    return sort
+
+
+def filter_conditions(spec, params, exclude=None):
+    # ?filter[library_name]=A&filter[library_name]=B -> library_name IN (A, B)
+    conditions = []
+    for index, (arg, values) in enumerate(request.args.lists()):
+        if not (arg.startswith('filter[') and arg.endswith(']')):
+            continue
+        field = arg[len('filter['):-1]
+        if field not in spec.columns:
+            raise ValueError(f'Недопустимое поле фильтра: {field}')
+        if field == exclude:
+            continue
+        names = []
+        for position, value in enumerate(values):
+            name = f'filter_{index}_{position}'
+            params[name] = value
+            names.append(f':{name}')
+        conditions.append(f'{spec.columns[field]} IN ({", ".join(names)})')
+
+    search = request.args.get('q', '').strip()
+    if search:
+        # Подстрочный поиск по полям spec.search (по умолчанию - по всем), как раньше делал DataTable
+        escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params['search'] = f'%{escaped}%'
+        conditions.append(spec.search_condition())
+    return conditions
+
+
+def list_response(spec, params=None, conditions=None):
+    """
+    Ответ списочного эндпоинта с фильтрами (?filter[поле]=, ?q=) и
+    сортировкой (?sort=). Без ?limit= и ?after= возвращается весь
+    список, как раньше; иначе страница и курсор следующей страницы.
+    При ?stream=1 или Accept: application/x-ndjson строки отдаются потоком,
+    ?format=columns, arrow или parquet меняют формат (см. rows_response).
+    """
+    params = dict(params or {})
+    conditions = spec.conditions + list(conditions or [])
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    stream = wants_stream()
+
+    try:
+        fmt = request.args.get('format', 'json')
+        if fmt not in LIST_FORMATS:
+            raise ValueError(f'Неподдерживаемый формат: {fmt}')
+        if fmt in COLUMNAR_FORMATS:
+            require_pyarrow(fmt)
+        keys = spec.keys(parse_sort(spec))
+        conditions += filter_conditions(spec, params)
+        if limit is not None or after is not None or stream:
+            # Поток без ?limit= отдаёт всю выборку (с учётом ?after=)
+            if limit is not None or not stream:
+                limit = parse_limit(limit)
+            if after:
+                values = decode_cursor(after, len(keys))
+                conditions.append(keyset_condition(keys, values, params))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sql = build_query(spec.query, keys, conditions)
+
+    if stream:
+        if limit is not None:
+            params['limit'] = limit
+            sql += ' LIMIT :limit'
+        return stream_response(sql, params)
+
+    if limit is None:
+        result = queries.run(f'list:{request.endpoint}', sql, params)
+        return rows_response(list(result.keys()), [tuple(row) for row in result])
+
+    # Запрашиваем на одну строку больше, чтобы узнать, есть ли следующая страница
+    params['limit'] = limit + 1
+    result = queries.run(f'list:{request.endpoint}', sql + ' LIMIT :limit', params)
+    columns = list(result.keys())
+    rows = [tuple(row) for row in result]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = dict(zip(columns, rows[-1]))
+        next_cursor = encode_cursor([last[key.field] for key in keys])
+
+    return rows_response(columns, rows, paginated=True, next_cursor=next_cursor)
+
+
+def rows_response(columns, rows, paginated=False, next_cursor=None):
+    """
+    Строки списка в выбранном формате (?format=): json - массив объектов,
+    как раньше; columns - имена колонок один раз и строки массивами, без
+    повторения ключей в каждой строке; arrow и parquet - двоичная таблица
+    (курсор следующей страницы в заголовке X-Next-Cursor).
+    """
+    fmt = request.args.get('format')
+    if fmt in COLUMNAR_FORMATS:
+        headers = {'X-Next-Cursor': next_cursor} if next_cursor else None
+        return columnar_response(fmt, columns, rows, headers=headers)
+    if fmt == 'columns':
+        payload = {'columns': columns, 'rows': rows}
+        if paginated:
+            payload['next_cursor'] = next_cursor
+        return jsonify(payload)
+
+    data = [dict(zip(columns, row)) for row in rows]
+    return jsonify({'data': data, 'next_cursor': next_cursor} if paginated else data)
+
+
+def distinct_response(spec, field, params=None, conditions=None):
+    """Различные значения поля с учётом остальных активных фильтров."""
+    if field not in spec.columns:
+        return jsonify({'error': f'Недопустимое поле: {field}'}), 400
+
+    params = dict(params or {})
+    conditions = spec.conditions + list(conditions or [])
+    try:
+        conditions += filter_conditions(spec, params, exclude=field)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    conditions.append(f'{spec.columns[field]} IS NOT NULL')
+    where = 'WHERE ' + ' AND '.join(conditions)
+    params['limit'] = current_app.config['DISTINCT_VALUES_LIMIT']
+    # Значения берутся из поля ответа, чтобы совпадать с тем, что видит пользователь
+    sql = f'''
+        SELECT DISTINCT source.{field}::text AS value
+        FROM ({spec.query.format(where=where)}) AS source
+        ORDER BY value
+        LIMIT :limit
+    '''
+    result = queries.run(f'distinct:{request.endpoint}', sql, params)
+    return jsonify([row.value for row in result])
@@ -0,0 +1,48 @@
+from flask import jsonify, request
+
+from .queries import queries
+
+
+class Lookup:
+    """
+    Справочник для выпадающих списков: пары [id, подпись], упорядоченные
+    по подписи. parent - обязательный параметр запроса, ограничивающий
+    строки (книги одной библиотеки: номер книги уникален только в ней).
+    """
+
+    def __init__(self, name, sql, tables, parent=None):
+        self.name = name
+        self.query = queries.register(f'lookup_{name}', sql)
+        self.tables = tuple(tables)
+        self.parent = parent
+
+
+LOOKUPS = {
+    lookup.name: lookup for lookup in (
+        Lookup('libraries', 'SELECT library_id, name FROM libraries ORDER BY name, library_id', ['libraries']),
+        Lookup('genres', 'SELECT genre_id, name FROM genres ORDER BY name, genre_id', ['genres']),
+        Lookup('topics', 'SELECT topic_id, name FROM topics ORDER BY name, topic_id', ['topics']),
+        Lookup('readers', 'SELECT reader_id, full_name FROM readers ORDER BY full_name, reader_id', ['readers']),
+        Lookup(
+            'books',
+            '''
+                SELECT book_id, title
+                FROM books
+                WHERE library_id = :library_id
+                ORDER BY title, book_id
+            ''',
+            ['books'],
+            parent='library_id'
+        )
+    )
+}
+
+
+def lookup_response(lookup):
+    params = {}
+    if lookup.parent is not None:
+        value = request.args.get(lookup.parent, type=int)
+        if value is None:
+            return jsonify({'error': f'Требуется целочисленный параметр {lookup.parent}'}), 400
+        params[lookup.parent] = value
+    return jsonify([list(row) for row in lookup.query.execute(params)])
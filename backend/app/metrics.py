@@ -0,0 +1,168 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+
+class Histogram:
+    """Гистограмма в духе Prometheus: накопительные корзины, сумма и число наблюдений."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{format_labels(labels, le=bound)} {cumulative}'
+        yield f'{name}_sum{format_labels(labels)} {self.sum}'
+        yield f'{name}_count{format_labels(labels)} {self.count}'
+
+
+def format_labels(labels, **extra):
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in items
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+class Metrics:
+    """
+    Метрики приложения: задержки маршрутов и запросов, строки, размер
+    ответов до сжатия и ожидание соединения из пула (app/pool.py).
+    Маршруты измеряются хуками Flask, запросы - событиями курсора
+    SQLAlchemy; имя запроса берётся из execution_options(query_name=...)
+    реестра запросов. Отдаются в текстовом формате Prometheus на /metrics.
+    """
+
+    def __init__(self):
+        self.slow_query_ms = None
+        self.logger = None
+        self._histograms = {}
+        self._counters = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.slow_query_ms = app.config['SLOW_QUERY_MS']
+        self.logger = app.logger
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def _histogram(self, name, labels, buckets):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(buckets)
+        return histogram
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            self._histogram(name, tuple(labels), buckets).observe(value)
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self._counters[(name, tuple(labels))] += value
+
+    def observe_pool_wait(self, seconds):
+        self.observe('librariesdb_pool_wait_seconds', (), seconds)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+
+    def _after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unknown'
+        labels = (('endpoint', endpoint), ('method', request.method), ('status', response.status_code))
+        self.observe('librariesdb_request_duration_seconds', labels, time.perf_counter() - started)
+        # Размер известен только у непотоковых ответов. Хук приложения
+        # выполняется после сжатия в blueprint, поэтому несжатый размер
+        # берётся из g (app/compression.py), а кодировка идёт в метку
+        size = g.pop('uncompressed_length', response.content_length)
+        if not response.is_streamed and size is not None:
+            self.observe(
+                'librariesdb_response_bytes',
+                (
+                    ('endpoint', endpoint),
+                    ('mimetype', response.mimetype),
+                    ('encoding', response.headers.get('Content-Encoding', 'identity'))
+                ),
+                size,
+                SIZE_BUCKETS
+            )
+        return response
+
+    def render(self):
+        with self._lock:
+            lines = []
+            seen = set()
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                if name not in seen:
+                    lines.append(f'# TYPE {name} histogram')
+                    seen.add(name)
+                lines.extend(histogram.lines(name, labels))
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in seen:
+                    lines.append(f'# TYPE {name} counter')
+                    seen.add(name)
+                lines.append(f'{name}{format_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def query_label(context):
+    name = context.execution_options.get('query_name') if context is not None else None
+    if name:
+        return name
+    if has_request_context() and request.endpoint:
+        return f'{request.endpoint}:unnamed'
+    return 'unnamed'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_started')
+    label = (('query', query_label(context)),)
+    metrics.observe('librariesdb_query_duration_seconds', label, elapsed)
+    # Для серверных курсоров (потоковая выдача) число строк заранее неизвестно
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        metrics.observe('librariesdb_query_rows', label, cursor.rowcount, ROW_BUCKETS)
+
+    if metrics.slow_query_ms is not None and elapsed * 1000 >= metrics.slow_query_ms:
+        metrics.inc('librariesdb_slow_queries_total', label)
+        if metrics.logger is not None:
+            metrics.logger.warning(
+                'Медленный запрос %s: %.1f мс: %s',
+                label[0][1], elapsed * 1000, ' '.join(statement.split())[:500]
+            )
+
+
+metrics = Metrics()
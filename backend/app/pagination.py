@@ -0,0 +1,90 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+
+from flask import current_app
+
+# Ключ сортировки: SQL-выражение, имя поля в строке результата и направление.
+# nullable=True отключает сравнение кортежей и включает обработку NULL.
+Key = namedtuple('Key', ['expression', 'field', 'direction', 'nullable'])
+Key.__new__.__defaults__ = ('asc', False)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, binascii.Error):
+        raise ValueError('Некорректный курсор')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Некорректный курсор')
+    return values
+
+
+def order_clause(keys):
+    return ', '.join(f'{key.expression} {key.direction.upper()}' for key in keys)
+
+
+def keyset_condition(keys, values, params):
+    """Условие "строго после курсора" для заданного порядка ключей."""
+    names = []
+    for index, value in enumerate(values):
+        name = f'after_{index}'
+        params[name] = value
+        names.append(name)
+
+    # Одно направление и без NULL: сравнение кортежей, которое использует индекс
+    directions = {key.direction for key in keys}
+    if len(directions) == 1 and None not in values and not any(key.nullable for key in keys):
+        operator = '<' if directions == {'desc'} else '>'
+        columns = ', '.join(key.expression for key in keys)
+        placeholders = ', '.join(f':{name}' for name in names)
+        return f'({columns}) {operator} ({placeholders})'
+
+    # Общий случай: (k1 после v1) OR (k1 = v1 AND k2 после v2) OR ...
+    # PostgreSQL ставит NULL последними при ASC и первыми при DESC
+    branches = []
+    equal = []
+    for key, value, name in zip(keys, values, names):
+        if value is None:
+            after = None if key.direction == 'asc' else f'{key.expression} IS NOT NULL'
+        elif key.direction == 'asc':
+            after = f'({key.expression} > :{name} OR {key.expression} IS NULL)'
+        else:
+            after = f'{key.expression} < :{name}'
+
+        if after:
+            branches.append(' AND '.join(equal + [after]))
+        if value is None:
+            equal.append(f'{key.expression} IS NULL')
+        else:
+            equal.append(f'{key.expression} = :{name}')
+
+    if not branches:
+        return 'FALSE'
+    return '(' + ' OR '.join(f'({branch})' for branch in branches) + ')'
+
+
+def build_query(query, keys, conditions):
+    where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+    return query.format(where=where) + f' ORDER BY {order_clause(keys)}'
+
+
+def parse_limit(value, config=None):
+    # config - настройки приложения вне контекста Flask (асинхронное приложение)
+    config = config or current_app.config
+    if value is None or value == '':
+        return config['PAGINATION_DEFAULT_LIMIT']
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('Параметр limit должен быть целым числом')
+    if limit <= 0:
+        raise ValueError('Параметр limit должен быть положительным')
+    return min(limit, config['PAGINATION_MAX_LIMIT'])
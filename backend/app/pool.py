@@ -0,0 +1,126 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+from . import db
+from .metrics import metrics
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, который измеряет ожидание свободного соединения."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            pool_monitor.record_wait(time.perf_counter() - started, timed_out)
+
+
+class PoolMonitor:
+    """
+    Пул соединений приложения. Вместо pool_pre_ping (лишний SELECT 1 при
+    каждой выдаче) соединение проверяется, только если пролежало в пуле
+    дольше DB_POOL_PING_IDLE секунд: разрывы у активно используемых
+    соединений SQLAlchemy и так обнаруживает по ошибке и сбрасывает пул.
+    Ведёт статистику ожидания для /health/pool.
+    """
+
+    def __init__(self):
+        self.ping_idle = None
+        self.options = {}
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._timeouts = 0
+        self._pings = 0
+        self._ping_failures = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ping_idle = app.config['DB_POOL_PING_IDLE']
+        self.options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+
+        # Класс пула подменяется до создания движка (db.init_app)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'poolclass': InstrumentedQueuePool,
+            **app.config['SQLALCHEMY_ENGINE_OPTIONS']
+        }
+
+        if not event.contains(InstrumentedQueuePool, 'checkout', self._checkout):
+            event.listen(InstrumentedQueuePool, 'checkin', self._checkin)
+            event.listen(InstrumentedQueuePool, 'checkout', self._checkout)
+
+    def record_wait(self, seconds, timed_out=False):
+        metrics.observe_pool_wait(seconds)
+        with self._lock:
+            self._waits += 1
+            self._wait_seconds += seconds
+            self._max_wait_seconds = max(self._max_wait_seconds, seconds)
+            if timed_out:
+                self._timeouts += 1
+
+    def _checkin(self, dbapi_connection, connection_record):
+        connection_record.info['checked_in'] = time.monotonic()
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        checked_in = connection_record.info.get('checked_in')
+        if self.ping_idle is None or self.ping_idle < 0 or checked_in is None:
+            return
+        if time.monotonic() - checked_in < self.ping_idle:
+            return
+
+        with self._lock:
+            self._pings += 1
+        try:
+            cursor = dbapi_connection.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+            dbapi_connection.rollback()
+        except Exception:
+            with self._lock:
+                self._ping_failures += 1
+            # Пул закроет соединение и выдаст новое
+            raise exc.DisconnectionError()
+
+    def stats(self):
+        pool = db.engine.pool
+        with self._lock:
+            waits = {
+                'count': self._waits,
+                'avg_ms': round(self._wait_seconds * 1000 / self._waits, 3) if self._waits else None,
+                'max_ms': round(self._max_wait_seconds * 1000, 3),
+                'timeouts': self._timeouts
+            }
+            pings = {'count': self._pings, 'failures': self._ping_failures}
+
+        if not isinstance(pool, QueuePool):
+            return {'pool': type(pool).__name__, 'wait': waits, 'pings': pings}
+
+        checked_out = pool.checkedout()
+        max_overflow = self.options.get('max_overflow', 10)
+        capacity = pool.size() + max(max_overflow, 0)
+        return {
+            'pool': type(pool).__name__,
+            'status': 'saturated' if 0 < capacity <= checked_out else 'ok',
+            'size': pool.size(),
+            'max_overflow': max_overflow,
+            'checked_out': checked_out,
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'timeout': pool.timeout(),
+            'recycle': self.options.get('pool_recycle', -1),
+            'lifo': self.options.get('pool_use_lifo', False),
+            'ping_idle': self.ping_idle,
+            'wait': waits,
+            'pings': pings
+        }
+
+
+pool_monitor = PoolMonitor()
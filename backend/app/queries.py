@@ -0,0 +1,219 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from . import db
+
+# Та же грамматика параметров, что у sqlalchemy.text(): :name, но не ::type
+BIND_PARAM = re.compile(r'(?<![:\w\x5c]):(\w+)(?!:)')
+
+# Подготовленный оператор пережил изменение таблицы, от которой зависит
+# набор колонок результата (feature_not_supported с этим сообщением)
+STALE_PLAN = ('0A000', 'cached plan must not change result type')
+
+
+def to_positional(sql):
+    """Текст с :name в позиционной форме ($1, $2, ...) и имена параметров по порядку."""
+    names = []
+
+    def replace(match):
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f'${names.index(name) + 1}'
+
+    return BIND_PARAM.sub(replace, sql), names
+
+
+class Query:
+    """
+    Запрос, объявленный один раз. При создании текст компилируется
+    в text() и переводится в позиционную форму ($1, $2, ...) для PREPARE.
+    """
+
+    def __init__(self, registry, name, sql, prepare=True):
+        self.registry = registry
+        self.name = name
+        self.sql = sql
+        self.statement = text(sql)
+        self.prepare = prepare
+        self.ident = 'q_' + re.sub(r'\W', '_', name)[:60]
+        self.positional, self.param_names = to_positional(sql)
+
+    def execute(self, params=None):
+        return self.registry.execute(self, params or {})
+
+
+def variant_name(name, sql):
+    """
+    Имя варианта по хешу текста: одинаковый текст получает одно имя в любом
+    процессе и после вытеснения из LRU, поэтому имя подготовленного
+    оператора всегда соответствует одному тексту, а метка query в метриках
+    не растёт с каждым повторным построением варианта.
+    """
+    return f'{name}:{hashlib.sha1(sql.encode("utf-8")).hexdigest()[:12]}'
+
+
+class QueryRegistry:
+    """
+    Реестр запросов приложения. Запросы, объявленные через register(),
+    выполняются как серверные подготовленные операторы (PREPARE/EXECUTE):
+    PostgreSQL разбирает их один раз на соединение и может переиспользовать
+    план. Варианты запросов с динамическими частями (фильтры и сортировка
+    отчётов) регистрируются через variant() и хранятся в LRU. Для каждого
+    запроса собирается время подготовки и выполнения.
+    """
+
+    def __init__(self):
+        self.prepare = True
+        self.variant_limit = 256
+        self.queries = {}
+        self._variants = OrderedDict()
+        self._compiled = OrderedDict()
+        self._stats = defaultdict(lambda: {
+            'prepares': 0,
+            'prepare_ms': 0.0,
+            'executions': 0,
+            'execute_ms': 0.0,
+            'max_execute_ms': 0.0
+        })
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.prepare = app.config['QUERY_PREPARE']
+        self.variant_limit = app.config['QUERY_VARIANT_LIMIT']
+
+    def register(self, name, sql, prepare=True):
+        if name in self.queries:
+            raise ValueError(f'Запрос {name} уже объявлен')
+        query = Query(self, name, sql, prepare)
+        self.queries[name] = query
+        return query
+
+    def variant(self, name, key, build):
+        """Вариант запроса name для ключа key; build() строит текст при первом обращении."""
+        with self._lock:
+            query = self._variants.get((name, key))
+            if query is not None:
+                self._variants.move_to_end((name, key))
+                return query
+
+        sql = build()
+        query = Query(self, variant_name(name, sql), sql)
+        with self._lock:
+            self._variants[(name, key)] = query
+            while len(self._variants) > self.variant_limit:
+                self._variants.popitem(last=False)
+        return query
+
+    def compiled(self, sql):
+        """text() для динамического SQL (списки с фильтрами), без подготовки на сервере."""
+        with self._lock:
+            statement = self._compiled.get(sql)
+            if statement is not None:
+                self._compiled.move_to_end(sql)
+                return statement
+        statement = text(sql)
+        with self._lock:
+            self._compiled[sql] = statement
+            while len(self._compiled) > self.variant_limit:
+                self._compiled.popitem(last=False)
+        return statement
+
+    def run(self, name, sql, params=None):
+        """Выполнить динамический SQL с учётом времени под именем name."""
+        started = time.perf_counter()
+        result = db.session.execute(
+            self.compiled(sql), params or {}, execution_options={'query_name': name}
+        )
+        self._record(name, 'execute', started)
+        return result
+
+    def execute(self, query, params):
+        if not (self.prepare and query.prepare):
+            started = time.perf_counter()
+            result = db.session.execute(
+                query.statement, params, execution_options={'query_name': query.name}
+            )
+            self._record(query.name, 'execute', started)
+            return result
+
+        # Имя запроса попадает в метрики через события курсора
+        connection = db.session.connection().execution_options(query_name=query.name)
+        # Текст без параметров уходит в драйвер как есть (% в LIKE не экранируется)
+        raw = connection.execution_options(no_parameters=True)
+        # Подготовленные операторы живут в серверной сессии, поэтому
+        # учитываются в info DBAPI-соединения, а не процесса
+        info = connection.connection.info
+        prepared = info.setdefault('prepared_statements', set())
+        stale = info.setdefault('stale_statements', set())
+        if query.ident not in prepared:
+            started = time.perf_counter()
+            if query.ident in stale:
+                raw.exec_driver_sql(f'DEALLOCATE {query.ident}')
+                stale.discard(query.ident)
+            raw.exec_driver_sql(f'PREPARE {query.ident} AS {query.positional}')
+            self._record(query.name, 'prepare', started)
+            prepared.add(query.ident)
+
+        started = time.perf_counter()
+        try:
+            if query.param_names:
+                # Параметры передаются словарём: кортеж или список параметров
+                # SQLAlchemy принял бы за несколько наборов (executemany),
+                # и значения-списки (ANY(:tables)) ломали бы запрос
+                placeholders = ', '.join(f'%({name})s' for name in query.param_names)
+                result = connection.exec_driver_sql(
+                    f'EXECUTE {query.ident}({placeholders})',
+                    {name: params[name] for name in query.param_names}
+                )
+            else:
+                result = raw.exec_driver_sql(f'EXECUTE {query.ident}')
+        except DBAPIError as e:
+            # После изменения схемы (ALTER TABLE) план оператора устаревает:
+            # транзакция уже прервана, но на этом соединении оператор
+            # будет пересоздан при следующем обращении
+            if getattr(e.orig, 'pgcode', None) == STALE_PLAN[0] and STALE_PLAN[1] in str(e.orig):
+                prepared.discard(query.ident)
+                stale.add(query.ident)
+            raise
+        self._record(query.name, 'execute', started)
+        return result
+
+    def _record(self, name, kind, started):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            stats = self._stats[name]
+            if kind == 'prepare':
+                stats['prepares'] += 1
+                stats['prepare_ms'] += elapsed
+            else:
+                stats['executions'] += 1
+                stats['execute_ms'] += elapsed
+                stats['max_execute_ms'] = max(stats['max_execute_ms'], elapsed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'prepare': self.prepare,
+                'variants': len(self._variants),
+                'queries': {
+                    name: {
+                        **stats,
+                        'prepare_ms': round(stats['prepare_ms'], 3),
+                        'execute_ms': round(stats['execute_ms'], 3),
+                        'avg_execute_ms': round(stats['execute_ms'] / stats['executions'], 3)
+                        if stats['executions'] else None,
+                        'max_execute_ms': round(stats['max_execute_ms'], 3)
+                    }
+                    for name, stats in sorted(self._stats.items())
+                }
+            }
+
+
+queries = QueryRegistry()
@@ -0,0 +1,231 @@
+import itertools
+import os
+import threading
+import time
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import text
+
+from . import db
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# На сервере, который не является репликой, pg_last_wal_replay_lsn() равен NULL:
+# такой адрес (например, другая основная база) не используется - по нему
+# нельзя проверить, что чтение увидит последнюю запись
+REPLICA_STATE = '''
+    SELECT
+        pg_last_wal_replay_lsn() - '0/0'::pg_lsn AS replay_lsn,
+        CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+        END AS lag
+'''
+PRIMARY_LSN = "SELECT pg_current_wal_lsn() - '0/0'::pg_lsn"
+# Минимальная пауза между проверками, если их торопят запросы (с)
+MIN_PROBE_GAP = 0.1
+
+
+def read_only(view):
+    """Маршрут только читает данные (например, POST-отчёт) и может идти на реплику."""
+    view.read_only = True
+    return view
+
+
+class Replica:
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.healthy = True
+        self.checked_at = None
+        self.replay_lsn = None
+        self.lag = None
+        self.error = None
+
+
+class ReplicaRouter:
+    """
+    Маршрутизация чтения на реплики. Реплики из DATABASE_REPLICA_URLS
+    подключаются как binds Flask-SQLAlchemy; читающий запрос (GET или
+    маршрут с @read_only) получает реплику по кругу, и RoutingSession
+    отправляет на неё все операторы запроса. Если подходящей реплики нет,
+    запрос идёт на основную базу.
+
+    Состояние реплик проверяет фоновый поток процесса раз в
+    REPLICA_CHECK_INTERVAL секунд с REPLICA_PROBE_TIMEOUT на подключение
+    и запрос; выбор реплики в запросе только читает результат последней
+    проверки. Реплика пропускается, если проверка не прошла или давно не
+    обновлялась, отставание при проверке было больше REPLICA_MAX_LAG или
+    реплика ещё не применила последнюю запись этого процесса (сравнение
+    LSN; за LSN каждый успешный изменяющий запрос платит лишним запросом
+    к основной базе). Так чтение после записи видит её, если оба запроса
+    обработал один процесс. Записи других процессов могут быть не видны
+    дольше REPLICA_MAX_LAG: отставание измеряется только при проверках и
+    между ними может вырасти.
+    """
+
+    def __init__(self):
+        self.replicas = []
+        self.max_lag = 5
+        self.check_interval = 10
+        self.probe_timeout = 2
+        self.write_lsn = 0
+        self.app = None
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._probe_pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.max_lag = app.config['REPLICA_MAX_LAG']
+        self.check_interval = app.config['REPLICA_CHECK_INTERVAL']
+        self.probe_timeout = app.config['REPLICA_PROBE_TIMEOUT']
+        self.replicas = [
+            Replica(f'replica_{index}', url)
+            for index, url in enumerate(app.config['DATABASE_REPLICA_URLS'])
+        ]
+        if not self.replicas:
+            return
+
+        # Движки реплик создаются вместе с основным, с теми же настройками пула;
+        # недоступная реплика не должна задерживать подключение дольше таймаута
+        options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+        connect_args = dict(options.get('connect_args') or {})
+        connect_args.setdefault('connect_timeout', max(1, round(self.probe_timeout)))
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        for replica in self.replicas:
+            binds[replica.name] = {'url': replica.url, **options, 'connect_args': connect_args}
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def current(self):
+        """Имя bind реплики для текущего запроса (или задания отчёта) либо None."""
+        if not has_app_context():
+            return None
+        return g.get('db_replica')
+
+    def _is_read(self):
+        if request.method in SAFE_METHODS:
+            return True
+        view = current_app.view_functions.get(request.endpoint)
+        return getattr(view, 'read_only', False)
+
+    def _before_request(self):
+        self._start_probe()
+        if self._is_read():
+            g.db_replica = self.choose()
+
+    def _after_request(self, response):
+        replica = self.current()
+        response.headers['X-DB-Route'] = replica or 'primary'
+        if replica is not None and response.status_code >= 500:
+            # Ошибка могла быть вызвана репликой: не выбирать её до новой проверки
+            self._replica(replica).checked_at = None
+            self._wakeup.set()
+        elif replica is None and not self._is_read() and response.status_code < 400:
+            self._remember_write()
+        return response
+
+    def _replica(self, name):
+        return next(replica for replica in self.replicas if replica.name == name)
+
+    def _remember_write(self):
+        try:
+            lsn = int(db.session.execute(text(PRIMARY_LSN)).scalar())
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(f'Не удалось получить LSN основной базы: {e}')
+            return
+        with self._lock:
+            self.write_lsn = max(self.write_lsn, lsn)
+
+    def choose(self):
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self._usable(replica):
+                return replica.name
+        return None
+
+    def _usable(self, replica):
+        checked_at = replica.checked_at
+        # Результат старше нескольких интервалов: фоновая проверка не успевает
+        if checked_at is None or time.monotonic() - checked_at > 3 * self.check_interval:
+            return False
+        if not replica.healthy or (replica.lag or 0) > self.max_lag:
+            return False
+        if replica.replay_lsn < self.write_lsn:
+            # Последняя запись ещё не дошла: запрос идёт на основную базу, проверка - раньше срока
+            self._wakeup.set()
+            return False
+        return True
+
+    def _start_probe(self):
+        # Поток запускается в каждом процессе (после fork воркера он не наследуется)
+        if self._probe_pid == os.getpid():
+            return
+        with self._lock:
+            if self._probe_pid == os.getpid():
+                return
+            self._probe_pid = os.getpid()
+        threading.Thread(target=self._probe_loop, name='replica-probe', daemon=True).start()
+
+    def _probe_loop(self):
+        with self.app.app_context():
+            while True:
+                self._wakeup.clear()
+                for replica in self.replicas:
+                    self.check(replica)
+                if self._wakeup.wait(self.check_interval):
+                    time.sleep(MIN_PROBE_GAP)
+
+    def check(self, replica):
+        try:
+            with db.engines[replica.name].connect() as connection, connection.begin():
+                connection.execute(
+                    text("SELECT set_config('statement_timeout', :timeout, true)"),
+                    {'timeout': f'{int(self.probe_timeout * 1000)}ms'}
+                )
+                state = connection.execute(text(REPLICA_STATE)).fetchone()
+        except Exception as e:
+            self.mark_unusable(replica, str(e).strip().split('\n')[0])
+        else:
+            self.update(replica, state)
+        replica.checked_at = time.monotonic()
+
+    def update(self, replica, state):
+        if state.replay_lsn is None:
+            self.mark_unusable(replica, 'сервер не является репликой (pg_last_wal_replay_lsn() IS NULL)')
+            return
+        replica.healthy = True
+        replica.error = None
+        replica.replay_lsn = int(state.replay_lsn)
+        replica.lag = float(state.lag)
+
+    def mark_unusable(self, replica, error):
+        # В лог пишется только переход из рабочего состояния
+        if replica.healthy:
+            current_app.logger.warning(f'Реплика {replica.name} недоступна: {error}')
+        replica.healthy = False
+        replica.error = error
+
+    def stats(self):
+        return {
+            'write_lsn': self.write_lsn,
+            'replicas': [
+                {
+                    'name': replica.name,
+                    'healthy': replica.healthy,
+                    'lag': replica.lag,
+                    'replay_lsn': replica.replay_lsn,
+                    'error': replica.error
+                }
+                for replica in self.replicas
+            ]
+        }
+
+
+replicas = ReplicaRouter()
@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import date
+
+from flask import current_app
+
+from . import db
+from .cache import cache
+from .versions import table_versions
+
+
+class ReportCache:
+    """
+    Кэш результатов отчётов ({data, totals}) в памяти процесса. Ключ -
+    нормализованные параметры отчёта (Report.key), дата для отчётов от
+    CURRENT_DATE (ключ сменяется в полночь) и версии таблиц отчёта.
+
+    Версии должны быть общими для всех воркеров, иначе запись в одном из
+    них не сбросит отчёты в остальных. С Redis берутся поколения бэкенда
+    кэша ответов, для отчёта по одной библиотеке - поколения этой
+    библиотеки: запись абонемента в другой библиотеке его не сбрасывает
+    (см. ResponseCache.invalidate). Поколения бэкенда в памяти видны
+    только своему процессу, поэтому с ним ключ строится из версий таблиц
+    в БД (table_versions, их увеличивают триггеры) - общих, но без
+    разделения по библиотекам.
+
+    Кроме того, запись живёт не дольше REPORT_CACHE_TTL секунд: это
+    ограничивает устаревание, если версии меняются в обход триггеров
+    (например, при отключённых триггерах в benchmarks/synthetic.py).
+    Объём ограничен REPORT_CACHE_MAX_BYTES по размеру результата в JSON,
+    вытеснение LRU.
+    """
+
+    def __init__(self):
+        self.max_bytes = 64 * 1024 * 1024
+        self.ttl = 300
+        self.hits = Counter()
+        self.misses = Counter()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_bytes = app.config['REPORT_CACHE_MAX_BYTES']
+        self.ttl = app.config['REPORT_CACHE_TTL']
+
+    def _key(self, report, filters):
+        if cache.backend is not None and cache.backend.shared:
+            library = report.params(filters).get('library_id')
+            versions = cache.generations(report.tables, library)
+        else:
+            versions = table_versions(report.tables)
+        today = date.today().isoformat() if report.relative_date else None
+        return (report.key(filters), today, tuple(versions))
+
+    def fetch(self, report, filters):
+        if self.max_bytes <= 0:
+            return report.run(filters)
+        try:
+            key = self._key(report, filters)
+        except Exception as e:
+            # Без таблицы версий (schema/table_versions.sql не применён) отчёт не кэшируется
+            db.session.rollback()
+            current_app.logger.warning(f'Кэш отчётов недоступен: {e}')
+            return report.run(filters)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                self._entries.pop(key)
+                self._bytes -= entry[0]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits[report.name] += 1
+                return entry[1]
+            self.misses[report.name] += 1
+
+        result = report.run(filters)
+        size = len(json.dumps(result, default=str))
+        if size <= self.max_bytes:
+            with self._lock:
+                if key not in self._entries:
+                    self._entries[key] = (size, result, time.monotonic() + self.ttl)
+                    self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (evicted, _, _) = self._entries.popitem(last=False)
+                    self._bytes -= evicted
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': dict(self.hits),
+                'misses': dict(self.misses)
+            }
+
+
+report_cache = ReportCache()
@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g
+
+from .cache import cache
+from .reports import REPORTS, run_report
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class ReportJob:
+    def __init__(self, report, filters, key):
+        self.id = uuid.uuid4().hex
+        self.report = report
+        self.filters = filters
+        self.key = key
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+
+    def summary(self):
+        summary = {
+            'job_id': self.id,
+            'report': self.report,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.status == DONE:
+            summary['result'] = self.result
+        if self.status == FAILED:
+            summary['error'] = self.error
+        return summary
+
+
+class ReportJobs:
+    """
+    Асинхронное выполнение отчётов (POST /report/<name>?async=1). Отчёт
+    ставится в локальный пул потоков, клиент получает job_id и опрашивает
+    GET /report/jobs/<job_id>. Одинаковый отчёт (те же нормализованные
+    параметры), который уже в очереди или выполняется, не запускается
+    повторно: возвращается существующее задание. Состояние заданий
+    хранится в бэкенде кэша ответов (REPORT_JOB_TTL секунд), поэтому при
+    CACHE_BACKEND=redis результат доступен из любого воркера.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.ttl = 600
+        self._executor = None
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.ttl = app.config['REPORT_JOB_TTL']
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.config['REPORT_JOB_WORKERS'],
+            thread_name_prefix='report-job'
+        )
+
+    def submit(self, report, filters):
+        """Поставить отчёт в очередь; возвращает (задание, создано ли новое)."""
+        key = REPORTS[report].key(filters)
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None:
+                return job, False
+            job = ReportJob(report, filters, key)
+            self._in_flight[key] = job
+        self._store(job)
+        self._executor.submit(self._run, job)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self._in_flight.values():
+                if job.id == job_id:
+                    return job.summary()
+        stored = cache.backend.get(self._key(job_id))
+        return json.loads(stored) if stored is not None else None
+
+    def _run(self, job):
+        with self.app.app_context():
+            # Задание идёт на реплику так же, как синхронный отчёт
+            from .replicas import replicas
+            g.db_replica = replicas.choose() if replicas.replicas else None
+
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = run_report(job.report, job.filters)
+                job.status = DONE
+            except Exception as e:
+                current_app.logger.exception(f'Ошибка отчёта {job.report} (задание {job.id})')
+                job.error = str(e)
+                job.status = FAILED
+            job.finished_at = time.time()
+
+            try:
+                self._store(job)
+            finally:
+                with self._lock:
+                    self._in_flight.pop(job.key, None)
+
+    def _key(self, job_id):
+        return f'report_job:{job_id}'
+
+    def _store(self, job):
+        try:
+            cache.backend.set(self._key(job.id), current_app.json.dumps(job.summary()).encode('utf-8'), self.ttl)
+        except Exception as e:
+            current_app.logger.warning(f'Не удалось сохранить задание {job.id}: {e}')
+
+
+report_jobs = ReportJobs()
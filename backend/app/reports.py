@@ -0,0 +1,370 @@
+import json
+
+from .queries import queries
+from .report_cache import report_cache
+from .rollup import rollup
+
+# Источник для отчётов по выдаче: закрытые дни из loan_daily_stats,
+# остальные (сегодняшние и ещё не закрытые) напрямую из loans.
+# Агрегаты поддерживаются schema/loan_daily_stats.sql, дни закрывает
+# flask rollup backfill и перед отчётами app/rollup.py
+LOAN_STATS_SOURCE = '''
+    state AS (
+        SELECT closed_through FROM loan_daily_stats_state
+    ),
+    source AS (
+        SELECT
+            s.library_id,
+            s.genre_id,
+            s.loans_count,
+            s.returned_count,
+            s.deposit_sum,
+            s.deposit_count,
+            s.reader_ids
+        FROM loan_daily_stats s
+        CROSS JOIN state
+        WHERE s.day BETWEEN {start} AND {end}
+        AND s.day <= state.closed_through
+        {rollup_filter}
+        UNION ALL
+        SELECT
+            l.library_id,
+            b.genre_id,
+            1,
+            (l.return_date IS NOT NULL)::int,
+            l.deposit,
+            (l.deposit IS NOT NULL)::int,
+            ARRAY[l.reader_id]
+        FROM loans l
+        JOIN books b ON l.library_id = b.library_id AND l.book_id = b.book_id
+        CROSS JOIN state
+        WHERE l.issue_date BETWEEN {start} AND {end}
+        AND (state.closed_through IS NULL OR l.issue_date > state.closed_through)
+        {loans_filter}
+    )
+'''
+
+
+def loan_stats_source(start, end, by_library):
+    if by_library:
+        return LOAN_STATS_SOURCE.format(
+            start=start,
+            end=end,
+            rollup_filter='AND s.library_id = :library_id',
+            loans_filter='AND l.library_id = :library_id'
+        )
+    return LOAN_STATS_SOURCE.format(start=start, end=end, rollup_filter='', loans_filter='')
+
+
+class Report:
+    """
+    Отчёт, который строится одним запросом. GROUPING SETS (детализация, ())
+    считает строки отчёта и итоговую строку за один проход по данным;
+    итоговая строка (is_total) отделяется от детализации при разборе.
+
+    params(filters) возвращает параметры запроса, build(params) - шаблон
+    с местами {is_total}, {group_by} и {order}; состав запроса зависит
+    только от набора параметров и сортировки, поэтому каждый такой вариант
+    компилируется и подготавливается один раз (queries.variant).
+    columns - колонки строк отчёта, totals - соответствие колонок итоговой
+    строки ключам totals в ответе. tables - таблицы, от которых зависит
+    результат, relative_date - отчёт считается от CURRENT_DATE (для кэша),
+    rollup - отчёт читает loan_daily_stats (loan_stats_source).
+    """
+
+    def __init__(self, name, params, build, group_by, columns, totals, sort_columns, default_sort,
+                 tables=(), relative_date=False, rollup=False):
+        self.name = name
+        self.params = params
+        self.build = build
+        self.group_by = group_by
+        self.columns = columns
+        self.totals = totals
+        self.sort_columns = sort_columns
+        self.default_sort = default_sort
+        self.tables = tables
+        self.relative_date = relative_date
+        self.rollup = rollup
+
+    def order(self, filters):
+        column = self.sort_columns.get(filters.get('sort_by'), self.default_sort)
+        direction = 'ASC' if str(filters.get('sort_order', 'desc')).lower() == 'asc' else 'DESC'
+        return f'{column} {direction}'
+
+    def key(self, filters):
+        """Нормализованные параметры: одинаковые по смыслу запросы дают один ключ."""
+        return json.dumps([self.name, self.params(filters), self.order(filters)], sort_keys=True, default=str)
+
+    def query(self, params, order, grouping_sets=None):
+        """Текст запроса; grouping_sets переопределяет наборы группировки."""
+        if grouping_sets is None:
+            grouping_sets = [self.group_by, ()]
+        group_by = 'GROUPING SETS ({})'.format(', '.join(
+            '({})'.format(', '.join(keys)) for keys in grouping_sets
+        ))
+        # Без набора детализации GROUPING() неприменим: все строки итоговые
+        if any(grouping_sets):
+            is_total = 'GROUPING({}) = 1'.format(self.group_by[0])
+        else:
+            is_total = 'TRUE'
+        return self.build(params).format(is_total=is_total, group_by=group_by, order=order)
+
+    def sql(self, filters, grouping_sets=None):
+        params = self.params(filters)
+        return self.query(params, self.order(filters), grouping_sets), params
+
+    def run(self, filters):
+        params = self.params(filters)
+        order = self.order(filters)
+        query = queries.variant(
+            f'report:{self.name}',
+            (tuple(sorted(params)), order),
+            lambda: self.query(params, order)
+        )
+        return self.collect(query.execute(params))
+
+    def collect(self, rows):
+        """Строки отчёта и итоги из результата запроса (строки с доступом по имени колонки)."""
+        data = []
+        totals = {}
+        for row in rows:
+            if row['is_total']:
+                totals = {key: row[column] for column, key in self.totals.items()}
+            else:
+                data.append({column: row[column] for column in self.columns})
+        return {'data': data, 'totals': totals}
+
+
+def int_filter(filters, name, default=None):
+    """
+    Целочисленный фильтр отчёта. Форма присылает library_id строкой из
+    <select>; psycopg2 подставлял её как литерал, а asyncpg (asgi.py)
+    проверяет типы параметров, поэтому значения приводятся здесь.
+    """
+    value = filters.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Фильтр {name} должен быть целым числом')
+
+
+def loans_by_period_params(filters):
+    params = {'start_date': filters.get('start_date'), 'end_date': filters.get('end_date')}
+    library_id = int_filter(filters, 'library_id')
+    if library_id:
+        params['library_id'] = library_id
+    return params
+
+
+def build_loans_by_period(params):
+    source = loan_stats_source('CAST(:start_date AS DATE)', 'CAST(:end_date AS DATE)', 'library_id' in params)
+
+    query = '''
+        WITH ''' + source + ''',
+        loan_stats AS (
+            SELECT
+                {is_total} as is_total,
+                lib.name as library_name,
+                g.name as genre_name,
+                COALESCE(SUM(src.loans_count), 0) as loans_count,
+                COALESCE(SUM(src.returned_count), 0) as returned_count,
+                SUM(src.deposit_sum) as total_deposit,
+                SUM(src.deposit_sum) / NULLIF(SUM(src.deposit_count), 0) as avg_deposit
+            FROM source src
+            JOIN libraries lib ON src.library_id = lib.library_id
+            JOIN genres g ON src.genre_id = g.genre_id
+            GROUP BY {group_by}
+        )
+        SELECT
+            is_total,
+            library_name,
+            genre_name,
+            loans_count,
+            returned_count,
+            loans_count - returned_count as not_returned_count,
+            total_deposit,
+            ROUND(avg_deposit::numeric, 2) as avg_deposit,
+            ROUND((returned_count::float / NULLIF(loans_count, 0) * 100)::numeric, 2) as return_rate
+        FROM loan_stats
+        ORDER BY is_total, {order}
+    '''
+    return query
+
+
+def overdue_loans_params(filters):
+    params = {}
+    min_days_overdue = int_filter(filters, 'min_days_overdue', 0)
+    if min_days_overdue > 0:
+        params['min_days_overdue'] = min_days_overdue
+    library_id = int_filter(filters, 'library_id')
+    if library_id:
+        params['library_id'] = library_id
+    return params
+
+
+def build_overdue_loans(params):
+    conditions = ''
+    if 'min_days_overdue' in params:
+        conditions += ' AND (CURRENT_DATE - l.due_date) >= :min_days_overdue'
+    if 'library_id' in params:
+        conditions += ' AND l.library_id = :library_id'
+
+    query = '''
+        SELECT
+            {is_total} as is_total,
+            lib.name as library_name,
+            r.full_name as reader_name,
+            COUNT(*) as overdue_books_count,
+            COUNT(DISTINCT l.reader_id) as readers_count,
+            SUM(l.deposit) as total_deposit,
+            MAX(CURRENT_DATE - l.due_date) as max_days_overdue,
+            ROUND(AVG(CURRENT_DATE - l.due_date)::numeric, 1) as avg_days_overdue
+        FROM loans l
+        JOIN libraries lib ON l.library_id = lib.library_id
+        JOIN readers r ON l.reader_id = r.reader_id
+        WHERE l.return_date IS NULL
+        AND l.due_date < CURRENT_DATE
+        ''' + conditions + '''
+        GROUP BY {group_by}
+        ORDER BY is_total, {order}
+    '''
+    return query
+
+
+def genre_popularity_params(filters):
+    params = {'period_months': int_filter(filters, 'period_months', 12)}
+    library_id = int_filter(filters, 'library_id')
+    if library_id:
+        params['library_id'] = library_id
+    return params
+
+
+def build_genre_popularity(params):
+    source = loan_stats_source(
+        '(CURRENT_DATE - make_interval(months => :period_months))::date',
+        "'infinity'::date",
+        'library_id' in params
+    )
+
+    # Каждая строка источника разворачивается по своим читателям; суммы
+    # берутся только с первой развёрнутой строки (ord = 1), чтобы не умножаться
+    query = '''
+        WITH ''' + source + ''',
+        genre_stats AS (
+            SELECT
+                {is_total} as is_total,
+                lib.name as library_name,
+                g.name as genre_name,
+                COALESCE(SUM(src.loans_count) FILTER (WHERE r.ord = 1), 0) as loan_count,
+                COUNT(DISTINCT r.reader_id) as unique_readers,
+                ROUND((SUM(src.deposit_sum) FILTER (WHERE r.ord = 1)
+                    / NULLIF(SUM(src.deposit_count) FILTER (WHERE r.ord = 1), 0))::numeric, 2) as avg_deposit,
+                COALESCE(SUM(src.loans_count - src.returned_count) FILTER (WHERE r.ord = 1), 0) as current_loans
+            FROM source src
+            CROSS JOIN LATERAL unnest(src.reader_ids) WITH ORDINALITY AS r(reader_id, ord)
+            JOIN libraries lib ON src.library_id = lib.library_id
+            JOIN genres g ON src.genre_id = g.genre_id
+            GROUP BY {group_by}
+        )
+        SELECT
+            is_total,
+            library_name,
+            genre_name,
+            loan_count,
+            unique_readers,
+            avg_deposit,
+            current_loans,
+            ROUND((current_loans::float / NULLIF(loan_count, 0) * 100)::numeric, 2) as current_loan_rate,
+            ROUND((unique_readers::float / NULLIF(loan_count, 0) * 100)::numeric, 2) as reader_diversity_rate
+        FROM genre_stats
+        ORDER BY is_total, {order}
+    '''
+    return query
+
+
+REPORTS = {
+    'loans-by-period': Report(
+        'loans-by-period',
+        loans_by_period_params,
+        build_loans_by_period,
+        group_by=('src.library_id', 'lib.name', 'src.genre_id', 'g.name'),
+        columns=[
+            'library_name', 'genre_name', 'loans_count', 'returned_count',
+            'not_returned_count', 'total_deposit', 'avg_deposit', 'return_rate'
+        ],
+        totals={
+            'loans_count': 'total_loans',
+            'returned_count': 'total_returned',
+            'not_returned_count': 'total_not_returned',
+            'total_deposit': 'total_deposit',
+            'avg_deposit': 'avg_deposit',
+            'return_rate': 'total_return_rate'
+        },
+        sort_columns={
+            'loans_count': 'loans_count',
+            'return_rate': 'return_rate',
+            'returned_count': 'returned_count',
+            'total_deposit': 'total_deposit'
+        },
+        default_sort='loans_count',
+        tables=('loans', 'books', 'libraries', 'genres'),
+        rollup=True
+    ),
+    'overdue-loans': Report(
+        'overdue-loans',
+        overdue_loans_params,
+        build_overdue_loans,
+        group_by=('l.library_id', 'lib.name', 'r.reader_id', 'r.full_name'),
+        columns=[
+            'library_name', 'reader_name', 'overdue_books_count',
+            'total_deposit', 'max_days_overdue', 'avg_days_overdue'
+        ],
+        totals={
+            'readers_count': 'total_readers_overdue',
+            'overdue_books_count': 'total_books_overdue',
+            'total_deposit': 'total_deposit_held',
+            'avg_days_overdue': 'avg_days_overdue'
+        },
+        sort_columns={
+            'days_overdue': 'max_days_overdue',
+            'overdue_books_count': 'overdue_books_count'
+        },
+        default_sort='overdue_books_count',
+        tables=('loans', 'libraries', 'readers'),
+        relative_date=True
+    ),
+    'genre-popularity': Report(
+        'genre-popularity',
+        genre_popularity_params,
+        build_genre_popularity,
+        group_by=('src.library_id', 'lib.name', 'src.genre_id', 'g.name'),
+        columns=[
+            'library_name', 'genre_name', 'loan_count', 'unique_readers', 'avg_deposit',
+            'current_loans', 'current_loan_rate', 'reader_diversity_rate'
+        ],
+        totals={
+            'loan_count': 'total_loans',
+            'unique_readers': 'total_unique_readers',
+            'avg_deposit': 'avg_deposit',
+            'current_loans': 'total_current_loans'
+        },
+        sort_columns={
+            'loan_count': 'loan_count',
+            'unique_readers': 'unique_readers',
+            'current_loan_rate': 'current_loan_rate'
+        },
+        default_sort='loan_count',
+        tables=('loans', 'books', 'libraries', 'genres'),
+        relative_date=True,
+        rollup=True
+    )
+}
+
+
+def run_report(name, filters):
+    report = REPORTS[name]
+    if report.rollup:
+        rollup.close_if_due()
+    return report_cache.fetch(report, filters)
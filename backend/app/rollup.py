@@ -0,0 +1,64 @@
+import threading
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import text
+
+from . import db
+
+# Ключ pg_try_advisory_xact_lock: день закрывает один воркер, остальные не ждут
+CLOSE_LOCK_KEY = 7_140_001
+
+
+class RollupCloser:
+    """
+    Ленивое закрытие дней в loan_daily_stats (schema/loan_daily_stats.sql).
+    Перед отчётом по выдаче воркер раз в день проверяет, закрыт ли
+    вчерашний день, и если нет - закрывает его в отдельной короткой
+    транзакции на основной базе под рекомендательной блокировкой. Кто не
+    получил блокировку, не ждёт: до закрытия отчёты читают незакрытые дни
+    из loans, результат тот же, только медленнее.
+
+    Первичное заполнение (closed_through IS NULL) читает все абонементы,
+    поэтому на пути запроса не делается: его выполняет flask rollup
+    backfill. Асинхронное приложение (asgi.py) дни не закрывает; если
+    работает только оно, backfill запускается по расписанию (см. README).
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.checked_day = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config['ROLLUP_AUTO_CLOSE']
+
+    def close_if_due(self):
+        today = date.today()
+        if not self.enabled or self.checked_day == today:
+            return
+        # Один поток процесса проверяет, остальные идут дальше без ожидания
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._close():
+                self.checked_day = today
+        except Exception as e:
+            current_app.logger.warning(f'Не удалось закрыть дни агрегатов: {e}')
+        finally:
+            self._lock.release()
+
+    def _close(self):
+        # Отдельное соединение с основной базой: запрос может читать с реплики
+        with db.engine.begin() as connection:
+            if not connection.execute(
+                text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': CLOSE_LOCK_KEY}
+            ).scalar():
+                return False
+            closed = connection.execute(text('SELECT closed_through FROM loan_daily_stats_state')).scalar()
+            if closed is not None:
+                connection.execute(text('SELECT close_loan_daily_stats(CURRENT_DATE - 1)'))
+            return True
+
+
+rollup = RollupCloser()
@@ -1,190 +1,368 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request
+from sqlalchemy.exc import IntegrityError
 from .. import db
+from ..batch import BATCH_TABLES, batch_response
+from ..book_ids import book_ids
+from ..bulk import bulk_response, is_foreign_key_violation
+from ..cache import cache
+from ..columnar import COLUMNAR_FORMATS, columnar_response, require_pyarrow
+from ..compression import compression
+from ..listing import ListSpec, distinct_response, list_response
+from ..lookup import LOOKUPS, lookup_response
+from ..metrics import metrics
+from ..pool import pool_monitor
+from ..queries import queries
+from ..replicas import read_only, replicas
+from ..report_cache import report_cache
+from ..report_jobs import report_jobs
+from ..reports import REPORTS, run_report
+from ..search import autocomplete_response, search_response
+from ..versions import conditional, conditional_response
 
 bp = Blueprint('main', __name__)
+bp.after_request(compression.after_request)
+
+LIBRARIES = ListSpec(
+    'SELECT library_id, name, address FROM libraries {where}',
+    columns={
+        'library_id': 'library_id',
+        'name': 'name',
+        'address': 'address'
+    },
+    order=[('name', 'asc'), ('library_id', 'asc')],
+    tables=['libraries'],
+    nullable=['address']
+)
 
 @bp.route('/libraries', methods=['GET'])
+@conditional(*LIBRARIES.tables)
+@cache.cached('libraries')
 def get_libraries():
     try:
-        result = db.session.execute('SELECT * FROM libraries ORDER BY name')
-        libraries = [dict(row) for row in result]
-        return jsonify(libraries)
+        return list_response(LIBRARIES)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+GENRES = ListSpec(
+    'SELECT genre_id, name FROM genres {where}',
+    columns={
+        'genre_id': 'genre_id',
+        'name': 'name'
+    },
+    order=[('name', 'asc'), ('genre_id', 'asc')],
+    tables=['genres']
+)
+
 @bp.route('/genres', methods=['GET'])
+@conditional(*GENRES.tables)
+@cache.cached('genres')
 def get_genres():
     try:
-        result = db.session.execute('SELECT * FROM genres ORDER BY name')
-        genres = [dict(row) for row in result]
-        return jsonify(genres)
+        return list_response(GENRES)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+READERS = ListSpec(
+    'SELECT reader_id, full_name, address, phone FROM readers {where}',
+    columns={
+        'reader_id': 'reader_id',
+        'full_name': 'full_name',
+        'address': 'address',
+        'phone': 'phone'
+    },
+    order=[('full_name', 'asc'), ('reader_id', 'asc')],
+    tables=['readers'],
+    nullable=['address', 'phone']
+)
+
 @bp.route('/readers', methods=['GET'])
+@conditional(*READERS.tables)
 def get_readers():
     try:
-        result = db.session.execute('SELECT * FROM readers ORDER BY full_name')
-        readers = [dict(row) for row in result]
-        return jsonify(readers)
+        return list_response(READERS)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+LOANS = ListSpec(
+    '''
+        SELECT 
+            l.library_id,
+            lib.name as library_name,
+            l.book_id,
+            b.title as book_title,
+            l.reader_id,
+            r.full_name as reader_name,
+            TO_CHAR(l.issue_date, 'YYYY-MM-DD') as issue_date,
+            TO_CHAR(l.due_date, 'YYYY-MM-DD') as due_date,
+            CASE 
+                WHEN l.return_date IS NULL THEN 'не возвращена'
+                ELSE TO_CHAR(l.return_date, 'YYYY-MM-DD')
+            END as return_date,
+            l.deposit
+        FROM loans l
+        JOIN libraries lib ON l.library_id = lib.library_id
+        JOIN books b ON l.library_id = b.library_id AND l.book_id = b.book_id
+        JOIN readers r ON l.reader_id = r.reader_id
+        {where}
+    ''',
+    columns={
+        'library_id': 'l.library_id',
+        'library_name': 'lib.name',
+        'book_id': 'l.book_id',
+        'book_title': 'b.title',
+        'reader_id': 'l.reader_id',
+        'reader_name': 'r.full_name',
+        'issue_date': 'l.issue_date',
+        'due_date': 'l.due_date',
+        'return_date': "CASE WHEN l.return_date IS NULL THEN 'не возвращена' "
+                       "ELSE TO_CHAR(l.return_date, 'YYYY-MM-DD') END",
+        'deposit': 'l.deposit'
+    },
+    order=[
+        ('issue_date', 'desc'),
+        ('library_id', 'desc'),
+        ('book_id', 'desc'),
+        ('reader_id', 'desc')
+    ],
+    tables=['loans', 'libraries', 'books', 'readers'],
+    nullable=['due_date', 'deposit']
+)
+
 @bp.route('/loans', methods=['GET'])
+@conditional(*LOANS.tables)
 def get_loans():
     try:
-        query = '''
-            SELECT 
-                l.library_id,
-                lib.name as library_name,
-                l.book_id,
-                b.title as book_title,
-                l.reader_id,
-                r.full_name as reader_name,
-                TO_CHAR(l.issue_date, 'YYYY-MM-DD') as issue_date,
-                TO_CHAR(l.due_date, 'YYYY-MM-DD') as due_date,
-                CASE 
-                    WHEN l.return_date IS NULL THEN 'не возвращена'
-                    ELSE TO_CHAR(l.return_date, 'YYYY-MM-DD')
-                END as return_date,
-                l.deposit
-            FROM loans l
-            JOIN libraries lib ON l.library_id = lib.library_id
-            JOIN books b ON l.library_id = b.library_id AND l.book_id = b.book_id
-            JOIN readers r ON l.reader_id = r.reader_id
-            ORDER BY l.issue_date DESC
-        '''
-        result = db.session.execute(query)
-        loans = [dict(row) for row in result]
-        return jsonify(loans)
+        return list_response(LOANS)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+ADD_LOAN = queries.register('add_loan', '''
+        INSERT INTO loans (
+            library_id, book_id, reader_id,
+            issue_date, due_date, return_date, deposit
+        ) VALUES (
+            :library_id, :book_id, :reader_id,
+            :issue_date, :due_date, NULL, :deposit
+        )
+    ''')
+
 @bp.route('/add/loan', methods=['POST'])
 def add_loan():
     try:
         data = request.json
-        query = '''
-            INSERT INTO loans (
-                library_id, book_id, reader_id,
-                issue_date, due_date, return_date, deposit
-            ) VALUES (
-                :library_id, :book_id, :reader_id,
-                :issue_date, :due_date, NULL, :deposit
-            )
-        '''
-        db.session.execute(query, data)
+        ADD_LOAN.execute(data)
         db.session.commit()
+        cache.invalidate('loans', libraries=[data['library_id']])
         return jsonify({'message': 'Абонемент успешно добавлен'}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+AVAILABLE_BOOKS = ListSpec(
+    '''
+        SELECT 
+            b.library_id,
+            b.book_id,
+            b.title as book_title,
+            b.author as book_author,
+            l.name as library_name,
+            a.available_quantity,
+            b.quantity as total_quantity
+        FROM book_availability a
+        JOIN books b ON a.library_id = b.library_id AND a.book_id = b.book_id
+        JOIN libraries l ON b.library_id = l.library_id
+        {where}
+    ''',
+    columns={
+        'library_id': 'b.library_id',
+        'book_id': 'b.book_id',
+        'book_title': 'b.title',
+        'book_author': 'b.author',
+        'library_name': 'l.name',
+        'available_quantity': 'a.available_quantity',
+        'total_quantity': 'b.quantity'
+    },
+    order=[
+        ('library_name', 'asc'),
+        ('book_title', 'asc'),
+        ('library_id', 'asc'),
+        ('book_id', 'asc')
+    ],
+    tables=['book_availability', 'books', 'libraries'],
+    # Счётчик поддерживается триггерами из schema/availability.sql
+    conditions=['a.available_quantity > 0']
+)
+
 @bp.route('/available-books', methods=['GET'])
+@conditional(*AVAILABLE_BOOKS.tables)
 def get_available_books():
     try:
-        query = '''
-            WITH book_availability AS (
-                SELECT 
-                    b.title as book_title,
-                    b.author as book_author,
-                    l.name as library_name,
-                    b.quantity - COALESCE(COUNT(ln.book_id) FILTER (WHERE ln.return_date IS NULL), 0) as available_quantity,
-                    b.quantity as total_quantity
-                FROM books b
-                JOIN libraries l ON b.library_id = l.library_id
-                LEFT JOIN loans ln ON b.library_id = ln.library_id AND b.book_id = ln.book_id
-                GROUP BY b.library_id, b.book_id, b.title, b.author, l.name, b.quantity
-            )
-            SELECT *
-            FROM book_availability
-            WHERE available_quantity > 0
-            ORDER BY library_name, book_title
-        '''
-        result = db.session.execute(query)
-        books = [dict(row) for row in result]
-        return jsonify(books)
+        return list_response(AVAILABLE_BOOKS)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+ADD_READER = queries.register('add_reader', '''
+        INSERT INTO readers (full_name, address, phone)
+        VALUES (:full_name, :address, :phone)
+        RETURNING reader_id
+    ''')
+
 @bp.route('/add/reader', methods=['POST'])
 def add_reader():
     try:
         data = request.json
-        query = '''
-            INSERT INTO readers (full_name, address, phone)
-            VALUES (:full_name, :address, :phone)
-            RETURNING reader_id
-        '''
-        result = db.session.execute(query, data)
+        result = ADD_READER.execute(data)
         reader_id = result.scalar()
         db.session.commit()
+        cache.invalidate('readers')
         return jsonify({'message': 'Читатель успешно добавлен', 'reader_id': reader_id}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+ADD_LIBRARY = queries.register('add_library', '''
+        INSERT INTO libraries (name, address)
+        VALUES (:name, :address)
+        RETURNING library_id
+    ''')
+
 @bp.route('/add/library', methods=['POST'])
 def add_library():
     try:
         data = request.json
-        query = '''
-            INSERT INTO libraries (name, address)
-            VALUES (:name, :address)
-            RETURNING library_id
-        '''
-        result = db.session.execute(query, data)
+        result = ADD_LIBRARY.execute(data)
         library_id = result.scalar()
         db.session.commit()
+        cache.invalidate('libraries')
         return jsonify({'message': 'Библиотека успешно добавлена', 'library_id': library_id}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/delete/reader/<int:reader_id>', methods=['DELETE'])
-def delete_reader(reader_id):
+@bp.route('/bulk/<table>', methods=['POST'])
+def bulk_import(table):
     try:
-        # Проверяем наличие активных абонементов
-        check_query = '''
+        return bulk_response(table)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/batch', methods=['POST'])
+def batch():
+    try:
+        return batch_response()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+DELETE_READER = queries.register('delete_reader', '''
+        WITH target AS (
+            SELECT reader_id FROM readers
+            WHERE reader_id = :reader_id
+            FOR UPDATE
+        ),
+        blocked AS (
             SELECT 1 FROM loans
             WHERE reader_id = :reader_id
             AND return_date IS NULL
-        '''
-        result = db.session.execute(check_query, {'reader_id': reader_id})
-        if result.fetchone():
-            return jsonify({'error': 'Невозможно удалить читателя с активными абонементами'}), 400
+            LIMIT 1
+        ),
+        deleted AS (
+            DELETE FROM readers r
+            USING target
+            WHERE r.reader_id = target.reader_id
+            AND NOT EXISTS (SELECT 1 FROM blocked)
+            RETURNING r.reader_id
+        )
+        SELECT CASE
+            WHEN EXISTS (SELECT 1 FROM blocked) THEN 'blocked'
+            WHEN NOT EXISTS (SELECT 1 FROM deleted) THEN 'not_found'
+            ELSE 'deleted'
+        END
+    ''')
 
-        query = 'DELETE FROM readers WHERE reader_id = :reader_id'
-        result = db.session.execute(query, {'reader_id': reader_id})
-        if result.rowcount == 0:
+@bp.route('/delete/reader/<int:reader_id>', methods=['DELETE'])
+def delete_reader(reader_id):
+    try:
+        # Проверка и удаление одним оператором; строка блокируется (FOR UPDATE).
+        # Ссылку, зафиксированную параллельно, пока оператор ждал блокировку,
+        # проверка не видит (снимок оператора старше) - тогда удаление
+        # отклоняет внешний ключ, и ответ тот же, что при проверке
+        status = DELETE_READER.execute({'reader_id': reader_id}).scalar()
+        if status == 'blocked':
+            db.session.rollback()
+            return jsonify({'error': 'Невозможно удалить читателя с активными абонементами'}), 400
+        if status == 'not_found':
+            db.session.rollback()
             return jsonify({'error': 'Читатель не найден'}), 404
 
         db.session.commit()
+        cache.invalidate('readers')
         return jsonify({'message': 'Читатель успешно удален'}), 200
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_foreign_key_violation(e):
+            return jsonify({'error': 'Невозможно удалить читателя с активными абонементами'}), 400
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+DELETE_LIBRARY = queries.register('delete_library', '''
+        WITH target AS (
+            SELECT library_id FROM libraries
+            WHERE library_id = :library_id
+            FOR UPDATE
+        ),
+        blocked AS (
+            SELECT 1 FROM books
+            WHERE library_id = :library_id
+            LIMIT 1
+        ),
+        deleted AS (
+            DELETE FROM libraries l
+            USING target
+            WHERE l.library_id = target.library_id
+            AND NOT EXISTS (SELECT 1 FROM blocked)
+            RETURNING l.library_id
+        )
+        SELECT CASE
+            WHEN EXISTS (SELECT 1 FROM blocked) THEN 'blocked'
+            WHEN NOT EXISTS (SELECT 1 FROM deleted) THEN 'not_found'
+            ELSE 'deleted'
+        END
+    ''')
+
 @bp.route('/delete/library/<int:library_id>', methods=['DELETE'])
 def delete_library(library_id):
     try:
-        # Проверяем наличие книг в библиотеке
-        check_query = 'SELECT 1 FROM books WHERE library_id = :library_id'
-        result = db.session.execute(check_query, {'library_id': library_id})
-        if result.fetchone():
+        # Проверка и удаление одним оператором; строка блокируется (FOR UPDATE).
+        # Ссылку, зафиксированную параллельно, пока оператор ждал блокировку,
+        # проверка не видит (снимок оператора старше) - тогда удаление
+        # отклоняет внешний ключ, и ответ тот же, что при проверке
+        status = DELETE_LIBRARY.execute({'library_id': library_id}).scalar()
+        if status == 'blocked':
+            db.session.rollback()
             return jsonify({'error': 'Невозможно удалить библиотеку, содержащую книги'}), 400
-
-        query = 'DELETE FROM libraries WHERE library_id = :library_id'
-        result = db.session.execute(query, {'library_id': library_id})
-        if result.rowcount == 0:
+        if status == 'not_found':
+            db.session.rollback()
             return jsonify({'error': 'Библиотека не найдена'}), 404
 
         db.session.commit()
+        cache.invalidate('libraries')
         return jsonify({'message': 'Библиотека успешно удалена'}), 200
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_foreign_key_violation(e):
+            return jsonify({'error': 'Невозможно удалить библиотеку, содержащую книги'}), 400
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Редактируемые через /edit таблицы: ключ строки и допустимые колонки
+# (как в /batch), колонка подставляется в текст запроса только из этого списка
+EDITABLE_TABLES = ('books', 'readers', 'libraries')
+
 @bp.route('/edit/<table>', methods=['PUT'])
 def edit_data(table):
     try:
@@ -192,230 +370,280 @@ def edit_data(table):
         column = data['column']
         value = data['value']
         row_data = data['rowData']
-        
-        if table == 'books':
-            query = f'''
-                UPDATE books
-                SET {column} = :value
-                WHERE library_id = :library_id AND book_id = :book_id
-            '''
-            params = {
-                'value': value,
-                'library_id': row_data['library_id'],
-                'book_id': row_data['book_id']
-            }
-        elif table == 'readers':
-            query = f'''
-                UPDATE readers
-                SET {column} = :value
-                WHERE reader_id = :reader_id
-            '''
-            params = {
-                'value': value,
-                'reader_id': row_data['reader_id']
-            }
-        elif table == 'libraries':
-            query = f'''
-                UPDATE libraries
-                SET {column} = :value
-                WHERE library_id = :library_id
-            '''
-            params = {
-                'value': value,
-                'library_id': row_data['library_id']
-            }
-        else:
+
+        if table not in EDITABLE_TABLES:
             return jsonify({'error': 'Таблица не поддерживает редактирование'}), 400
-            
-        result = db.session.execute(query, params)
+        spec = BATCH_TABLES[table]
+        if column not in spec.columns:
+            return jsonify({'error': f'Недопустимое поле: {column}'}), 400
+
+        key_condition = ' AND '.join(f'{name} = :{name}' for name in spec.key)
+        query = queries.variant(f'edit_{table}', column, lambda: f'''
+            UPDATE {table}
+            SET {column} = :value
+            WHERE {key_condition}
+        ''')
+        params = {'value': value}
+        params.update({name: row_data[name] for name in spec.key})
+
+        result = query.execute(params)
         if result.rowcount == 0:
             return jsonify({'error': 'Запись не найдена'}), 404
             
         db.session.commit()
+        cache.invalidate(table, libraries=[row_data['library_id']] if 'library_id' in spec.key else None)
         return jsonify({'message': 'Данные успешно обновлены'}), 200
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+BOOKS = ListSpec(
+    '''
+        SELECT 
+            b.library_id,
+            b.book_id,
+            b.genre_id,
+            g.name as genre_name,
+            b.author,
+            b.title,
+            b.publisher,
+            b.publication_place,
+            b.publication_year,
+            b.quantity,
+            l.name as library_name
+        FROM books b
+        JOIN libraries l ON b.library_id = l.library_id
+        JOIN genres g ON b.genre_id = g.genre_id
+        {where}
+    ''',
+    columns={
+        'library_id': 'b.library_id',
+        'book_id': 'b.book_id',
+        'genre_id': 'b.genre_id',
+        'genre_name': 'g.name',
+        'author': 'b.author',
+        'title': 'b.title',
+        'publisher': 'b.publisher',
+        'publication_place': 'b.publication_place',
+        'publication_year': 'b.publication_year',
+        'quantity': 'b.quantity',
+        'library_name': 'l.name'
+    },
+    order=[
+        ('title', 'asc'),
+        ('author', 'asc'),
+        ('library_id', 'asc'),
+        ('book_id', 'asc')
+    ],
+    tables=['books', 'libraries', 'genres'],
+    nullable=['publisher', 'publication_place', 'publication_year'],
+    # ?q= по текстовым полям книги - выражение индекса books_search_trgm_idx
+    search=['title', 'author', 'publisher', 'publication_place']
+)
+
 @bp.route('/books', methods=['GET'])
+@conditional(*BOOKS.tables)
 def get_books():
     try:
-        query = '''
-            SELECT 
-                b.library_id,
-                b.book_id,
-                b.genre_id,
-                g.name as genre_name,
-                b.author,
-                b.title,
-                b.publisher,
-                b.publication_place,
-                b.publication_year,
-                b.quantity,
-                l.name as library_name
-            FROM books b
-            JOIN libraries l ON b.library_id = l.library_id
-            JOIN genres g ON b.genre_id = g.genre_id
-            ORDER BY b.title, b.author
-        '''
-        result = db.session.execute(query)
-        books = [dict(row) for row in result]
-        return jsonify(books)
+        return list_response(BOOKS)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+ADD_BOOK_CHECK = queries.register('add_book_check', '''
+        SELECT 1 FROM books 
+        WHERE library_id = :library_id 
+        AND title = :title 
+        AND author = :author 
+        AND publication_year = :publication_year
+    ''')
+
+ADD_BOOK_INSERT = queries.register('add_book_insert', '''
+        INSERT INTO books (
+            library_id, book_id, genre_id, author, title,
+            publisher, publication_place, publication_year, quantity
+        ) VALUES (
+            :library_id, :book_id, :genre_id, :author, :title,
+            :publisher, :publication_place, :publication_year, :quantity
+        )
+    ''')
+
 @bp.route('/add/book', methods=['POST'])
 def add_book():
     try:
         data = request.json
         
         # Проверяем уникальность комбинации library_id, title, author, publication_year
-        check_query = '''
-            SELECT 1 FROM books 
-            WHERE library_id = :library_id 
-            AND title = :title 
-            AND author = :author 
-            AND publication_year = :publication_year
-        '''
-        result = db.session.execute(check_query, data)
+        result = ADD_BOOK_CHECK.execute(data)
         if result.fetchone():
             return jsonify({'error': 'Такая книга уже существует в этой библиотеке'}), 400
 
-        # Плучаем следующий book_id для данной библиот��ки
-        next_id_query = '''
-            SELECT COALESCE(MAX(book_id), 0) + 1
-            FROM books
-            WHERE library_id = :library_id
-        '''
-        result = db.session.execute(next_id_query, {'library_id': data['library_id']})
-        next_book_id = result.scalar()
+        # Следующий book_id библиотеки из счётчика (schema/book_id_counters.sql)
+        next_book_id = book_ids.allocate(data['library_id'])
 
         # Добавляем книгу
-        insert_query = '''
-            INSERT INTO books (
-                library_id, book_id, genre_id, author, title,
-                publisher, publication_place, publication_year, quantity
-            ) VALUES (
-                :library_id, :book_id, :genre_id, :author, :title,
-                :publisher, :publication_place, :publication_year, :quantity
-            )
-        '''
-        db.session.execute(insert_query, {**data, 'book_id': next_book_id})
+        ADD_BOOK_INSERT.execute({**data, 'book_id': next_book_id})
         db.session.commit()
+        cache.invalidate('books', libraries=[data['library_id']])
         return jsonify({'message': 'Книга успешно добавлена'}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/delete/book/<int:library_id>/<int:book_id>', methods=['DELETE'])
-def delete_book(library_id, book_id):
-    try:
-        # Проверяем наличие активных абонементов
-        check_query = '''
+DELETE_BOOK = queries.register('delete_book', '''
+        WITH target AS (
+            SELECT library_id, book_id FROM books
+            WHERE library_id = :library_id AND book_id = :book_id
+            FOR UPDATE
+        ),
+        blocked AS (
             SELECT 1 FROM loans
             WHERE library_id = :library_id
             AND book_id = :book_id
             AND return_date IS NULL
-        '''
-        result = db.session.execute(check_query, {
-            'library_id': library_id,
-            'book_id': book_id
-        })
-        if result.fetchone():
-            return jsonify({'error': 'Невозможно удалить книгу с активными абонементами'}), 400
-
-        # Удаляем связанные записи
-        delete_loans_query = '''
-            DELETE FROM loans 
-            WHERE library_id = :library_id AND book_id = :book_id
-        '''
-        db.session.execute(delete_loans_query, {
-            'library_id': library_id,
-            'book_id': book_id
-        })
-
-        delete_topics_query = '''
-            DELETE FROM book_topics 
-            WHERE library_id = :library_id AND book_id = :book_id
-        '''
-        db.session.execute(delete_topics_query, {
-            'library_id': library_id,
-            'book_id': book_id
-        })
+            LIMIT 1
+        ),
+        deleted AS (
+            DELETE FROM books b
+            USING target
+            WHERE b.library_id = target.library_id
+            AND b.book_id = target.book_id
+            AND NOT EXISTS (SELECT 1 FROM blocked)
+            RETURNING b.book_id
+        )
+        SELECT CASE
+            WHEN EXISTS (SELECT 1 FROM blocked) THEN 'blocked'
+            WHEN NOT EXISTS (SELECT 1 FROM deleted) THEN 'not_found'
+            ELSE 'deleted'
+        END
+    ''')
 
-        # Удаляем книгу
-        query = '''
-            DELETE FROM books
-            WHERE library_id = :library_id AND book_id = :book_id
-        '''
-        result = db.session.execute(query, {
+@bp.route('/delete/book/<int:library_id>/<int:book_id>', methods=['DELETE'])
+def delete_book(library_id, book_id):
+    try:
+        # Проверка и удаление одним оператором. Абонементы и тематики книги
+        # удаляет триггер delete_book_related_data_trigger (schema/triggers.sql);
+        # абонемент, зафиксированный параллельно, отклоняет внешний ключ
+        status = DELETE_BOOK.execute({
             'library_id': library_id,
             'book_id': book_id
-        })
-        if result.rowcount == 0:
+        }).scalar()
+        if status == 'blocked':
+            db.session.rollback()
+            return jsonify({'error': 'Невозможно удалить книгу с активными абонементами'}), 400
+        if status == 'not_found':
+            db.session.rollback()
             return jsonify({'error': 'Книга не найдена'}), 404
 
         db.session.commit()
+        cache.invalidate('books', 'loans', 'book_topics', libraries=[library_id])
         return jsonify({'message': 'Книга успешно удалена'}), 200
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_foreign_key_violation(e):
+            return jsonify({'error': 'Невозможно удалить книгу с активными абонементами'}), 400
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+TOPICS = ListSpec(
+    'SELECT topic_id, name FROM topics {where}',
+    columns={
+        'topic_id': 'topic_id',
+        'name': 'name'
+    },
+    order=[('name', 'asc'), ('topic_id', 'asc')],
+    tables=['topics']
+)
+
 @bp.route('/topics', methods=['GET'])
+@conditional(*TOPICS.tables)
+@cache.cached('topics')
 def get_topics():
     try:
-        result = db.session.execute('SELECT * FROM topics ORDER BY name')
-        topics = [dict(row) for row in result]
-        return jsonify(topics)
+        return list_response(TOPICS)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+ADD_TOPIC = queries.register('add_topic', '''
+        INSERT INTO topics (name)
+        VALUES (:name)
+        RETURNING topic_id
+    ''')
+
 @bp.route('/add/topic', methods=['POST'])
 def add_topic():
     try:
         data = request.json
-        query = '''
-            INSERT INTO topics (name)
-            VALUES (:name)
-            RETURNING topic_id
-        '''
-        result = db.session.execute(query, data)
+        result = ADD_TOPIC.execute(data)
         topic_id = result.scalar()
         db.session.commit()
+        cache.invalidate('topics')
         return jsonify({'message': 'Тематика успешно добавлена', 'topic_id': topic_id}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+DELETE_TOPIC = queries.register('delete_topic', '''
+        WITH target AS (
+            SELECT topic_id FROM topics
+            WHERE topic_id = :topic_id
+            FOR UPDATE
+        ),
+        blocked AS (
+            SELECT 1 FROM book_topics
+            WHERE topic_id = :topic_id
+            LIMIT 1
+        ),
+        deleted AS (
+            DELETE FROM topics t
+            USING target
+            WHERE t.topic_id = target.topic_id
+            AND NOT EXISTS (SELECT 1 FROM blocked)
+            RETURNING t.topic_id
+        )
+        SELECT CASE
+            WHEN EXISTS (SELECT 1 FROM blocked) THEN 'blocked'
+            WHEN NOT EXISTS (SELECT 1 FROM deleted) THEN 'not_found'
+            ELSE 'deleted'
+        END
+    ''')
+
 @bp.route('/delete/topic/<int:topic_id>', methods=['DELETE'])
 def delete_topic(topic_id):
     try:
-        # Проверяем наличие книг с этой тематикой
-        check_query = '''
-            SELECT 1 FROM book_topics 
-            WHERE topic_id = :topic_id
-        '''
-        result = db.session.execute(check_query, {'topic_id': topic_id})
-        if result.fetchone():
+        # Проверка и удаление одним оператором; строка блокируется (FOR UPDATE).
+        # Ссылку, зафиксированную параллельно, пока оператор ждал блокировку,
+        # проверка не видит (снимок оператора старше) - тогда удаление
+        # отклоняет внешний ключ, и ответ тот же, что при проверке
+        status = DELETE_TOPIC.execute({'topic_id': topic_id}).scalar()
+        if status == 'blocked':
+            db.session.rollback()
             return jsonify({'error': 'Невозможно удалить тематику, которая используется в книгах'}), 400
-
-        query = 'DELETE FROM topics WHERE topic_id = :topic_id'
-        result = db.session.execute(query, {'topic_id': topic_id})
-        if result.rowcount == 0:
+        if status == 'not_found':
+            db.session.rollback()
             return jsonify({'error': 'Тематика не найдена'}), 404
 
         db.session.commit()
+        cache.invalidate('topics')
         return jsonify({'message': 'Тематика успешно удалена'}), 200
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_foreign_key_violation(e):
+            return jsonify({'error': 'Невозможно удалить тематику, которая используется в книгах'}), 400
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/book-topics-detailed', methods=['GET'])
-def get_book_topics_detailed():
-    try:
-        query = '''
+BOOK_TOPICS_DETAILED = ListSpec(
+    '''
+        SELECT *
+        FROM (
             SELECT 
+                b.library_id,
+                b.book_id,
                 b.title as book_title,
                 b.author as book_author,
                 COALESCE(STRING_AGG(t.name, ', ' ORDER BY t.name), 'Нет тематик') as topic_names
@@ -423,55 +651,112 @@ def get_book_topics_detailed():
             LEFT JOIN book_topics bt ON b.library_id = bt.library_id AND b.book_id = bt.book_id
             LEFT JOIN topics t ON bt.topic_id = t.topic_id
             GROUP BY b.library_id, b.book_id, b.title, b.author
-            ORDER BY b.title, b.author
-        '''
-        result = db.session.execute(query)
-        topics = [dict(row) for row in result]
-        return jsonify(topics)
+        ) AS book_topics_detailed
+        {where}
+    ''',
+    columns={
+        'library_id': 'library_id',
+        'book_id': 'book_id',
+        'book_title': 'book_title',
+        'book_author': 'book_author',
+        'topic_names': 'topic_names'
+    },
+    order=[
+        ('book_title', 'asc'),
+        ('book_author', 'asc'),
+        ('library_id', 'asc'),
+        ('book_id', 'asc')
+    ],
+    tables=['books', 'book_topics', 'topics']
+)
+
+@bp.route('/book-topics-detailed', methods=['GET'])
+@conditional(*BOOK_TOPICS_DETAILED.tables)
+@cache.cached('books', 'book_topics', 'topics')
+def get_book_topics_detailed():
+    try:
+        return list_response(BOOK_TOPICS_DETAILED)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/book-genres-count', methods=['GET'])
-def get_book_genres_count():
-    try:
-        query = '''
+BOOK_GENRES_COUNT = ListSpec(
+    '''
+        SELECT *
+        FROM (
             SELECT 
+                g.genre_id,
                 g.name as genre_name,
                 COUNT(b.book_id) as book_count
             FROM genres g
             LEFT JOIN books b ON g.genre_id = b.genre_id
             GROUP BY g.genre_id, g.name
-            ORDER BY book_count DESC, g.name
-        '''
-        result = db.session.execute(query)
-        counts = [dict(row) for row in result]
-        return jsonify(counts)
+        ) AS counts
+        {where}
+    ''',
+    columns={
+        'genre_id': 'genre_id',
+        'genre_name': 'genre_name',
+        'book_count': 'book_count'
+    },
+    order=[
+        ('book_count', 'desc'),
+        ('genre_name', 'asc'),
+        ('genre_id', 'asc')
+    ],
+    tables=['genres', 'books']
+)
+
+@bp.route('/book-genres-count', methods=['GET'])
+@conditional(*BOOK_GENRES_COUNT.tables)
+@cache.cached('genres', 'books')
+def get_book_genres_count():
+    try:
+        return list_response(BOOK_GENRES_COUNT)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/library-books-quantity', methods=['GET'])
-def get_library_books_quantity():
-    try:
-        query = '''
+LIBRARY_BOOKS_QUANTITY = ListSpec(
+    '''
+        SELECT *
+        FROM (
             SELECT 
+                l.library_id,
                 l.name as library_name,
                 COALESCE(SUM(b.quantity), 0) as total_books
             FROM libraries l
             LEFT JOIN books b ON l.library_id = b.library_id
             GROUP BY l.library_id, l.name
-            ORDER BY total_books DESC, l.name
-        '''
-        result = db.session.execute(query)
-        quantities = [dict(row) for row in result]
-        return jsonify(quantities)
+        ) AS quantities
+        {where}
+    ''',
+    columns={
+        'library_id': 'library_id',
+        'library_name': 'library_name',
+        'total_books': 'total_books'
+    },
+    order=[
+        ('total_books', 'desc'),
+        ('library_name', 'asc'),
+        ('library_id', 'asc')
+    ],
+    tables=['libraries', 'books']
+)
+
+@bp.route('/library-books-quantity', methods=['GET'])
+@conditional(*LIBRARY_BOOKS_QUANTITY.tables)
+@cache.cached('libraries', 'books')
+def get_library_books_quantity():
+    try:
+        return list_response(LIBRARY_BOOKS_QUANTITY)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/readers-with-loans', methods=['GET'])
-def get_readers_with_loans():
-    try:
-        query = '''
+READERS_WITH_LOANS = ListSpec(
+    '''
+        SELECT *
+        FROM (
             SELECT 
+                r.reader_id,
                 r.full_name as reader_name,
                 r.phone as reader_phone,
                 l.library_id,
@@ -485,14 +770,55 @@ def get_readers_with_loans():
             WHERE l.return_date IS NULL
             GROUP BY r.reader_id, r.full_name, r.phone, l.library_id, r.address
             HAVING COUNT(l.book_id) FILTER (WHERE l.return_date IS NULL) > 0
-            ORDER BY r.full_name
-        '''
-        result = db.session.execute(query)
-        readers = [dict(row) for row in result]
-        return jsonify(readers)
+        ) AS readers_with_loans
+        {where}
+    ''',
+    columns={
+        'reader_id': 'reader_id',
+        'reader_name': 'reader_name',
+        'reader_phone': 'reader_phone',
+        'library_id': 'library_id',
+        'current_loans_count': 'current_loans_count',
+        'reader_address': 'reader_address',
+        'borrowed_books': 'borrowed_books'
+    },
+    order=[
+        ('reader_name', 'asc'),
+        ('reader_id', 'asc'),
+        ('library_id', 'asc')
+    ],
+    tables=['readers', 'loans', 'books'],
+    nullable=['reader_phone', 'reader_address']
+)
+
+@bp.route('/readers-with-loans', methods=['GET'])
+@conditional(*READERS_WITH_LOANS.tables)
+def get_readers_with_loans():
+    try:
+        return list_response(READERS_WITH_LOANS)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+ADD_BOOK_TOPIC = queries.register('add_book_topic', '''
+        WITH book AS (
+            SELECT 1 FROM books
+            WHERE library_id = :library_id AND book_id = :book_id
+            FOR KEY SHARE
+        ),
+        inserted AS (
+            INSERT INTO book_topics (library_id, book_id, topic_id)
+            SELECT :library_id, :book_id, :topic_id
+            WHERE EXISTS (SELECT 1 FROM book)
+            ON CONFLICT DO NOTHING
+            RETURNING 1
+        )
+        SELECT CASE
+            WHEN NOT EXISTS (SELECT 1 FROM book) THEN 'not_found'
+            WHEN NOT EXISTS (SELECT 1 FROM inserted) THEN 'exists'
+            ELSE 'inserted'
+        END
+    ''')
+
 @bp.route('/add/book-topic', methods=['POST'])
 def add_book_topic():
     try:
@@ -501,50 +827,34 @@ def add_book_topic():
         book_id = data.get('book_id')
         topic_id = data.get('topic_id')
 
-        # Проверяем существование книги
-        check_book_query = '''
-            SELECT 1 FROM books 
-            WHERE library_id = :library_id AND book_id = :book_id
-        '''
-        result = db.session.execute(check_book_query, {
-            'library_id': library_id,
-            'book_id': book_id
-        })
-        if not result.fetchone():
-            return jsonify({'error': 'Книга не найдена'}), 404
-
-        # Проверяем, не присвоена ли уже эта тематика книге
-        check_topic_query = '''
-            SELECT 1 FROM book_topics 
-            WHERE library_id = :library_id 
-            AND book_id = :book_id 
-            AND topic_id = :topic_id
-        '''
-        result = db.session.execute(check_topic_query, {
+        # Проверка книги и вставка одним оператором; повторная тематика
+        # отсекается уникальным ключом book_topics (ON CONFLICT)
+        status = ADD_BOOK_TOPIC.execute({
             'library_id': library_id,
             'book_id': book_id,
             'topic_id': topic_id
-        })
-        if result.fetchone():
+        }).scalar()
+        if status == 'not_found':
+            db.session.rollback()
+            return jsonify({'error': 'Книга не найдена'}), 404
+        if status == 'exists':
+            db.session.rollback()
             return jsonify({'error': 'Эта тематика уже присвоена данной книге'}), 400
 
-        # Добавляем тематику книге
-        insert_query = '''
-            INSERT INTO book_topics (library_id, book_id, topic_id)
-            VALUES (:library_id, :book_id, :topic_id)
-        '''
-        db.session.execute(insert_query, {
-            'library_id': library_id,
-            'book_id': book_id,
-            'topic_id': topic_id
-        })
-        
         db.session.commit()
+        cache.invalidate('book_topics')
         return jsonify({'message': 'Тематика успешно присвоена книге'}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+DELETE_BOOK_TOPIC = queries.register('delete_book_topic', '''
+        DELETE FROM book_topics 
+        WHERE library_id = :library_id 
+        AND book_id = :book_id 
+        AND topic_id = :topic_id
+    ''')
+
 @bp.route('/delete/book-topic', methods=['DELETE'])
 def delete_book_topic():
     try:
@@ -553,106 +863,142 @@ def delete_book_topic():
         book_id = data.get('book_id')
         topic_id = data.get('topic_id')
 
-        # Проверяем существование связи книга-тематика
-        check_query = '''
-            SELECT 1 FROM book_topics 
-            WHERE library_id = :library_id 
-            AND book_id = :book_id 
-            AND topic_id = :topic_id
-        '''
-        result = db.session.execute(check_query, {
+        # Удаляем тематику у книги; отсутствие связи видно по rowcount
+        result = DELETE_BOOK_TOPIC.execute({
             'library_id': library_id,
             'book_id': book_id,
             'topic_id': topic_id
         })
-        if not result.fetchone():
+        if result.rowcount == 0:
+            db.session.rollback()
             return jsonify({'error': 'У книги нет такой тематики'}), 404
 
-        # Удаляем тематику у книги
-        delete_query = '''
-            DELETE FROM book_topics 
-            WHERE library_id = :library_id 
-            AND book_id = :book_id 
-            AND topic_id = :topic_id
-        '''
-        db.session.execute(delete_query, {
-            'library_id': library_id,
-            'book_id': book_id,
-            'topic_id': topic_id
-        })
-        
         db.session.commit()
+        cache.invalidate('book_topics')
         return jsonify({'message': 'Тематика успешно удалена у книги'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+BOOKS_WITH_TOPICS = ListSpec(
+    '''
+        SELECT DISTINCT
+            b.library_id,
+            b.book_id,
+            b.title,
+            b.author,
+            l.name as library_name
+        FROM books b
+        JOIN libraries l ON b.library_id = l.library_id
+        JOIN book_topics bt ON b.library_id = bt.library_id AND b.book_id = bt.book_id
+        {where}
+    ''',
+    columns={
+        'library_id': 'b.library_id',
+        'book_id': 'b.book_id',
+        'title': 'b.title',
+        'author': 'b.author',
+        'library_name': 'l.name'
+    },
+    order=[
+        ('title', 'asc'),
+        ('author', 'asc'),
+        ('library_id', 'asc'),
+        ('book_id', 'asc')
+    ],
+    tables=['books', 'libraries', 'book_topics']
+)
+
 @bp.route('/books-with-topics', methods=['GET'])
+@conditional(*BOOKS_WITH_TOPICS.tables)
 def get_books_with_topics():
     try:
-        query = '''
-            SELECT DISTINCT
-                b.library_id,
-                b.book_id,
-                b.title,
-                b.author,
-                l.name as library_name
-            FROM books b
-            JOIN libraries l ON b.library_id = l.library_id
-            JOIN book_topics bt ON b.library_id = bt.library_id AND b.book_id = bt.book_id
-            ORDER BY b.title, b.author
-        '''
-        result = db.session.execute(query)
-        books = [dict(row) for row in result]
-        return jsonify(books)
+        return list_response(BOOKS_WITH_TOPICS)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+BOOK_TOPICS = ListSpec(
+    '''
+        SELECT 
+            t.topic_id,
+            t.name
+        FROM book_topics bt
+        JOIN topics t ON bt.topic_id = t.topic_id
+        {where}
+    ''',
+    columns={
+        'topic_id': 't.topic_id',
+        'name': 't.name'
+    },
+    order=[('name', 'asc'), ('topic_id', 'asc')],
+    tables=['book_topics', 'topics'],
+    conditions=['bt.library_id = :library_id', 'bt.book_id = :book_id']
+)
+
 @bp.route('/book-topics/<int:library_id>/<int:book_id>', methods=['GET'])
+@conditional(*BOOK_TOPICS.tables)
 def get_book_topics(library_id, book_id):
     try:
-        query = '''
-            SELECT 
-                t.topic_id,
-                t.name
-            FROM book_topics bt
-            JOIN topics t ON bt.topic_id = t.topic_id
-            WHERE bt.library_id = :library_id 
-            AND bt.book_id = :book_id
-            ORDER BY t.name
-        '''
-        result = db.session.execute(query, {
+        return list_response(BOOK_TOPICS, params={
             'library_id': library_id,
             'book_id': book_id
         })
-        topics = [dict(row) for row in result]
-        return jsonify(topics)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+DELETE_GENRE = queries.register('delete_genre', '''
+        WITH target AS (
+            SELECT genre_id FROM genres
+            WHERE genre_id = :genre_id
+            FOR UPDATE
+        ),
+        blocked AS (
+            SELECT 1 FROM books
+            WHERE genre_id = :genre_id
+            LIMIT 1
+        ),
+        deleted AS (
+            DELETE FROM genres g
+            USING target
+            WHERE g.genre_id = target.genre_id
+            AND NOT EXISTS (SELECT 1 FROM blocked)
+            RETURNING g.genre_id
+        )
+        SELECT CASE
+            WHEN EXISTS (SELECT 1 FROM blocked) THEN 'blocked'
+            WHEN NOT EXISTS (SELECT 1 FROM deleted) THEN 'not_found'
+            ELSE 'deleted'
+        END
+    ''')
+
 @bp.route('/delete/genre/<int:genre_id>', methods=['DELETE'])
 def delete_genre(genre_id):
     try:
-        # Проверяем наличие книг с этим жанром
-        check_query = '''
-            SELECT 1 FROM books 
-            WHERE genre_id = :genre_id
-        '''
-        result = db.session.execute(check_query, {'genre_id': genre_id})
-        if result.fetchone():
+        # Проверка и удаление одним оператором; строка блокируется (FOR UPDATE).
+        # Ссылку, зафиксированную параллельно, пока оператор ждал блокировку,
+        # проверка не видит (снимок оператора старше) - тогда удаление
+        # отклоняет внешний ключ, и ответ тот же, что при проверке
+        status = DELETE_GENRE.execute({'genre_id': genre_id}).scalar()
+        if status == 'blocked':
+            db.session.rollback()
             return jsonify({'error': 'Невозможно удалить жанр, который используется в книгах'}), 400
-
-        query = 'DELETE FROM genres WHERE genre_id = :genre_id'
-        result = db.session.execute(query, {'genre_id': genre_id})
-        if result.rowcount == 0:
+        if status == 'not_found':
+            db.session.rollback()
             return jsonify({'error': 'Жанр не найден'}), 404
 
         db.session.commit()
+        cache.invalidate('genres')
         return jsonify({'message': 'Жанр успешно удален'}), 200
+    except IntegrityError as e:
+        db.session.rollback()
+        if is_foreign_key_violation(e):
+            return jsonify({'error': 'Невозможно удалить жанр, который используется в книгах'}), 400
+        return jsonify({'error': str(e)}), 500
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+
 @bp.route('/add/reader-with-loan', methods=['POST'])
 def add_reader_with_loan():
     try:
@@ -662,12 +1008,7 @@ def add_reader_with_loan():
         db.session.begin()
         
         # Добавляем читателя
-        reader_query = '''
-            INSERT INTO readers (full_name, address, phone)
-            VALUES (:full_name, :address, :phone)
-            RETURNING reader_id
-        '''
-        reader_result = db.session.execute(reader_query, {
+        reader_result = ADD_READER.execute({
             'full_name': data['full_name'],
             'address': data['address'],
             'phone': data['phone']
@@ -675,16 +1016,7 @@ def add_reader_with_loan():
         reader_id = reader_result.scalar()
         
         # Добавляем абонемент
-        loan_query = '''
-            INSERT INTO loans (
-                library_id, book_id, reader_id,
-                issue_date, due_date, return_date, deposit
-            ) VALUES (
-                :library_id, :book_id, :reader_id,
-                :issue_date, :due_date, NULL, :deposit
-            )
-        '''
-        db.session.execute(loan_query, {
+        ADD_LOAN.execute({
             'library_id': data['library_id'],
             'book_id': data['book_id'],
             'reader_id': reader_id,
@@ -694,6 +1026,8 @@ def add_reader_with_loan():
         })
         
         db.session.commit()
+        # Новый читатель встречается только в абонементе этой библиотеки
+        cache.invalidate('readers', 'loans', libraries=[data['library_id']])
         return jsonify({
             'message': 'Читатель и абонемент успешно добавлены',
             'reader_id': reader_id
@@ -703,245 +1037,138 @@ def add_reader_with_loan():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/report/loans-by-period', methods=['POST'])
-def report_loans_by_period():
+LIST_SPECS = {
+    'libraries': LIBRARIES,
+    'genres': GENRES,
+    'readers': READERS,
+    'loans': LOANS,
+    'available-books': AVAILABLE_BOOKS,
+    'books': BOOKS,
+    'topics': TOPICS,
+    'book-topics-detailed': BOOK_TOPICS_DETAILED,
+    'book-genres-count': BOOK_GENRES_COUNT,
+    'library-books-quantity': LIBRARY_BOOKS_QUANTITY,
+    'readers-with-loans': READERS_WITH_LOANS,
+    'books-with-topics': BOOKS_WITH_TOPICS
+}
+
+@bp.route('/distinct/<table>/<column>', methods=['GET'])
+def get_distinct_values(table, column):
     try:
-        filters = request.json
-        start_date = filters.get('start_date')
-        end_date = filters.get('end_date')
-        library_id = filters.get('library_id')
-        sort_by = filters.get('sort_by', 'issue_date')
-        sort_order = filters.get('sort_order', 'desc')
-
-        # Базовый запрос
-        query = '''
-            WITH loan_stats AS (
-                SELECT 
-                    l.library_id,
-                    lib.name as library_name,
-                    b.genre_id,
-                    g.name as genre_name,
-                    COUNT(*) as loans_count,
-                    COUNT(l.return_date) as returned_count,
-                    COUNT(*) - COUNT(l.return_date) as not_returned_count,
-                    SUM(l.deposit) as total_deposit,
-                    AVG(l.deposit) as avg_deposit
-                FROM loans l
-                JOIN libraries lib ON l.library_id = lib.library_id
-                JOIN books b ON l.library_id = b.library_id AND l.book_id = b.book_id
-                JOIN genres g ON b.genre_id = g.genre_id
-                WHERE l.issue_date BETWEEN :start_date AND :end_date
-            '''
-        
-        params = {'start_date': start_date, 'end_date': end_date}
-        
-        if library_id:
-            query += ' AND l.library_id = :library_id'
-            params['library_id'] = library_id
-
-        query += '''
-                GROUP BY l.library_id, lib.name, b.genre_id, g.name
-            )
-            SELECT 
-                library_name,
-                genre_name,
-                loans_count,
-                returned_count,
-                not_returned_count,
-                total_deposit,
-                ROUND(avg_deposit::numeric, 2) as avg_deposit,
-                ROUND((returned_count::float / NULLIF(loans_count, 0) * 100)::numeric, 2) as return_rate
-            FROM loan_stats
-            ORDER BY {} {}
-        '''.format(sort_by, sort_order)
-
-        result = db.session.execute(query, params)
-        report_data = [dict(row) for row in result]
-
-        # Добавляем итоговые данные
-        totals_query = '''
-            SELECT 
-                COUNT(*) as total_loans,
-                COUNT(return_date) as total_returned,
-                COUNT(*) - COUNT(return_date) as total_not_returned,
-                SUM(deposit) as total_deposit,
-                ROUND(AVG(deposit)::numeric, 2) as avg_deposit,
-                ROUND((COUNT(return_date)::float / COUNT(*) * 100)::numeric, 2) as total_return_rate
-            FROM loans
-            WHERE issue_date BETWEEN :start_date AND :end_date
-        '''
-        if library_id:
-            totals_query += ' AND library_id = :library_id'
-
-        totals = dict(db.session.execute(totals_query, params).fetchone())
-
-        return jsonify({
-            'data': report_data,
-            'totals': totals
-        })
+        spec = LIST_SPECS.get(table)
+        if spec is None:
+            return jsonify({'error': 'Таблица не поддерживает фильтрацию'}), 400
+        return conditional_response(spec.tables, distinct_response, spec, column)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/report/overdue-loans', methods=['POST'])
-def report_overdue_loans():
+@bp.route('/lookup/<entity>', methods=['GET'])
+def get_lookup(entity):
     try:
-        filters = request.json
-        min_days_overdue = filters.get('min_days_overdue', 0)
-        library_id = filters.get('library_id')
-        sort_by = filters.get('sort_by', 'max_days_overdue')
-        sort_order = filters.get('sort_order', 'desc')
-
-        query = '''
-            WITH overdue_stats AS (
-                SELECT 
-                    l.library_id,
-                    lib.name as library_name,
-                    r.reader_id,
-                    r.full_name as reader_name,
-                    COUNT(*) as overdue_books_count,
-                    SUM(l.deposit) as total_deposit,
-                    MAX(CURRENT_DATE - l.due_date) as max_days_overdue,
-                    ROUND(AVG(CURRENT_DATE - l.due_date)::numeric, 1) as avg_days_overdue
-                FROM loans l
-                JOIN libraries lib ON l.library_id = lib.library_id
-                JOIN readers r ON l.reader_id = r.reader_id
-                WHERE l.return_date IS NULL 
-                AND l.due_date < CURRENT_DATE
-            '''
-
-        params = {}
-
-        if min_days_overdue > 0:
-            query += ' AND (CURRENT_DATE - l.due_date) >= :min_days_overdue'
-            params['min_days_overdue'] = min_days_overdue
-
-        if library_id:
-            query += ' AND l.library_id = :library_id'
-            params['library_id'] = library_id
-
-        query += '''
-                GROUP BY l.library_id, lib.name, r.reader_id, r.full_name
-            )
-            SELECT 
-                library_name,
-                reader_name,
-                overdue_books_count,
-                total_deposit,
-                max_days_overdue,
-                avg_days_overdue
-            FROM overdue_stats
-            ORDER BY {} {}
-        '''.format(
-            'max_days_overdue' if sort_by == 'days_overdue' else 'overdue_books_count',
-            sort_order
-        )
+        lookup = LOOKUPS.get(entity)
+        if lookup is None:
+            return jsonify({'error': f'Справочник {entity} не найден'}), 404
+        view = cache.cached(*lookup.tables)(lookup_response)
+        return conditional_response(lookup.tables, view, lookup)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        result = db.session.execute(query, params)
-        report_data = [dict(row) for row in result]
+@bp.route('/search', methods=['GET'])
+def get_search_results():
+    try:
+        return conditional_response(('books', 'readers', 'topics'), search_response)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # Итоговые данные
-        totals_query = '''
-            SELECT 
-                COUNT(DISTINCT reader_id) as total_readers_overdue,
-                COUNT(*) as total_books_overdue,
-                SUM(deposit) as total_deposit_held,
-                ROUND(AVG(CURRENT_DATE - due_date)::numeric, 1) as avg_days_overdue
-            FROM loans
-            WHERE return_date IS NULL 
-            AND due_date < CURRENT_DATE
-        '''
-        
-        totals_params = {}
-        
-        if min_days_overdue > 0:
-            totals_query += ' AND (CURRENT_DATE - due_date) >= :min_days_overdue'
-            totals_params['min_days_overdue'] = min_days_overdue
+@bp.route('/search/autocomplete/<entity>', methods=['GET'])
+def get_search_autocomplete(entity):
+    try:
+        return conditional_response(('books', 'readers'), autocomplete_response, entity)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        if library_id:
-            totals_query += ' AND library_id = :library_id'
-            totals_params['library_id'] = library_id
+@bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(cache.stats())
+
+@bp.route('/report/cache/stats', methods=['GET'])
+def get_report_cache_stats():
+    return jsonify(report_cache.stats())
+
+@bp.route('/queries/stats', methods=['GET'])
+def get_query_stats():
+    return jsonify(queries.stats())
+
+@bp.route('/health/pool', methods=['GET'])
+def get_pool_health():
+    return jsonify(pool_monitor.stats())
+
+@bp.route('/health/replicas', methods=['GET'])
+def get_replica_health():
+    return jsonify(replicas.stats())
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def report_response(name):
+    """
+    Отчёт сразу или, с ?async=1, как задание в очереди (см. app/report_jobs.py).
+    ?format=arrow или parquet отдаёт строки отчёта таблицей, итоги - в метаданных.
+    """
+    # Тело не JSON или не объект - 400, как в /batch
+    filters = request.get_json(silent=True)
+    if not isinstance(filters, dict):
+        return jsonify({'error': 'Ожидается объект JSON с параметрами отчёта'}), 400
+    try:
+        REPORTS[name].params(filters)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    fmt = request.args.get('format', 'json')
+    if fmt in COLUMNAR_FORMATS:
+        try:
+            require_pyarrow(fmt)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        result = run_report(name, filters)
+        columns = REPORTS[name].columns
+        rows = [tuple(row[column] for column in columns) for row in result['data']]
+        return columnar_response(fmt, columns, rows, metadata={'totals': result['totals']})
+
+    if request.args.get('async') == '1':
+        job, created = report_jobs.submit(name, filters)
+        return jsonify(dict(job.summary(), deduplicated=not created)), 202
+    return jsonify(run_report(name, filters))
 
-        totals = dict(db.session.execute(totals_query, totals_params).fetchone())
+@bp.route('/report/loans-by-period', methods=['POST'])
+@read_only
+def report_loans_by_period():
+    try:
+        return report_response('loans-by-period')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        return jsonify({
-            'data': report_data,
-            'totals': totals
-        })
+@bp.route('/report/overdue-loans', methods=['POST'])
+@read_only
+def report_overdue_loans():
+    try:
+        return report_response('overdue-loans')
     except Exception as e:
-        print(f"Error in overdue_loans report: {str(e)}")
+        current_app.logger.exception('Ошибка отчёта overdue-loans')
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/report/genre-popularity', methods=['POST'])
+@read_only
 def report_genre_popularity():
     try:
-        filters = request.json
-        library_id = filters.get('library_id')
-        period_months = filters.get('period_months', 12)
-        sort_by = filters.get('sort_by', 'loan_count')
-        sort_order = filters.get('sort_order', 'desc')
-
-        query = '''
-            WITH genre_stats AS (
-                SELECT 
-                    l.library_id,
-                    lib.name as library_name,
-                    g.genre_id,
-                    g.name as genre_name,
-                    COUNT(*) as loan_count,
-                    COUNT(DISTINCT l.reader_id) as unique_readers,
-                    ROUND(AVG(l.deposit)::numeric, 2) as avg_deposit,
-                    COUNT(*) FILTER (WHERE l.return_date IS NULL) as current_loans
-                FROM loans l
-                JOIN libraries lib ON l.library_id = lib.library_id
-                JOIN books b ON l.library_id = b.library_id AND l.book_id = b.book_id
-                JOIN genres g ON b.genre_id = g.genre_id
-                WHERE l.issue_date >= CURRENT_DATE - INTERVAL ':period_months months'
-            '''
-
-        params = {'period_months': period_months}
-
-        if library_id:
-            query += ' AND l.library_id = :library_id'
-            params['library_id'] = library_id
-
-        query += '''
-                GROUP BY l.library_id, lib.name, g.genre_id, g.name
-            )
-            SELECT 
-                library_name,
-                genre_name,
-                loan_count,
-                unique_readers,
-                avg_deposit,
-                current_loans,
-                ROUND((current_loans::float / NULLIF(loan_count, 0) * 100)::numeric, 2) as current_loan_rate,
-                ROUND((unique_readers::float / loan_count * 100)::numeric, 2) as reader_diversity_rate
-            FROM genre_stats
-            ORDER BY {} {}
-        '''.format(sort_by, sort_order)
-
-        result = db.session.execute(query, params)
-        report_data = [dict(row) for row in result]
-
-        # Итоговые данные
-        totals_query = '''
-            SELECT 
-                COUNT(*) as total_loans,
-                COUNT(DISTINCT reader_id) as total_unique_readers,
-                ROUND(AVG(deposit)::numeric, 2) as avg_deposit,
-                COUNT(*) FILTER (WHERE return_date IS NULL) as total_current_loans
-            FROM loans
-            WHERE issue_date >= CURRENT_DATE - INTERVAL ':period_months months'
-        '''
-        if library_id:
-            totals_query += ' AND library_id = :library_id'
-
-        totals = dict(db.session.execute(totals_query, params).fetchone())
-
-        return jsonify({
-            'data': report_data,
-            'totals': totals
-        })
+        return report_response('genre-popularity')
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/report/jobs/<job_id>', methods=['GET'])
+def get_report_job(job_id):
+    job = report_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Задание не найдено'}), 404
+    return jsonify(job)
@@ -0,0 +1,125 @@
+-- Материализованный счётчик доступных экземпляров книг.
+-- Поддерживается триггерами на books и loans, поэтому его обновляют
+-- все пути записи: add_loan, add_reader_with_loan, возврат книги
+-- (UPDATE loans SET return_date = ...), удаление книги и правка quantity.
+CREATE TABLE IF NOT EXISTS book_availability (
+    library_id INTEGER NOT NULL,
+    book_id INTEGER NOT NULL,
+    available_quantity INTEGER NOT NULL,
+    PRIMARY KEY (library_id, book_id),
+    FOREIGN KEY (library_id, book_id)
+        REFERENCES books (library_id, book_id) ON DELETE CASCADE
+);
+
+-- /available-books читает только строки с доступными экземплярами
+CREATE INDEX IF NOT EXISTS book_availability_available_idx
+ON book_availability (library_id, book_id)
+WHERE available_quantity > 0;
+
+-- Новая книга: все экземпляры доступны
+CREATE OR REPLACE FUNCTION book_availability_on_book_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO book_availability (library_id, book_id, available_quantity)
+    VALUES (
+        NEW.library_id,
+        NEW.book_id,
+        NEW.quantity - (
+            SELECT COUNT(*)
+            FROM loans
+            WHERE library_id = NEW.library_id
+            AND book_id = NEW.book_id
+            AND return_date IS NULL
+        )
+    )
+    ON CONFLICT (library_id, book_id)
+    DO UPDATE SET available_quantity = EXCLUDED.available_quantity;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS book_availability_insert_trigger ON books;
+CREATE TRIGGER book_availability_insert_trigger
+AFTER INSERT ON books
+FOR EACH ROW EXECUTE FUNCTION book_availability_on_book_insert();
+
+-- Изменение количества экземпляров сдвигает счётчик на разницу
+CREATE OR REPLACE FUNCTION book_availability_on_quantity_update()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.quantity IS DISTINCT FROM OLD.quantity THEN
+        UPDATE book_availability
+        SET available_quantity = available_quantity + (NEW.quantity - OLD.quantity)
+        WHERE library_id = NEW.library_id AND book_id = NEW.book_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS book_availability_quantity_trigger ON books;
+CREATE TRIGGER book_availability_quantity_trigger
+AFTER UPDATE OF quantity ON books
+FOR EACH ROW EXECUTE FUNCTION book_availability_on_quantity_update();
+
+-- Выдача уменьшает счётчик, возврат и удаление активного абонемента увеличивают
+CREATE OR REPLACE FUNCTION book_availability_on_loan_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.return_date IS NULL THEN
+        UPDATE book_availability
+        SET available_quantity = available_quantity + 1
+        WHERE library_id = OLD.library_id AND book_id = OLD.book_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.return_date IS NULL THEN
+        UPDATE book_availability
+        SET available_quantity = available_quantity - 1
+        WHERE library_id = NEW.library_id AND book_id = NEW.book_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS book_availability_loan_trigger ON loans;
+CREATE TRIGGER book_availability_loan_trigger
+AFTER INSERT OR DELETE OR UPDATE OF library_id, book_id, return_date ON loans
+FOR EACH ROW EXECUTE FUNCTION book_availability_on_loan_change();
+
+-- Расхождения счётчика с фактическими данными
+CREATE OR REPLACE VIEW book_availability_mismatches AS
+SELECT
+    b.library_id,
+    b.book_id,
+    a.available_quantity AS stored_quantity,
+    b.quantity - COALESCE(o.open_loans, 0) AS actual_quantity
+FROM books b
+LEFT JOIN book_availability a
+    ON a.library_id = b.library_id AND a.book_id = b.book_id
+LEFT JOIN (
+    SELECT library_id, book_id, COUNT(*) AS open_loans
+    FROM loans
+    WHERE return_date IS NULL
+    GROUP BY library_id, book_id
+) o ON o.library_id = b.library_id AND o.book_id = b.book_id
+WHERE a.available_quantity IS DISTINCT FROM b.quantity - COALESCE(o.open_loans, 0);
+
+-- Пересчёт счётчика; возвращает число исправленных записей
+CREATE OR REPLACE FUNCTION rebuild_book_availability()
+RETURNS INTEGER AS $$
+DECLARE
+    fixed INTEGER;
+BEGIN
+    INSERT INTO book_availability (library_id, book_id, available_quantity)
+    SELECT library_id, book_id, actual_quantity
+    FROM book_availability_mismatches
+    ON CONFLICT (library_id, book_id)
+    DO UPDATE SET available_quantity = EXCLUDED.available_quantity;
+
+    GET DIAGNOSTICS fixed = ROW_COUNT;
+    RETURN fixed;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Первичное заполнение
+SELECT rebuild_book_availability();
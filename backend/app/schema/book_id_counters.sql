@@ -0,0 +1,67 @@
+-- Счётчики номеров книг внутри библиотеки.
+-- Номер выдаётся UPDATE ... RETURNING по строке счётчика, без MAX(book_id)
+-- по books; конкурирующие добавления в одну библиотеку ждут только
+-- блокировку этой строки и не получают нарушение первичного ключа.
+CREATE TABLE IF NOT EXISTS book_id_counters (
+    library_id INTEGER PRIMARY KEY REFERENCES libraries (library_id) ON DELETE CASCADE,
+    last_book_id INTEGER NOT NULL
+);
+
+-- Резервирует p_count номеров подряд и возвращает первый из них
+CREATE OR REPLACE FUNCTION allocate_book_ids(p_library_id INTEGER, p_count INTEGER DEFAULT 1)
+RETURNS INTEGER AS $$
+DECLARE
+    first_id INTEGER;
+BEGIN
+    LOOP
+        UPDATE book_id_counters
+        SET last_book_id = last_book_id + p_count
+        WHERE library_id = p_library_id
+        RETURNING last_book_id - p_count + 1 INTO first_id;
+
+        IF FOUND THEN
+            RETURN first_id;
+        END IF;
+
+        -- Первое обращение к библиотеке: счётчик начинается с текущего максимума
+        INSERT INTO book_id_counters (library_id, last_book_id)
+        SELECT p_library_id, COALESCE(MAX(book_id), 0)
+        FROM books
+        WHERE library_id = p_library_id
+        ON CONFLICT (library_id) DO NOTHING;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Книга без номера получает следующий номер своей библиотеки
+CREATE OR REPLACE FUNCTION books_assign_book_id()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.book_id IS NULL THEN
+        NEW.book_id := allocate_book_ids(NEW.library_id, 1);
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS books_assign_book_id_trigger ON books;
+CREATE TRIGGER books_assign_book_id_trigger
+BEFORE INSERT ON books
+FOR EACH ROW EXECUTE FUNCTION books_assign_book_id();
+
+-- Явно заданный номер больше счётчика (импорт, ручная вставка) сдвигает счётчик
+CREATE OR REPLACE FUNCTION books_advance_book_id_counter()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE book_id_counters
+    SET last_book_id = NEW.book_id
+    WHERE library_id = NEW.library_id
+    AND last_book_id < NEW.book_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS books_advance_book_id_counter_trigger ON books;
+CREATE TRIGGER books_advance_book_id_counter_trigger
+AFTER INSERT OR UPDATE OF book_id ON books
+FOR EACH ROW EXECUTE FUNCTION books_advance_book_id_counter();
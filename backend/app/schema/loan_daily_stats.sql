@@ -0,0 +1,238 @@
+-- Дневные агрегаты абонементов (день × библиотека × жанр) для отчётов.
+-- Закрытые дни (до closed_through включительно) хранятся в loan_daily_stats,
+-- абонементы после closed_through отчёты читают напрямую из loans.
+-- Заполнение: flask rollup backfill; очередной день закрывает app/rollup.py
+-- перед отчётом (или тот же backfill по расписанию, см. README).
+CREATE TABLE IF NOT EXISTS loan_daily_stats (
+    day DATE NOT NULL,
+    library_id INTEGER NOT NULL,
+    genre_id INTEGER NOT NULL,
+    loans_count INTEGER NOT NULL,
+    returned_count INTEGER NOT NULL,
+    deposit_sum NUMERIC,
+    deposit_count INTEGER NOT NULL,
+    -- Множество читателей дня: позволяет точно считать уникальных читателей за период
+    reader_ids INTEGER[] NOT NULL,
+    PRIMARY KEY (day, library_id, genre_id)
+);
+
+CREATE INDEX IF NOT EXISTS loan_daily_stats_library_idx
+ON loan_daily_stats (library_id, day);
+
+CREATE TABLE IF NOT EXISTS loan_daily_stats_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    closed_through DATE
+);
+
+INSERT INTO loan_daily_stats_state (id, closed_through)
+VALUES (TRUE, NULL)
+ON CONFLICT (id) DO NOTHING;
+
+-- Пересчёт агрегатов за период (и, при необходимости, одну библиотеку) по loans
+CREATE OR REPLACE FUNCTION refresh_loan_daily_stats(
+    p_from DATE,
+    p_to DATE,
+    p_library_id INTEGER DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+DECLARE
+    affected INTEGER;
+BEGIN
+    DELETE FROM loan_daily_stats
+    WHERE day BETWEEN p_from AND p_to
+    AND (p_library_id IS NULL OR library_id = p_library_id);
+
+    INSERT INTO loan_daily_stats (
+        day, library_id, genre_id, loans_count, returned_count,
+        deposit_sum, deposit_count, reader_ids
+    )
+    SELECT
+        l.issue_date,
+        l.library_id,
+        b.genre_id,
+        COUNT(*),
+        COUNT(l.return_date),
+        SUM(l.deposit),
+        COUNT(l.deposit),
+        ARRAY_AGG(DISTINCT l.reader_id)
+    FROM loans l
+    JOIN books b ON l.library_id = b.library_id AND l.book_id = b.book_id
+    WHERE l.issue_date BETWEEN p_from AND p_to
+    AND (p_library_id IS NULL OR l.library_id = p_library_id)
+    GROUP BY l.issue_date, l.library_id, b.genre_id;
+
+    GET DIAGNOSTICS affected = ROW_COUNT;
+    RETURN affected;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Закрытие дней по p_through включительно (не позже вчерашнего дня)
+CREATE OR REPLACE FUNCTION close_loan_daily_stats(p_through DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    last_closed DATE;
+    affected INTEGER;
+BEGIN
+    p_through := LEAST(p_through, CURRENT_DATE - 1);
+
+    -- Блокировка ждёт завершения транзакций, меняющих абонементы прошлых дней
+    SELECT closed_through INTO last_closed
+    FROM loan_daily_stats_state
+    FOR UPDATE;
+
+    IF last_closed IS NOT NULL AND p_through <= last_closed THEN
+        RETURN 0;
+    END IF;
+
+    affected := refresh_loan_daily_stats(
+        COALESCE(last_closed + 1, '-infinity'::DATE),
+        p_through
+    );
+
+    UPDATE loan_daily_stats_state SET closed_through = p_through;
+    RETURN affected;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Полный пересчёт с нуля
+CREATE OR REPLACE FUNCTION rebuild_loan_daily_stats()
+RETURNS INTEGER AS $$
+BEGIN
+    PERFORM 1 FROM loan_daily_stats_state FOR UPDATE;
+    TRUNCATE loan_daily_stats;
+    UPDATE loan_daily_stats_state SET closed_through = NULL;
+    RETURN close_loan_daily_stats(CURRENT_DATE - 1);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Инкрементальное обновление закрытых дней при выдаче, возврате и удалении
+CREATE OR REPLACE FUNCTION loan_daily_stats_on_loan_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    last_closed DATE;
+    genre INTEGER;
+BEGIN
+    -- Сегодняшние абонементы отчёты читают из loans, агрегат не трогаем
+    IF TG_OP = 'INSERT' THEN
+        IF NEW.issue_date >= CURRENT_DATE THEN
+            RETURN NULL;
+        END IF;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF OLD.issue_date >= CURRENT_DATE THEN
+            RETURN NULL;
+        END IF;
+    ELSIF NEW.issue_date >= CURRENT_DATE AND OLD.issue_date >= CURRENT_DATE THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT closed_through INTO last_closed
+    FROM loan_daily_stats_state
+    FOR SHARE;
+
+    IF last_closed IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        IF NEW.issue_date > last_closed THEN
+            RETURN NULL;
+        END IF;
+
+        SELECT genre_id INTO genre
+        FROM books
+        WHERE library_id = NEW.library_id AND book_id = NEW.book_id;
+
+        INSERT INTO loan_daily_stats AS s (
+            day, library_id, genre_id, loans_count, returned_count,
+            deposit_sum, deposit_count, reader_ids
+        ) VALUES (
+            NEW.issue_date, NEW.library_id, genre, 1,
+            (NEW.return_date IS NOT NULL)::INTEGER,
+            NEW.deposit, (NEW.deposit IS NOT NULL)::INTEGER,
+            ARRAY[NEW.reader_id]
+        )
+        ON CONFLICT (day, library_id, genre_id) DO UPDATE SET
+            loans_count = s.loans_count + 1,
+            returned_count = s.returned_count + EXCLUDED.returned_count,
+            deposit_sum = CASE
+                WHEN EXCLUDED.deposit_sum IS NULL THEN s.deposit_sum
+                ELSE COALESCE(s.deposit_sum, 0) + EXCLUDED.deposit_sum
+            END,
+            deposit_count = s.deposit_count + EXCLUDED.deposit_count,
+            reader_ids = CASE
+                WHEN NEW.reader_id = ANY(s.reader_ids) THEN s.reader_ids
+                ELSE s.reader_ids || NEW.reader_id
+            END;
+        RETURN NULL;
+    END IF;
+
+    -- Возврат книги: меняется только счётчик возвратов
+    IF TG_OP = 'UPDATE' THEN
+        IF (NEW.library_id, NEW.book_id, NEW.reader_id, NEW.issue_date, NEW.deposit)
+           IS NOT DISTINCT FROM (OLD.library_id, OLD.book_id, OLD.reader_id, OLD.issue_date, OLD.deposit) THEN
+            IF NEW.issue_date <= last_closed
+               AND (NEW.return_date IS NULL) <> (OLD.return_date IS NULL) THEN
+                UPDATE loan_daily_stats
+                SET returned_count = returned_count
+                    + CASE WHEN NEW.return_date IS NULL THEN -1 ELSE 1 END
+                WHERE day = NEW.issue_date
+                AND library_id = NEW.library_id
+                AND genre_id = (
+                    SELECT genre_id FROM books
+                    WHERE library_id = NEW.library_id AND book_id = NEW.book_id
+                );
+            END IF;
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    -- Остальные изменения и удаление: пересчитываем затронутые дни
+    IF OLD.issue_date <= last_closed THEN
+        PERFORM refresh_loan_daily_stats(OLD.issue_date, OLD.issue_date, OLD.library_id);
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        IF NEW.issue_date <= last_closed THEN
+            PERFORM refresh_loan_daily_stats(NEW.issue_date, NEW.issue_date, NEW.library_id);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS loan_daily_stats_loan_trigger ON loans;
+CREATE TRIGGER loan_daily_stats_loan_trigger
+AFTER INSERT OR UPDATE OR DELETE ON loans
+FOR EACH ROW EXECUTE FUNCTION loan_daily_stats_on_loan_change();
+
+-- Смена жанра книги переносит её абонементы в другой жанр
+CREATE OR REPLACE FUNCTION loan_daily_stats_on_genre_change()
+RETURNS TRIGGER AS $$
+DECLARE
+    last_closed DATE;
+    loan_day DATE;
+BEGIN
+    IF NEW.genre_id IS NOT DISTINCT FROM OLD.genre_id THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT closed_through INTO last_closed
+    FROM loan_daily_stats_state
+    FOR SHARE;
+
+    FOR loan_day IN
+        SELECT DISTINCT issue_date
+        FROM loans
+        WHERE library_id = NEW.library_id
+        AND book_id = NEW.book_id
+        AND issue_date <= last_closed
+    LOOP
+        PERFORM refresh_loan_daily_stats(loan_day, loan_day, NEW.library_id);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS loan_daily_stats_genre_trigger ON books;
+CREATE TRIGGER loan_daily_stats_genre_trigger
+AFTER UPDATE OF genre_id ON books
+FOR EACH ROW EXECUTE FUNCTION loan_daily_stats_on_genre_change();
@@ -0,0 +1,66 @@
+-- Версии таблиц для ETag / условных GET-запросов.
+-- Каждый изменяющий оператор увеличивает версию своей таблицы; новая
+-- версия становится видна вместе с данными при фиксации транзакции.
+--
+-- Счётчик таблицы разбит на 16 строк (shard): оператор увеличивает строку
+-- своего серверного процесса (pg_backend_pid() % 16) и держит её блокировку
+-- до фиксации, поэтому одновременные записи из разных соединений почти
+-- не ждут друг друга. Версия таблицы - сумма по строкам: она растёт с
+-- каждой зафиксированной записью и не повторяется.
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(63) NOT NULL,
+    shard SMALLINT NOT NULL DEFAULT 0,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, shard)
+);
+
+-- Таблица из прежней версии схемы: одна строка на таблицу, ключ table_name
+ALTER TABLE table_versions ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0;
+
+DO $$
+BEGIN
+    IF (
+        SELECT array_length(conkey, 1) FROM pg_constraint
+        WHERE conrelid = 'table_versions'::regclass AND contype = 'p'
+    ) = 1 THEN
+        ALTER TABLE table_versions DROP CONSTRAINT table_versions_pkey;
+        ALTER TABLE table_versions ADD PRIMARY KEY (table_name, shard);
+    END IF;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION bump_table_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO table_versions (table_name, shard, version)
+    VALUES (TG_TABLE_NAME, pg_backend_pid() % 16, 1)
+    ON CONFLICT (table_name, shard)
+    DO UPDATE SET version = table_versions.version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Триггеры уровня оператора: одно обновление версии на оператор, а не на строку
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY[
+        'libraries', 'genres', 'readers', 'books', 'loans',
+        'topics', 'book_topics', 'book_availability'
+    ]
+    LOOP
+        -- Строки создаются заранее: первая запись в шард не вставляет строку
+        INSERT INTO table_versions (table_name, shard)
+        SELECT tbl, shard FROM generate_series(0, 15) AS shard
+        ON CONFLICT (table_name, shard) DO NOTHING;
+
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_version_trigger', tbl);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version()',
+            tbl || '_version_trigger', tbl
+        );
+    END LOOP;
+END;
+$$;
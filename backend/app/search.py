@@ -0,0 +1,200 @@
+import re
+
+from flask import jsonify, request
+
+from .pagination import parse_limit
+from .queries import queries
+
+# Документы для полнотекстового поиска. Выражения совпадают с индексами
+# миграции a7d41c5e9b20_search_indexes.py: иначе индекс не используется
+BOOK_DOCUMENT = (
+    "setweight(to_tsvector('russian', coalesce({alias}.title, '')), 'A')"
+    " || setweight(to_tsvector('russian', coalesce({alias}.author, '')), 'B')"
+    " || setweight(to_tsvector('russian', coalesce({alias}.publisher, '')), 'C')"
+)
+READER_DOCUMENT = "to_tsvector('russian', coalesce({alias}.full_name, ''))"
+TOPIC_DOCUMENT = "to_tsvector('russian', coalesce({alias}.name, ''))"
+
+WORD = re.compile(r'\w+')
+
+
+class SearchType:
+    """
+    Сущность, по которой ищет /search: таблица с псевдонимом, ключ,
+    подпись и пояснение строки, документ tsvector, поля для нечёткого
+    (триграммного) сравнения и фильтры по родителю (параметр -> колонка).
+    """
+
+    def __init__(self, name, table, alias, key, label, detail, document, fuzzy, scopes=None):
+        self.name = name
+        self.table = table
+        self.alias = alias
+        self.key = key
+        self.label = label.format(alias=alias)
+        self.detail = detail.format(alias=alias)
+        self.document = document.format(alias=alias)
+        self.fuzzy = [field.format(alias=alias) for field in fuzzy]
+        self.scopes = {param: column.format(alias=alias) for param, column in (scopes or {}).items()}
+
+    def query(self, scoped):
+        key = ', '.join(f"'{column}', {self.alias}.{column}" for column in self.key)
+        similarity = ', '.join(f'word_similarity(:text, {field})' for field in self.fuzzy)
+        matches = ' OR '.join([f'{self.document} @@ sq.query'] + [f':text <% {field}' for field in self.fuzzy])
+        conditions = ''.join(f' AND {self.scopes[param]} = :{param}' for param in scoped if param in self.scopes)
+        return f'''
+            SELECT
+                '{self.name}' AS type,
+                json_build_object({key}) AS key,
+                {self.label} AS label,
+                {self.detail} AS detail,
+                ts_rank_cd({self.document}, sq.query) + GREATEST({similarity}) AS rank
+            FROM {self.table} {self.alias}
+            CROSS JOIN search_query sq
+            WHERE ({matches}){conditions}
+        '''
+
+
+SEARCH_TYPES = {
+    'books': SearchType(
+        'books', 'books', 'b',
+        key=('library_id', 'book_id'),
+        label='{alias}.title',
+        detail='{alias}.author',
+        document=BOOK_DOCUMENT,
+        fuzzy=('{alias}.title', '{alias}.author'),
+        scopes={'library_id': '{alias}.library_id'}
+    ),
+    'readers': SearchType(
+        'readers', 'readers', 'r',
+        key=('reader_id',),
+        label='{alias}.full_name',
+        detail='{alias}.phone',
+        document=READER_DOCUMENT,
+        fuzzy=('{alias}.full_name',)
+    ),
+    'topics': SearchType(
+        'topics', 'topics', 't',
+        key=('topic_id',),
+        label='{alias}.name',
+        detail='NULL',
+        document=TOPIC_DOCUMENT,
+        fuzzy=('{alias}.name',)
+    )
+}
+
+
+def ts_query(text):
+    """
+    Запрос tsquery из введённого текста: все слова обязательны, последнее -
+    как префикс (текст ещё набирается). Слова берутся только из букв и
+    цифр, поэтому синтаксис to_tsquery в запрос не попадает.
+    """
+    words = WORD.findall(text.lower())
+    if not words:
+        return None
+    return ' & '.join(words[:-1] + [f'{words[-1]}:*'])
+
+
+def build_search(types, scoped):
+    parts = ' UNION ALL '.join(SEARCH_TYPES[name].query(scoped) for name in types)
+    return f'''
+        WITH search_query AS (
+            SELECT to_tsquery('russian', :tsquery) AS query
+        )
+        SELECT type, key, label, detail, rank
+        FROM ({parts}) hits
+        ORDER BY rank DESC, label, type, key::text
+        LIMIT :limit OFFSET :offset
+    '''
+
+
+def search_query(text, types, scopes, limit, offset):
+    """Запрос поиска и его параметры; None, если в тексте нет ни одного слова."""
+    tsquery = ts_query(text)
+    if tsquery is None:
+        return None
+    scoped = tuple(sorted(param for param, value in scopes.items() if value is not None))
+    query = queries.variant('search', (types, scoped), lambda: build_search(types, scoped))
+    params = {'tsquery': tsquery, 'text': text, 'limit': limit, 'offset': offset}
+    params.update({param: scopes[param] for param in scoped})
+    return query, params
+
+
+def search(text, types, scopes, limit, offset):
+    """Найденные строки, отсортированные по релевантности: [{type, key, label, detail, rank}]."""
+    prepared = search_query(text, types, scopes, limit, offset)
+    if prepared is None:
+        return []
+    query, params = prepared
+    return [dict(row) for row in query.execute(params)]
+
+
+def parse_types(value):
+    types = tuple(name.strip() for name in value.split(',') if name.strip()) if value else tuple(SEARCH_TYPES)
+    unknown = [name for name in types if name not in SEARCH_TYPES]
+    if unknown:
+        raise ValueError(f'Неизвестные типы поиска: {", ".join(unknown)}')
+    return types
+
+
+def parse_search(args, config=None):
+    """
+    Аргументы /search: ?q= - текст, ?types=books,readers - где искать,
+    ?library_id= - книги одной библиотеки, ?limit= и ?offset= - страница.
+    Возвращает (текст, типы, фильтры, limit, offset).
+    """
+    types = parse_types(args.get('types'))
+    limit = parse_limit(args.get('limit', '20'), config)
+    offset = int(args.get('offset', 0))
+    if offset < 0:
+        raise ValueError('Параметр offset не может быть отрицательным')
+    return args.get('q', ''), types, {'library_id': args.get('library_id', type=int)}, limit, offset
+
+
+def search_page(hits, limit, offset):
+    # Запрашивается на одну строку больше, чтобы узнать, есть ли следующая страница
+    next_offset = offset + limit if len(hits) > limit else None
+    return {'data': hits[:limit], 'next_offset': next_offset}
+
+
+def parse_autocomplete(name, args, config=None):
+    """Аргументы подсказок: (текст, типы, фильтры, limit, offset), не больше 50 строк."""
+    if name not in ('books', 'readers'):
+        raise ValueError(f'Подсказки недоступны для {name}')
+    limit = min(parse_limit(args.get('limit', '10'), config), 50)
+    return args.get('q', ''), (name,), {'library_id': args.get('library_id', type=int)}, limit, 0
+
+
+def suggestions(name, hits):
+    """Подсказки [{id, label}], для книг ещё library_id."""
+    if name == 'books':
+        return [
+            {
+                'id': hit['key']['book_id'],
+                'library_id': hit['key']['library_id'],
+                'label': f'{hit["label"]} — {hit["detail"]}' if hit['detail'] else hit['label']
+            }
+            for hit in hits
+        ]
+    return [{'id': hit['key']['reader_id'], 'label': hit['label']} for hit in hits]
+
+
+def search_response():
+    """
+    Поиск по книгам (название, автор, издательство), читателям и темам:
+    полнотекстовый с русской морфологией и нечёткий по триграммам.
+    """
+    try:
+        text, types, scopes, limit, offset = parse_search(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(search_page(search(text, types, scopes, limit + 1, offset), limit, offset))
+
+
+def autocomplete_response(name):
+    """Подсказки для полей выбора (книга, читатель) по мере набора."""
+    try:
+        args = parse_autocomplete(name, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(suggestions(name, search(*args)))
@@ -0,0 +1,37 @@
+from flask import Response, current_app, request, stream_with_context
+
+from . import db
+from .queries import queries
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_stream():
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def stream_response(query, params=None):
+    """
+    Построчная выдача результата в формате NDJSON. Запрос выполняется
+    через серверный (именованный) курсор, строки читаются пачками по
+    STREAM_CHUNK_SIZE, поэтому память процесса не зависит от размера таблицы.
+    """
+    chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+    connection = db.session.connection().execution_options(
+        stream_results=True,
+        max_row_buffer=chunk_size
+    )
+    # Запрос выполняется до начала ответа, чтобы ошибка SQL вернулась как обычная 500
+    result = connection.execute(queries.compiled(query), params or {})
+
+    def generate():
+        try:
+            for rows in result.partitions(chunk_size):
+                yield ''.join(current_app.json.dumps(dict(row)) + '\n' for row in rows)
+        finally:
+            result.close()
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,83 @@
+import hashlib
+import json
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+
+from . import db
+from .queries import queries
+from .streaming import wants_stream
+
+
+# Версия таблицы - сумма её строк-шардов (schema/table_versions.sql)
+TABLE_VERSIONS = queries.register(
+    'table_versions',
+    '''
+        SELECT table_name, SUM(version)::BIGINT
+        FROM table_versions
+        WHERE table_name = ANY(:tables)
+        GROUP BY table_name
+    '''
+)
+
+
+def table_versions(tables):
+    """
+    Версии таблиц. В запросе Flask они читаются один раз и запоминаются
+    в g: ETag (conditional_response) и ключ кэша ответов (ResponseCache)
+    строятся из одних и тех же версий, и старый ответ из кэша не уйдёт
+    под ETag новых данных.
+    """
+    known = g.setdefault('table_versions', {}) if has_request_context() else {}
+    missing = [table for table in tables if table not in known]
+    if missing:
+        result = TABLE_VERSIONS.execute({'tables': missing})
+        known.update({table: 0 for table in missing})
+        known.update(result.fetchall())
+    return [known[table] for table in tables]
+
+
+def conditional_response(tables, view, *args, **kwargs):
+    """
+    ETag ответа строится из версий таблиц и аргументов запроса. Версии
+    читаются до выполнения основного запроса: если между ними успеет
+    зафиксироваться запись, ETag окажется устаревшим и следующий запрос
+    получит полный ответ, а не ошибочный 304.
+    """
+    try:
+        versions = table_versions(tables)
+    except Exception as e:
+        # Без таблицы версий (schema/table_versions.sql не применён) отвечаем без ETag
+        db.session.rollback()
+        current_app.logger.warning(f'Версии таблиц недоступны: {e}')
+        return view(*args, **kwargs)
+
+    payload = json.dumps([
+        request.endpoint,
+        request.view_args,
+        sorted(request.args.items(multi=True)),
+        wants_stream(),
+        versions
+    ], default=str)
+    etag = hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code != 200 or response.is_streamed:
+            return response
+
+    response.set_etag(etag, weak=True)
+    # Браузер должен перепроверять ответ при каждом запросе
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def conditional(*tables):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return conditional_response(tables, view, *args, **kwargs)
+        return wrapper
+    return decorator
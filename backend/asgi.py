@@ -0,0 +1,8 @@
+from app.async_app import create_async_app
+
+# Асинхронные читающие маршруты. Зависимости: pip install -r requirements-async.txt
+# Запуск: hypercorn asgi:app --bind 0.0.0.0:5001
+app = create_async_app()
+
+if __name__ == '__main__':
+    app.run(port=5001)
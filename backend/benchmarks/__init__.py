@@ -0,0 +1,17 @@
+"""
+Нагрузочные проверки и синтетические данные для librariesDB.
+
+Скрипты запускаются из каталога backend и работают с базой из DATABASE_URL:
+
+    python -m benchmarks.synthetic --loans 1000000
+    python -m benchmarks.report_scans
+    python -m benchmarks.index_plans
+    python -m benchmarks.encoding --rows 10000
+    python -m benchmarks.load --concurrency 16 --output baseline.json
+    python -m benchmarks.load --compare baseline.json
+
+Асинхронное приложение (asgi.py) проверяется тем же скриптом по адресу
+работающего сервера, например только отчёты:
+
+    python -m benchmarks.load --url http://localhost:5001 --routes report --concurrency 64
+"""
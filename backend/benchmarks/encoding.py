@@ -0,0 +1,81 @@
+"""
+Стоимость кодирования ответов /loans и /books: стандартный JSON Flask
+против FastJSONProvider (orjson) в виде массива объектов и в формате
+?format=columns, а при установленном pyarrow - ?format=arrow. Строки
+выбираются из базы один раз; измеряется процессорное время кодирования,
+размер ответа и размер после gzip (как при сжатии ответов).
+"""
+import argparse
+import gzip
+import json
+import statistics
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+from app import create_app, db
+from app.columnar import build_table, pa
+from app.encoding import FastJSONProvider, orjson
+from app.pagination import build_query
+from app.routes.routes import LIST_SPECS
+
+
+def fetch(spec, limit):
+    sql = build_query(spec.query, spec.keys(), []) + ' LIMIT :limit'
+    result = db.session.execute(sql, {'limit': limit})
+    return list(result.keys()), [tuple(row) for row in result]
+
+
+def measure(encode, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.process_time()
+        body = encode()
+        timings.append((time.process_time() - started) * 1000)
+    return {
+        'cpu_ms': round(statistics.median(timings), 2),
+        'bytes': len(body),
+        'gzip_bytes': len(gzip.compress(body, compresslevel=6))
+    }
+
+
+def arrow_bytes(columns, rows):
+    table = build_table(columns, rows)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнить кодирование JSON списочных ответов.')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_app()
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    results = {'orjson': orjson is not None}
+    with app.app_context():
+        for name in ('loans', 'books'):
+            columns, rows = fetch(LIST_SPECS[name], args.rows)
+            objects = lambda: [dict(zip(columns, row)) for row in rows]
+            results[name] = {
+                'rows': len(rows),
+                'flask_json': measure(
+                    lambda: default.dumps(objects(), separators=(',', ':')).encode('utf-8'), args.repeat
+                ),
+                'fast_objects': measure(lambda: fast.encode(objects()), args.repeat),
+                'fast_columns': measure(lambda: fast.encode({'columns': columns, 'rows': rows}), args.repeat)
+            }
+            if pa is not None:
+                results[name]['arrow'] = measure(lambda: arrow_bytes(columns, rows), args.repeat)
+        db.session.rollback()
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Планы частых запросов до и после индексов из миграций
+migrations/versions/3f9c2a1d7b4e_hot_query_indexes.py и
+d4e9a2b7c316_books_search_index.py.
+
+Всё выполняется в одной транзакции, которая откатывается: недостающие
+индексы миграции создаются, запросы измеряются (после), затем индексы
+удаляются и запросы измеряются снова (до). DROP INDEX держит
+исключительную блокировку таблиц до конца прогона, поэтому скрипт
+запускается на тестовой базе, например после python -m benchmarks.synthetic.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+from datetime import date, timedelta
+
+from app import create_app, db
+from app.pagination import build_query
+from app.reports import REPORTS
+from app.routes.routes import BOOKS
+from benchmarks.report_scans import explain
+
+MIGRATIONS = [
+    os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions', name)
+    for name in ('3f9c2a1d7b4e_hot_query_indexes.py', 'd4e9a2b7c316_books_search_index.py')
+]
+
+# Проверки и выборки маршрутов, которые опираются на новые индексы
+ROUTE_QUERIES = {
+    'DELETE /delete/book': (
+        'SELECT 1 FROM loans WHERE library_id = :library_id AND book_id = :book_id '
+        'AND return_date IS NULL LIMIT 1'
+    ),
+    'DELETE /delete/reader': 'SELECT 1 FROM loans WHERE reader_id = :reader_id AND return_date IS NULL LIMIT 1',
+    'DELETE /delete/genre': 'SELECT 1 FROM books WHERE genre_id = :genre_id LIMIT 1',
+    # Тот же запрос, что строит list_response для /books?q=&limit=100
+    'GET /books?q=': build_query(BOOKS.query, BOOKS.keys(), [BOOKS.search_condition()]) + ' LIMIT 100',
+}
+
+
+def load_indexes():
+    """Индексы после всех миграций: [(имя, определение)] без удалённых позже."""
+    indexes = {}
+    for path in MIGRATIONS:
+        spec = importlib.util.spec_from_file_location(os.path.basename(path)[:-3], path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        for name, _ in getattr(module, 'DROPPED', []):
+            indexes.pop(name, None)
+        indexes.update(module.INDEXES)
+    return list(indexes.items())
+
+
+def sample_params():
+    row = db.session.execute('''
+        SELECT l.library_id, l.book_id, l.reader_id, b.genre_id, b.title
+        FROM loans l
+        JOIN books b ON l.library_id = b.library_id AND l.book_id = b.book_id
+        WHERE l.return_date IS NULL
+        LIMIT 1
+    ''').fetchone()
+    if row is None:
+        raise SystemExit('Нет открытых абонементов: заполните базу (python -m benchmarks.synthetic)')
+    middle = len(row.title) // 2
+    return {
+        'library_id': row.library_id,
+        'book_id': row.book_id,
+        'reader_id': row.reader_id,
+        'genre_id': row.genre_id,
+        'search': f'%{row.title[max(middle - 2, 0):middle + 2]}%'
+    }
+
+
+def workload(params):
+    today = date.today()
+    filters = {
+        'loans-by-period': {
+            'start_date': (today - timedelta(days=30)).isoformat(),
+            'end_date': today.isoformat()
+        },
+        'overdue-loans': {},
+        'genre-popularity': {'period_months': 1}
+    }
+    queries = {label: (sql, params) for label, sql in ROUTE_QUERIES.items()}
+    for name, report in REPORTS.items():
+        queries[f'POST /report/{name}'] = report.sql(filters[name])
+    return queries
+
+
+def measure(queries, repeat):
+    results = {}
+    for label, (sql, params) in queries.items():
+        # Первый прогон прогревает кэш страниц и не учитывается
+        explain(sql, params)
+        runs = [explain(sql, params) for _ in range(repeat)]
+        results[label] = {
+            'buffers': int(statistics.median(run['buffers'] for run in runs)),
+            'ms': round(statistics.median(run['ms'] for run in runs), 3)
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнить планы запросов без индексов миграции и с ними.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        indexes = load_indexes()
+        queries = workload(sample_params())
+
+        db.session.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, definition in indexes:
+            db.session.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {definition}')
+        db.session.execute('ANALYZE loans')
+        db.session.execute('ANALYZE books')
+        after = measure(queries, args.repeat)
+
+        for name, _ in indexes:
+            db.session.execute(f'DROP INDEX {name}')
+        before = measure(queries, args.repeat)
+        db.session.rollback()
+
+    results = {
+        label: {
+            'before': before[label],
+            'after': after[label],
+            'time_ratio': round(after[label]['ms'] / before[label]['ms'], 3) if before[label]['ms'] else None
+        }
+        for label in queries
+    }
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
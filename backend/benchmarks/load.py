@@ -0,0 +1,369 @@
+"""
+Нагрузочный прогон всех маршрутов API.
+
+Каждый маршрут вызывается --requests раз в --concurrency потоков через
+тестовый клиент Flask (по умолчанию) или по HTTP (--url, сервер должен
+работать с той же базой). Для маршрута считаются задержки p50/p95/p99,
+пропускная способность и, при работе в процессе, пиковый объём памяти
+Python на один запрос (tracemalloc, отдельным прогоном). Результат - JSON
+(--output), который можно сравнить с предыдущим прогоном (--compare).
+
+Изменяющие маршруты работают с одноразовыми записями (как в
+mutation_latency); записи с меткой прогона удаляются в конце. Нужна
+заполненная база: python -m benchmarks.synthetic.
+"""
+import argparse
+import json
+import math
+import resource
+import sys
+import time
+import tracemalloc
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from app import create_app, db
+from benchmarks import mutation_latency
+from benchmarks.mutation_latency import scalar
+
+MARKER = f'bench-{uuid.uuid4().hex[:8]}'
+
+
+class Fixtures:
+    """Существующие строки для читающих маршрутов и метка для создаваемых."""
+
+    def __init__(self):
+        row = db.session.execute('''
+            SELECT l.library_id, l.book_id, l.reader_id, b.genre_id
+            FROM loans l
+            JOIN books b ON l.library_id = b.library_id AND l.book_id = b.book_id
+            LIMIT 1
+        ''').fetchone()
+        if row is None:
+            raise SystemExit('Нет абонементов: заполните базу (python -m benchmarks.synthetic)')
+        self.library_id = row.library_id
+        self.book_id = row.book_id
+        self.reader_id = row.reader_id
+        self.genre_id = row.genre_id
+        # Книга с большим запасом экземпляров для выдач во время прогона
+        self.loan_book_id = scalar('''
+            INSERT INTO books (library_id, genre_id, author, title, quantity)
+            VALUES (:library_id, :genre_id, :marker, :marker, 1000000)
+            RETURNING book_id
+        ''', {'library_id': self.library_id, 'genre_id': self.genre_id, 'marker': MARKER})
+
+    def reader(self):
+        return scalar(
+            "INSERT INTO readers (full_name, address, phone) VALUES (:name, '', '') RETURNING reader_id",
+            {'name': f'{MARKER}-{uuid.uuid4().hex}'}
+        )
+
+    def cleanup(self):
+        # Абонементы и тематики удаляемых книг удаляет триггер
+        db.session.execute('''
+            DELETE FROM loans WHERE reader_id IN (SELECT reader_id FROM readers WHERE full_name LIKE :prefix)
+        ''', {'prefix': f'{MARKER}%'})
+        db.session.execute('DELETE FROM books WHERE title LIKE :prefix', {'prefix': f'{MARKER}%'})
+        db.session.execute('DELETE FROM readers WHERE full_name LIKE :prefix', {'prefix': f'{MARKER}%'})
+        db.session.execute('DELETE FROM libraries WHERE name LIKE :prefix', {'prefix': f'{MARKER}%'})
+        db.session.execute('DELETE FROM topics WHERE name LIKE :prefix', {'prefix': f'{MARKER}%'})
+        db.session.commit()
+
+
+def name():
+    return f'{MARKER}-{uuid.uuid4().hex}'
+
+
+def get(url):
+    return lambda fixtures: ('GET', url.format(f=fixtures), None)
+
+
+def post(url, body):
+    return lambda fixtures: ('POST', url, body(fixtures))
+
+
+def from_mutation_latency(setup):
+    """Сценарий 'ok' из mutation_latency: одноразовая запись и её уборка."""
+    def request(fixtures):
+        (method, url, body), cleanup = setup()
+        return method, url, body, cleanup
+    return request
+
+
+def add_loan(fixtures):
+    return 'POST', '/add/loan', {
+        'library_id': fixtures.library_id,
+        'book_id': fixtures.loan_book_id,
+        'reader_id': fixtures.reader(),
+        'issue_date': date.today().isoformat(),
+        'due_date': (date.today() + timedelta(days=14)).isoformat(),
+        'deposit': 100
+    }
+
+
+def edit_reader(fixtures):
+    return 'PUT', '/edit/readers', {
+        'column': 'address',
+        'value': name(),
+        'rowData': {'reader_id': fixtures.reader()}
+    }
+
+
+def batch(fixtures):
+    operations = [
+        {'op': 'edit', 'table': 'readers', 'key': {'reader_id': fixtures.reader()}, 'values': {'phone': str(n)}}
+        for n in range(10)
+    ]
+    operations.append({'op': 'add', 'table': 'readers', 'values': {'full_name': name(), 'address': '', 'phone': ''}})
+    return 'POST', '/batch', {'operations': operations}
+
+
+def bulk_readers(fixtures):
+    lines = ['full_name,address,phone'] + [f'{name()},Адрес,+7000' for _ in range(100)]
+    return 'POST', '/bulk/readers', ('\n'.join(lines) + '\n').encode('utf-8'), 'text/csv'
+
+
+def report_period(fixtures):
+    return {
+        'start_date': (date.today() - timedelta(days=365)).isoformat(),
+        'end_date': date.today().isoformat()
+    }
+
+
+ROUTES = {
+    'GET /libraries': get('/libraries'),
+    'GET /genres': get('/genres'),
+    'GET /readers': get('/readers'),
+    'GET /loans': get('/loans'),
+    'GET /available-books': get('/available-books'),
+    'GET /books': get('/books'),
+    'GET /topics': get('/topics'),
+    'GET /book-topics-detailed': get('/book-topics-detailed'),
+    'GET /book-genres-count': get('/book-genres-count'),
+    'GET /library-books-quantity': get('/library-books-quantity'),
+    'GET /readers-with-loans': get('/readers-with-loans'),
+    'GET /books-with-topics': get('/books-with-topics'),
+    'GET /book-topics/<library_id>/<book_id>': get('/book-topics/{f.library_id}/{f.book_id}'),
+    'GET /distinct/<table>/<column>': get('/distinct/books/genre_name'),
+    'GET /cache/stats': get('/cache/stats'),
+    'GET /report/cache/stats': get('/report/cache/stats'),
+    'GET /queries/stats': get('/queries/stats'),
+    'GET /health/pool': get('/health/pool'),
+    'GET /health/replicas': get('/health/replicas'),
+    'GET /metrics': get('/metrics'),
+    'POST /report/loans-by-period': post('/report/loans-by-period', report_period),
+    'POST /report/overdue-loans': post('/report/overdue-loans', lambda fixtures: {}),
+    'POST /report/genre-popularity': post('/report/genre-popularity', lambda fixtures: {'period_months': 12}),
+    'POST /report/overdue-loans?async=1': post('/report/overdue-loans?async=1', lambda fixtures: {}),
+    'POST /add/library': post('/add/library', lambda fixtures: {'name': name(), 'address': ''}),
+    'POST /add/reader': post('/add/reader', lambda fixtures: {'full_name': name(), 'address': '', 'phone': ''}),
+    'POST /add/topic': post('/add/topic', lambda fixtures: {'name': name()}),
+    'POST /add/book': post('/add/book', lambda fixtures: {
+        'library_id': fixtures.library_id,
+        'genre_id': fixtures.genre_id,
+        'author': MARKER,
+        'title': name(),
+        'publisher': '',
+        'publication_place': '',
+        'publication_year': 2000,
+        'quantity': 1
+    }),
+    'POST /add/loan': add_loan,
+    'POST /add/reader-with-loan': post('/add/reader-with-loan', lambda fixtures: {
+        'full_name': name(),
+        'address': '',
+        'phone': '',
+        'library_id': fixtures.library_id,
+        'book_id': fixtures.loan_book_id,
+        'issue_date': date.today().isoformat(),
+        'due_date': (date.today() + timedelta(days=14)).isoformat(),
+        'deposit': 100
+    }),
+    'PUT /edit/<table>': edit_reader,
+    'POST /batch': batch,
+    'POST /bulk/<table>': bulk_readers,
+    **{
+        f'{method} {path}': from_mutation_latency(scenarios['ok'])
+        for (method, path), scenarios in (
+            (('DELETE', '/delete/reader/<reader_id>'), mutation_latency.ROUTES['delete_reader']),
+            (('DELETE', '/delete/library/<library_id>'), mutation_latency.ROUTES['delete_library']),
+            (('DELETE', '/delete/topic/<topic_id>'), mutation_latency.ROUTES['delete_topic']),
+            (('DELETE', '/delete/genre/<genre_id>'), mutation_latency.ROUTES['delete_genre']),
+            (('DELETE', '/delete/book/<library_id>/<book_id>'), mutation_latency.ROUTES['delete_book']),
+            (('POST', '/add/book-topic'), mutation_latency.ROUTES['add_book_topic']),
+            (('DELETE', '/delete/book-topic'), mutation_latency.ROUTES['delete_book_topic'])
+        )
+    }
+}
+
+
+class InProcess:
+    def __init__(self, app):
+        self.app = app
+
+    def send(self, method, url, body, content_type=None):
+        client = self.app.test_client()
+        if isinstance(body, bytes):
+            response = client.open(url, method=method, data=body, content_type=content_type)
+        else:
+            response = client.open(url, method=method, json=body)
+        response.get_data()
+        return response.status_code
+
+
+class Http:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def send(self, method, url, body, content_type=None):
+        headers = {}
+        if isinstance(body, bytes):
+            data = body
+            headers['Content-Type'] = content_type
+        elif body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        else:
+            data = None
+        request = urllib.request.Request(self.base_url + url, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+
+def percentile(values, fraction):
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def run_route(app, transport, fixtures, build, requests, concurrency):
+    def one(_):
+        # Подготовка записей идёт в своём контексте и не входит в задержку
+        with app.app_context():
+            spec = build(fixtures)
+            method, url, body = spec[:3]
+            extra = spec[3:]
+            cleanup = next((item for item in extra if callable(item)), None)
+            content_type = next((item for item in extra if isinstance(item, str)), None)
+            started = time.perf_counter()
+            status = transport.send(method, url, body, content_type)
+            elapsed = (time.perf_counter() - started) * 1000
+            if cleanup is not None:
+                cleanup()
+            return elapsed, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    timings = sorted(elapsed for elapsed, _ in results)
+    statuses = sorted({status for _, status in results})
+    return {
+        'requests': requests,
+        'errors': sum(1 for _, status in results if status >= 400),
+        'status': statuses,
+        'p50_ms': round(percentile(timings, 0.50), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        # Пропускная способность с учётом подготовки записей для изменяющих маршрутов
+        'rps': round(requests / wall, 1) if wall else None
+    }
+
+
+def peak_memory(app, transport, fixtures, build):
+    """Пик выделенной Python памяти за один запрос (только при работе в процессе)."""
+    with app.app_context():
+        spec = build(fixtures)
+        method, url, body = spec[:3]
+        cleanup = next((item for item in spec[3:] if callable(item)), None)
+        content_type = next((item for item in spec[3:] if isinstance(item, str)), None)
+        tracemalloc.start()
+        try:
+            transport.send(method, url, body, content_type)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        if cleanup is not None:
+            cleanup()
+    return round(peak / 1024, 1)
+
+
+def compare(results, baseline, threshold):
+    """Маршруты, у которых p95 вырос или пропускная способность упала больше чем в threshold раз."""
+    regressions = {}
+    for route, current in results['routes'].items():
+        previous = baseline['routes'].get(route)
+        if previous is None:
+            continue
+        p95_ratio = current['p95_ms'] / previous['p95_ms'] if previous['p95_ms'] else None
+        rps_ratio = previous['rps'] / current['rps'] if current['rps'] else None
+        if (p95_ratio and p95_ratio > threshold) or (rps_ratio and rps_ratio > threshold):
+            regressions[route] = {
+                'p95_ms': [previous['p95_ms'], current['p95_ms']],
+                'rps': [previous['rps'], current['rps']]
+            }
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон маршрутов API.')
+    parser.add_argument('--requests', type=int, default=200, help='Запросов на маршрут')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--url', help='Адрес работающего сервера; по умолчанию тестовый клиент Flask')
+    parser.add_argument('--routes', help='Подстрока в имени маршрута, например report')
+    parser.add_argument('--output', help='Файл для JSON с результатами')
+    parser.add_argument('--compare', help='JSON предыдущего прогона для сравнения')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Допустимое ухудшение при сравнении')
+    args = parser.parse_args()
+
+    app = create_app()
+    transport = Http(args.url) if args.url else InProcess(app)
+    routes = {route: build for route, build in ROUTES.items() if not args.routes or args.routes in route}
+
+    results = {
+        'meta': {
+            'mode': 'http' if args.url else 'test_client',
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+        },
+        'routes': {}
+    }
+    with app.app_context():
+        fixtures = Fixtures()
+    try:
+        for route, build in routes.items():
+            results['routes'][route] = run_route(app, transport, fixtures, build, args.requests, args.concurrency)
+            if not args.url:
+                results['routes'][route]['peak_kb'] = peak_memory(app, transport, fixtures, build)
+            print(route, json.dumps(results['routes'][route]), file=sys.stderr)
+    finally:
+        with app.app_context():
+            fixtures.cleanup()
+
+    # ru_maxrss в килобайтах (Linux)
+    results['meta']['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            results['regressions'] = compare(results, json.load(f), args.threshold)
+        exit_code = 1 if results['regressions'] else 0
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
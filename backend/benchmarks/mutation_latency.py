@@ -0,0 +1,169 @@
+"""
+Задержка изменяющих маршрутов и число обращений к базе на запрос.
+
+Для каждого маршрута создаётся одноразовая запись, затем маршрут
+вызывается через тестовый клиент Flask. Считаются операторы SQL,
+выполненные за время запроса (обращения к серверу), и время ответа.
+Нужны применённые schema/*.sql и хотя бы одна библиотека и жанр.
+"""
+import argparse
+import json
+import statistics
+import time
+import uuid
+
+from sqlalchemy import event
+
+from app import create_app, db
+
+
+def scalar(query, params=None):
+    value = db.session.execute(query, params or {}).scalar()
+    db.session.commit()
+    return value
+
+
+def create_book():
+    library_id = scalar('SELECT MIN(library_id) FROM libraries')
+    genre_id = scalar('SELECT MIN(genre_id) FROM genres')
+    book_id = scalar('''
+        INSERT INTO books (library_id, genre_id, author, title, quantity)
+        VALUES (:library_id, :genre_id, 'Бенчмарк', :title, 1)
+        RETURNING book_id
+    ''', {'library_id': library_id, 'genre_id': genre_id, 'title': uuid.uuid4().hex})
+    return library_id, book_id
+
+
+def create_topic():
+    return scalar('INSERT INTO topics (name) VALUES (:name) RETURNING topic_id', {'name': uuid.uuid4().hex})
+
+
+def delete_fixture(library_id=None, book_id=None, topic_id=None):
+    if book_id is not None:
+        db.session.execute(
+            'DELETE FROM book_topics WHERE library_id = :library_id AND book_id = :book_id',
+            {'library_id': library_id, 'book_id': book_id}
+        )
+        db.session.execute(
+            'DELETE FROM books WHERE library_id = :library_id AND book_id = :book_id',
+            {'library_id': library_id, 'book_id': book_id}
+        )
+    if topic_id is not None:
+        db.session.execute('DELETE FROM topics WHERE topic_id = :topic_id', {'topic_id': topic_id})
+    db.session.commit()
+
+
+def delete_reader():
+    reader_id = scalar(
+        "INSERT INTO readers (full_name, address, phone) VALUES (:name, '', '') RETURNING reader_id",
+        {'name': uuid.uuid4().hex}
+    )
+    return ('DELETE', f'/delete/reader/{reader_id}', None), lambda: None
+
+
+def delete_library():
+    library_id = scalar(
+        "INSERT INTO libraries (name, address) VALUES (:name, '') RETURNING library_id",
+        {'name': uuid.uuid4().hex}
+    )
+    return ('DELETE', f'/delete/library/{library_id}', None), lambda: None
+
+
+def delete_topic():
+    return ('DELETE', f'/delete/topic/{create_topic()}', None), lambda: None
+
+
+def delete_genre():
+    genre_id = scalar('INSERT INTO genres (name) VALUES (:name) RETURNING genre_id', {'name': uuid.uuid4().hex})
+    return ('DELETE', f'/delete/genre/{genre_id}', None), lambda: None
+
+
+def delete_book():
+    library_id, book_id = create_book()
+    return ('DELETE', f'/delete/book/{library_id}/{book_id}', None), lambda: None
+
+
+def add_book_topic():
+    library_id, book_id = create_book()
+    topic_id = create_topic()
+    body = {'library_id': library_id, 'book_id': book_id, 'topic_id': topic_id}
+    return ('POST', '/add/book-topic', body), lambda: delete_fixture(library_id, book_id, topic_id)
+
+
+def delete_book_topic():
+    library_id, book_id = create_book()
+    topic_id = create_topic()
+    scalar(
+        'INSERT INTO book_topics (library_id, book_id, topic_id) VALUES (:library_id, :book_id, :topic_id)',
+        {'library_id': library_id, 'book_id': book_id, 'topic_id': topic_id}
+    )
+    body = {'library_id': library_id, 'book_id': book_id, 'topic_id': topic_id}
+    return ('DELETE', '/delete/book-topic', body), lambda: delete_fixture(library_id, book_id, topic_id)
+
+
+def not_found(method, url, body=None):
+    return lambda: ((method, url, body), lambda: None)
+
+
+ROUTES = {
+    'delete_reader': {'ok': delete_reader, 'not_found': not_found('DELETE', '/delete/reader/0')},
+    'delete_library': {'ok': delete_library, 'not_found': not_found('DELETE', '/delete/library/0')},
+    'delete_topic': {'ok': delete_topic, 'not_found': not_found('DELETE', '/delete/topic/0')},
+    'delete_genre': {'ok': delete_genre, 'not_found': not_found('DELETE', '/delete/genre/0')},
+    'delete_book': {'ok': delete_book, 'not_found': not_found('DELETE', '/delete/book/0/0')},
+    'add_book_topic': {
+        'ok': add_book_topic,
+        'not_found': not_found('POST', '/add/book-topic', {'library_id': 0, 'book_id': 0, 'topic_id': 0})
+    },
+    'delete_book_topic': {
+        'ok': delete_book_topic,
+        'not_found': not_found('DELETE', '/delete/book-topic', {'library_id': 0, 'book_id': 0, 'topic_id': 0})
+    }
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Задержка изменяющих маршрутов.')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    counter = {'active': False, 'statements': 0}
+
+    results = {}
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            if counter['active']:
+                counter['statements'] += 1
+
+        for route, scenarios in ROUTES.items():
+            results[route] = {}
+            for scenario, setup in scenarios.items():
+                timings = []
+                statements = []
+                statuses = set()
+                for _ in range(args.repeat):
+                    (method, url, body), cleanup = setup()
+                    counter.update(active=True, statements=0)
+                    started = time.perf_counter()
+                    response = client.open(url, method=method, json=body)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    counter['active'] = False
+                    statements.append(counter['statements'])
+                    statuses.add(response.status_code)
+                    cleanup()
+                timings.sort()
+                results[route][scenario] = {
+                    'status': sorted(statuses),
+                    'statements': max(statements),
+                    'p50_ms': round(statistics.median(timings), 2),
+                    'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 2)
+                }
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
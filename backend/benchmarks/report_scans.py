@@ -0,0 +1,82 @@
+"""
+Сравнение стоимости отчётов: прежняя схема (запрос детализации и отдельный
+запрос итогов) против одного запроса с GROUPING SETS.
+
+Для каждого отчёта выполняется EXPLAIN (ANALYZE, BUFFERS) и сравниваются
+прочитанные страницы (shared hit + read) и время выполнения. Данные для
+проверки на большом объёме: python -m benchmarks.synthetic.
+"""
+import argparse
+import json
+import statistics
+from datetime import date, timedelta
+
+from app import create_app, db
+from app.reports import REPORTS
+
+
+def explain(query, params):
+    plan = db.session.execute('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + query, params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]['Plan']
+    return {
+        'buffers': root['Shared Hit Blocks'] + root['Shared Read Blocks'],
+        'ms': plan[0]['Execution Time']
+    }
+
+
+def measure(report, filters, grouping_sets_list, repeat):
+    """Суммарная стоимость запросов, по одному на каждый вариант grouping_sets."""
+    buffers = []
+    timings = []
+    for _ in range(repeat):
+        runs = [explain(*report.sql(filters, grouping_sets)) for grouping_sets in grouping_sets_list]
+        buffers.append(sum(run['buffers'] for run in runs))
+        timings.append(sum(run['ms'] for run in runs))
+    return {
+        'queries': len(grouping_sets_list),
+        'buffers': int(statistics.median(buffers)),
+        'ms': round(statistics.median(timings), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнить двухзапросные и однопроходные отчёты.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--library-id', type=int)
+    args = parser.parse_args()
+
+    today = date.today()
+    filters = {
+        'loans-by-period': {
+            'start_date': (today - timedelta(days=365)).isoformat(),
+            'end_date': today.isoformat()
+        },
+        'overdue-loans': {},
+        'genre-popularity': {'period_months': 12}
+    }
+
+    app = create_app()
+    results = {}
+    with app.app_context():
+        for name, report in REPORTS.items():
+            report_filters = dict(filters[name], library_id=args.library_id)
+            # Прогрев кэша страниц, чтобы оба варианта читали из одинакового состояния
+            report.run(report_filters)
+
+            legacy = measure(report, report_filters, [[report.group_by], [()]], args.repeat)
+            single = measure(report, report_filters, [None], args.repeat)
+            results[name] = {
+                'legacy': legacy,
+                'single_pass': single,
+                'buffers_ratio': round(single['buffers'] / legacy['buffers'], 2) if legacy['buffers'] else None,
+                'time_ratio': round(single['ms'] / legacy['ms'], 2) if legacy['ms'] else None
+            }
+        db.session.rollback()
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Генератор синтетических данных для нагрузочных проверок.
+
+Заполняет существующие таблицы библиотек, жанров, читателей, книг и
+абонементов средствами generate_series на стороне сервера. Запускать
+только на отдельной базе: строки добавляются к уже имеющимся.
+
+Популярность неравномерна: номер книги, читатель и библиотека абонемента
+выбираются как floor(power(random(), skew) * n), поэтому при skew > 1
+небольшая доля книг и читателей даёт большую часть выдач (skew = 1 -
+равномерное распределение). Совпадающие абонементы (та же книга,
+читатель и день выдачи - первичный ключ loans) пропускаются, поэтому при
+большом skew строк выдачи может оказаться меньше заказанного.
+
+Построчные триггеры на время загрузки отключаются через
+session_replication_role, что доступно только суперпользователю; без
+этого права отключаются пользовательские триггеры books и loans
+(ALTER TABLE ... DISABLE TRIGGER USER, нужен владелец таблиц).
+"""
+import argparse
+import json
+import time
+
+from sqlalchemy.exc import DBAPIError
+
+from app import create_app, db
+
+# Таблицы, триггеры которых отключаются без прав суперпользователя
+TRIGGER_TABLES = ('books', 'loans')
+
+
+def disable_triggers():
+    try:
+        with db.session.begin_nested():
+            db.session.execute("SET LOCAL session_replication_role = 'replica'")
+        return 'replica'
+    except DBAPIError:
+        # permission denied: session_replication_role требует суперпользователя
+        for table in TRIGGER_TABLES:
+            db.session.execute(f'ALTER TABLE {table} DISABLE TRIGGER USER')
+        return 'tables'
+
+
+def enable_triggers(mode):
+    if mode == 'replica':
+        db.session.execute("SET LOCAL session_replication_role = 'origin'")
+    else:
+        for table in TRIGGER_TABLES:
+            db.session.execute(f'ALTER TABLE {table} ENABLE TRIGGER USER')
+
+
+def generate(libraries=10, genres=30, readers=50000, books_per_library=5000, loans=1000000, days=730,
+             skew=2.0):
+    params = {
+        'libraries': libraries,
+        'genres': genres,
+        'readers': readers,
+        'books_per_library': books_per_library,
+        'loans': loans,
+        'days': days,
+        'skew': skew
+    }
+
+    # Построчные триггеры (доступность, дневные агрегаты) на миллионах строк
+    # медленнее пересчёта целиком, поэтому отключаем их и пересчитываем в конце
+    triggers = disable_triggers()
+
+    library_ids = [row[0] for row in db.session.execute('''
+        INSERT INTO libraries (name, address)
+        SELECT 'Библиотека ' || md5(random()::text), 'Адрес ' || n
+        FROM generate_series(1, :libraries) AS n
+        RETURNING library_id
+    ''', params)]
+
+    genre_ids = [row[0] for row in db.session.execute('''
+        INSERT INTO genres (name)
+        SELECT 'Жанр ' || md5(random()::text)
+        FROM generate_series(1, :genres) AS n
+        RETURNING genre_id
+    ''', params)]
+
+    reader_ids = [row[0] for row in db.session.execute('''
+        INSERT INTO readers (full_name, address, phone)
+        SELECT 'Читатель ' || n, 'Адрес ' || n, '+7' || lpad(n::text, 10, '0')
+        FROM generate_series(1, :readers) AS n
+        RETURNING reader_id
+    ''', params)]
+
+    params.update({'library_ids': library_ids, 'genre_ids': genre_ids, 'reader_ids': reader_ids})
+
+    db.session.execute('''
+        INSERT INTO books (
+            library_id, book_id, genre_id, author, title,
+            publisher, publication_place, publication_year, quantity
+        )
+        SELECT
+            lib.library_id,
+            n,
+            (:genre_ids)[1 + floor(random() * cardinality(:genre_ids))::int],
+            'Автор ' || (n % 997),
+            'Книга ' || n,
+            'Издательство ' || (n % 50),
+            'Город ' || (n % 20),
+            1950 + (n % 75),
+            1 + floor(random() * 10)::int
+        FROM unnest(CAST(:library_ids AS INTEGER[])) AS lib(library_id)
+        CROSS JOIN generate_series(1, :books_per_library) AS n
+    ''', params)
+
+    # Новые библиотеки получают книги с номерами 1..books_per_library
+    inserted_loans = db.session.execute('''
+        INSERT INTO loans (
+            library_id, book_id, reader_id,
+            issue_date, due_date, return_date, deposit
+        )
+        SELECT
+            library_id,
+            book_id,
+            (:reader_ids)[1 + floor(power(random(), :skew) * cardinality(:reader_ids))::int],
+            issued,
+            issued + 14,
+            CASE WHEN random() < 0.8 THEN LEAST(issued + floor(random() * 30)::int, CURRENT_DATE) END,
+            CASE WHEN random() < 0.5 THEN round((random() * 1000)::numeric, 2) END
+        FROM (
+            SELECT
+                (:library_ids)[1 + floor(power(random(), :skew) * cardinality(:library_ids))::int] AS library_id,
+                1 + floor(power(random(), :skew) * :books_per_library)::int AS book_id,
+                CURRENT_DATE - floor(random() * :days)::int AS issued
+            FROM generate_series(1, :loans)
+        ) AS l
+        ON CONFLICT DO NOTHING
+    ''', params).rowcount
+
+    enable_triggers(triggers)
+    db.session.execute('SELECT rebuild_book_availability()')
+    db.session.execute('SELECT rebuild_loan_daily_stats()')
+    db.session.commit()
+    # ANALYZE после фиксации: ALTER TABLE держит блокировку таблиц до конца транзакции
+    db.session.execute('ANALYZE')
+    db.session.commit()
+    return {'loans_inserted': inserted_loans, 'triggers': triggers}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Заполнить базу синтетическими данными.')
+    parser.add_argument('--libraries', type=int, default=10)
+    parser.add_argument('--genres', type=int, default=30)
+    parser.add_argument('--readers', type=int, default=50000)
+    parser.add_argument('--books-per-library', type=int, default=5000)
+    parser.add_argument('--loans', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=730, help='Глубина истории выдач в днях')
+    parser.add_argument('--skew', type=float, default=2.0, help='Неравномерность популярности (1 - равномерно)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        result = generate(
+            libraries=args.libraries,
+            genres=args.genres,
+            readers=args.readers,
+            books_per_library=args.books_per_library,
+            loans=args.loans,
+            days=args.days,
+            skew=args.skew
+        )
+        print(json.dumps({**vars(args), **result, 'seconds': round(time.perf_counter() - started, 1)}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Индексы для частых запросов: открытые абонементы, отчёты, поиск
+
+Revision ID: 3f9c2a1d7b4e
+Revises:
+Create Date: 2026-10-18 14:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2a1d7b4e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# Имя индекса и его определение; список используется и бенчмарком
+# benchmarks/index_plans.py для сравнения планов до и после
+INDEXES = [
+    # Открытые абонементы книги: проверки удаления книг, доступность
+    ('loans_open_book_idx', 'loans (library_id, book_id) WHERE return_date IS NULL'),
+    # Просроченные абонементы: отчёт overdue-loans читает только индекс
+    ('loans_open_due_idx', 'loans (due_date) INCLUDE (library_id, reader_id, deposit) WHERE return_date IS NULL'),
+    # Выдачи за период (loans-by-period, genre-popularity после закрытых дней)
+    ('loans_issue_date_idx', 'loans (issue_date) INCLUDE (library_id, book_id, reader_id, return_date, deposit)'),
+    # Соединение с читателями и проверка удаления читателя
+    ('loans_reader_idx', 'loans (reader_id)'),
+    # Соединение абонементов с книгами без чтения таблицы books
+    ('books_key_genre_idx', 'books (library_id, book_id) INCLUDE (genre_id)'),
+    # Группировка и проверка удаления жанра
+    ('books_genre_idx', 'books (genre_id) INCLUDE (library_id, book_id)'),
+    # Поиск по названию и автору (ILIKE, similarity)
+    ('books_title_trgm_idx', 'books USING gin (title gin_trgm_ops)'),
+    ('books_author_trgm_idx', 'books USING gin (author gin_trgm_ops)'),
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY не блокирует запись в таблицы, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
+    op.execute('ANALYZE loans')
+    op.execute('ANALYZE books')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
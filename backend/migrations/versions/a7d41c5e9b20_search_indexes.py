@@ -0,0 +1,46 @@
+"""Полнотекстовый и триграммный поиск по книгам, читателям и темам
+
+Revision ID: a7d41c5e9b20
+Revises: 3f9c2a1d7b4e
+Create Date: 2026-10-18 18:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d41c5e9b20'
+down_revision = '3f9c2a1d7b4e'
+branch_labels = None
+depends_on = None
+
+# Выражения tsvector должны совпадать с документами app/search.py
+# (BOOK_DOCUMENT, READER_DOCUMENT, TOPIC_DOCUMENT), иначе индекс не подходит
+INDEXES = [
+    ('books_search_idx', "books USING gin (("
+        "setweight(to_tsvector('russian', coalesce(title, '')), 'A')"
+        " || setweight(to_tsvector('russian', coalesce(author, '')), 'B')"
+        " || setweight(to_tsvector('russian', coalesce(publisher, '')), 'C')))"),
+    ('readers_search_idx', "readers USING gin ((to_tsvector('russian', coalesce(full_name, ''))))"),
+    ('topics_search_idx', "topics USING gin ((to_tsvector('russian', coalesce(name, ''))))"),
+    # Нечёткий поиск с опечатками (word_similarity, оператор <%);
+    # для books.title и books.author индексы созданы в 3f9c2a1d7b4e
+    ('readers_full_name_trgm_idx', 'readers USING gin (full_name gin_trgm_ops)'),
+    ('topics_name_trgm_idx', 'topics USING gin (name gin_trgm_ops)'),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
+    op.execute('ANALYZE books')
+    op.execute('ANALYZE readers')
+    op.execute('ANALYZE topics')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,39 @@
+"""Счётчики номеров книг (app/schema/book_id_counters.sql)
+
+Revision ID: b2c5e7a9d013
+Revises: a7d41c5e9b20
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2c5e7a9d013'
+down_revision = 'a7d41c5e9b20'
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'app', 'schema', 'book_id_counters.sql'
+)
+
+
+def upgrade():
+    # Файл схемы идемпотентен; без него добавление книг (add_book, /bulk/books)
+    # не получает номер. Счётчик библиотеки заполняется при первом обращении.
+    # exec_driver_sql без параметров: текст (format('%I')) уходит в драйвер как есть
+    with open(SCHEMA, encoding='utf-8') as f:
+        op.get_bind().exec_driver_sql(f.read())
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS books_advance_book_id_counter_trigger ON books')
+    op.execute('DROP TRIGGER IF EXISTS books_assign_book_id_trigger ON books')
+    op.execute('DROP FUNCTION IF EXISTS books_advance_book_id_counter()')
+    op.execute('DROP FUNCTION IF EXISTS books_assign_book_id()')
+    op.execute('DROP FUNCTION IF EXISTS allocate_book_ids(INTEGER, INTEGER)')
+    op.execute('DROP TABLE IF EXISTS book_id_counters')
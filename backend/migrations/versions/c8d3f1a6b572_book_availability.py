@@ -0,0 +1,42 @@
+"""Счётчик доступных экземпляров книг (app/schema/availability.sql)
+
+Revision ID: c8d3f1a6b572
+Revises: b2c5e7a9d013
+Create Date: 2026-10-19 10:20:00.000000
+
+"""
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8d3f1a6b572'
+down_revision = 'b2c5e7a9d013'
+branch_labels = None
+depends_on = None
+
+SCHEMA = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'app', 'schema', 'availability.sql'
+)
+
+
+def upgrade():
+    # Таблица, триггеры на books и loans и первичное заполнение
+    # (rebuild_book_availability) - /available-books читает только счётчик
+    with open(SCHEMA, encoding='utf-8') as f:
+        op.get_bind().exec_driver_sql(f.read())
+    op.execute('ANALYZE book_availability')
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS book_availability_loan_trigger ON loans')
+    op.execute('DROP TRIGGER IF EXISTS book_availability_quantity_trigger ON books')
+    op.execute('DROP TRIGGER IF EXISTS book_availability_insert_trigger ON books')
+    op.execute('DROP FUNCTION IF EXISTS rebuild_book_availability()')
+    op.execute('DROP VIEW IF EXISTS book_availability_mismatches')
+    op.execute('DROP FUNCTION IF EXISTS book_availability_on_loan_change()')
+    op.execute('DROP FUNCTION IF EXISTS book_availability_on_quantity_update()')
+    op.execute('DROP FUNCTION IF EXISTS book_availability_on_book_insert()')
+    op.execute('DROP TABLE IF EXISTS book_availability')
@@ -0,0 +1,52 @@
+"""Индекс поиска GET /books?q= вместо индекса, повторяющего первичный ключ
+
+Revision ID: d4e9a2b7c316
+Revises: c8d3f1a6b572
+Create Date: 2026-10-19 10:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e9a2b7c316'
+down_revision = 'c8d3f1a6b572'
+branch_labels = None
+depends_on = None
+
+# Создаваемые индексы; benchmarks/index_plans.py читает их вместе с
+# индексами 3f9c2a1d7b4e_hot_query_indexes.py
+INDEXES = [
+    # GET /books?q=: выражение совпадает с listing.search_expression для BOOKS.search
+    (
+        'books_search_trgm_idx',
+        "books USING gin ((coalesce(title, '') || ' ' || coalesce(author, '') || ' ' || "
+        "coalesce(publisher, '') || ' ' || coalesce(publication_place, '')) gin_trgm_ops)"
+    ),
+]
+
+# Удаляемые индексы (определение нужно для downgrade): books_key_genre_idx
+# повторяет первичный ключ books и только замедляет запись
+DROPPED = [
+    ('books_key_genre_idx', 'books (library_id, book_id) INCLUDE (genre_id)'),
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY не блокирует запись в таблицы, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, _ in DROPPED:
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        for name, definition in INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
+    op.execute('ANALYZE books')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _ in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+        for name, definition in DROPPED:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
@@ -0,0 +1,77 @@
+"""
+Тесты работают с настоящей базой PostgreSQL со схемой приложения
+(таблицы и app/schema/*.sql). Адрес берётся из TEST_DATABASE_URL, иначе
+из DATABASE_URL; если база недоступна, тесты пропускаются. Изменения
+данных каждого теста откатываются или удаляются самим тестом.
+
+    TEST_DATABASE_URL=postgresql://postgres@localhost/libraries_test python -m pytest -q
+"""
+import os
+import uuid
+
+import pytest
+
+if os.getenv('TEST_DATABASE_URL'):
+    os.environ['DATABASE_URL'] = os.environ['TEST_DATABASE_URL']
+
+from app import create_app, db
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        try:
+            db.session.execute('SELECT 1 FROM libraries LIMIT 1')
+        except Exception as e:
+            pytest.skip(f'База данных для тестов недоступна: {e}')
+        finally:
+            db.session.rollback()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def session(app):
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+
+
+@pytest.fixture
+def book_and_reader(app):
+    """Библиотека с одной книгой и читатель; удаляются после теста."""
+    with app.app_context():
+        name = f'test-delete-{uuid.uuid4().hex[:8]}'
+        library_id = db.session.execute(
+            'INSERT INTO libraries (name) VALUES (:name) RETURNING library_id', {'name': name}
+        ).scalar()
+        genre_id = db.session.execute(
+            'INSERT INTO genres (name) VALUES (:name) RETURNING genre_id', {'name': name}
+        ).scalar()
+        book_id = db.session.execute(
+            '''
+                INSERT INTO books (library_id, genre_id, author, title, quantity)
+                VALUES (:library_id, :genre_id, 'Автор', 'Книга', 1)
+                RETURNING book_id
+            ''',
+            {'library_id': library_id, 'genre_id': genre_id}
+        ).scalar()
+        reader_id = db.session.execute(
+            'INSERT INTO readers (full_name) VALUES (:name) RETURNING reader_id', {'name': name}
+        ).scalar()
+        db.session.commit()
+    yield library_id, book_id, reader_id
+    with app.app_context():
+        db.session.execute('DELETE FROM loans WHERE library_id = :id', {'id': library_id})
+        db.session.execute('DELETE FROM books WHERE library_id = :id', {'id': library_id})
+        db.session.execute('DELETE FROM readers WHERE reader_id = :id', {'id': reader_id})
+        db.session.execute('DELETE FROM book_id_counters WHERE library_id = :id', {'id': library_id})
+        db.session.execute('DELETE FROM libraries WHERE library_id = :id', {'id': library_id})
+        db.session.execute('DELETE FROM genres WHERE genre_id = :id', {'id': genre_id})
+        db.session.commit()
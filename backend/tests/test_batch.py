@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'data': 'operations', 'content_type': 'text/plain'},
+    {'data': '{not json', 'content_type': 'application/json'},
+    {'json': [{'op': 'delete', 'table': 'genres', 'key': {'genre_id': -1}}]},
+])
+def test_batch_rejects_invalid_body(client, kwargs):
+    response = client.post('/batch', **kwargs)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def run_batch(client, *operations, atomic=False):
+    response = client.post('/batch', json={'operations': list(operations), 'atomic': atomic})
+    return response, {result['index']: result for result in response.get_json()['results']}
+
+
+def open_loan(library_id, book_id, reader_id):
+    return {
+        'op': 'add', 'table': 'loans',
+        'values': {
+            'library_id': library_id, 'book_id': book_id, 'reader_id': reader_id,
+            'issue_date': '2026-01-10', 'due_date': '2026-01-24'
+        }
+    }
+
+
+def test_batch_grouped_edit_reports_missing_rows(client, book_and_reader):
+    library_id, book_id, reader_id = book_and_reader
+    response, results = run_batch(
+        client,
+        {'op': 'edit', 'table': 'readers', 'key': {'reader_id': reader_id}, 'values': {'phone': '123'}},
+        {'op': 'edit', 'table': 'readers', 'key': {'reader_id': -1}, 'values': {'phone': '456'}}
+    )
+    assert response.status_code == 200
+    assert results[0]['status'] == 'updated'
+    assert results[1]['status'] == 'not_found'
+
+
+def test_batch_add_then_blocked_and_missing_deletes(client, book_and_reader):
+    library_id, book_id, reader_id = book_and_reader
+    response, results = run_batch(
+        client,
+        open_loan(library_id, book_id, reader_id),
+        {'op': 'delete', 'table': 'readers', 'key': {'reader_id': reader_id}},
+        {'op': 'delete', 'table': 'readers', 'key': {'reader_id': -1}}
+    )
+    assert response.status_code == 200
+    assert results[0]['status'] == 'added'
+    assert results[0]['key']['reader_id'] == reader_id
+    assert results[1]['status'] == 'blocked'
+    assert 'активными абонементами' in results[1]['error']
+    assert results[2]['status'] == 'not_found'
+
+
+def test_batch_atomic_failure_rolls_back(client, book_and_reader):
+    library_id, book_id, reader_id = book_and_reader
+    response, results = run_batch(
+        client,
+        {'op': 'edit', 'table': 'readers', 'key': {'reader_id': reader_id}, 'values': {'phone': 'atomic'}},
+        {'op': 'delete', 'table': 'readers', 'key': {'reader_id': -1}},
+        atomic=True
+    )
+    assert response.status_code == 400
+    assert response.get_json()['committed'] is False
+    with client.application.app_context():
+        assert db.session.execute(
+            'SELECT phone FROM readers WHERE reader_id = :id', {'id': reader_id}
+        ).scalar() != 'atomic'
+        db.session.rollback()
+
+
+def test_batch_delete_racing_new_loan_is_blocked(app, client, book_and_reader):
+    library_id, book_id, reader_id = book_and_reader
+    responses = []
+
+    with app.app_context():
+        with db.engine.connect() as connection:
+            transaction = connection.begin()
+            # Абонемент ещё не зафиксирован: удаление ждёт блокировку читателя,
+            # а проверка его снимка абонемента не видит
+            connection.execute(
+                text('''
+                    INSERT INTO loans (library_id, book_id, reader_id, issue_date, due_date)
+                    VALUES (:library_id, :book_id, :reader_id, CURRENT_DATE, CURRENT_DATE + 14)
+                '''),
+                {'library_id': library_id, 'book_id': book_id, 'reader_id': reader_id}
+            )
+            worker = threading.Thread(target=lambda: responses.append(run_batch(
+                client, {'op': 'delete', 'table': 'readers', 'key': {'reader_id': reader_id}}
+            )))
+            worker.start()
+            time.sleep(0.5)
+            transaction.commit()
+            worker.join(10)
+
+    assert responses
+    response, results = responses[0]
+    assert response.status_code == 200
+    assert results[0]['status'] == 'blocked'
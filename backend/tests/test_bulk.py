@@ -0,0 +1,66 @@
+import io
+import uuid
+
+import pytest
+
+from app import db
+
+
+@pytest.fixture
+def library(app):
+    """Библиотека и жанр для загрузки книг; удаляются вместе с книгами после теста."""
+    with app.app_context():
+        name = f'test-bulk-{uuid.uuid4().hex[:8]}'
+        library_id = db.session.execute(
+            'INSERT INTO libraries (name) VALUES (:name) RETURNING library_id', {'name': name}
+        ).scalar()
+        genre_id = db.session.execute(
+            'INSERT INTO genres (name) VALUES (:name) RETURNING genre_id', {'name': name}
+        ).scalar()
+        db.session.commit()
+    yield library_id, genre_id
+    with app.app_context():
+        db.session.execute('DELETE FROM books WHERE library_id = :id', {'id': library_id})
+        db.session.execute('DELETE FROM book_id_counters WHERE library_id = :id', {'id': library_id})
+        db.session.execute('DELETE FROM libraries WHERE library_id = :id', {'id': library_id})
+        db.session.execute('DELETE FROM genres WHERE genre_id = :id', {'id': genre_id})
+        db.session.commit()
+
+
+def post_csv(client, table, content):
+    return client.post(
+        f'/bulk/{table}',
+        data={'file': (io.BytesIO(content.encode('utf-8')), f'{table}.csv')},
+        content_type='multipart/form-data'
+    )
+
+
+def test_bulk_books_csv(app, client, library):
+    library_id, genre_id = library
+    content = (
+        'library_id,genre_id,author,title,publisher,publication_place,publication_year,quantity\n'
+        f'{library_id},{genre_id},Толстой,Война и мир,,,1869,2\n'
+        f'{library_id},{genre_id},Чехов,Рассказы,,,1890,1\n'
+        f'{library_id},{genre_id},Чехов,Рассказы,,,1890,1\n'
+        f'{library_id},{genre_id},Гоголь,Нос,,,не год,1\n'
+        f'{library_id},{genre_id},Пушкин,Стихи,,,1830,-1\n'
+    )
+    response = post_csv(client, 'books', content)
+    assert response.status_code == 200, response.get_json()
+
+    report = response.get_json()
+    assert report['rows'] == 5
+    assert report['inserted'] == 2
+    assert [error['row'] for error in report['errors']] == [3, 4, 5]
+
+    with app.app_context():
+        book_ids = db.session.execute(
+            'SELECT book_id FROM books WHERE library_id = :id ORDER BY book_id', {'id': library_id}
+        ).scalars().all()
+        db.session.rollback()
+    assert book_ids == [1, 2]
+
+
+def test_bulk_bad_header(client):
+    response = post_csv(client, 'readers', 'name,phone\nИванов,123\n')
+    assert response.status_code == 400
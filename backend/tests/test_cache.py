@@ -0,0 +1,72 @@
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+
+
+@pytest.fixture
+def library_name(app):
+    name = f'test-cache-{uuid.uuid4().hex[:8]}'
+    yield name
+    with app.app_context():
+        db.session.execute('DELETE FROM libraries WHERE name = :name', {'name': name})
+        db.session.commit()
+
+
+def insert_library(app, name):
+    # Запись из другого воркера: своё соединение, без cache.invalidate() в этом процессе
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(text('INSERT INTO libraries (name) VALUES (:name)'), {'name': name})
+
+
+def names(response):
+    return {row['name'] for row in response.get_json()}
+
+
+def test_etag_never_labels_stale_cached_body(app, client, library_name):
+    client.get('/libraries')
+    cached = client.get('/libraries')
+    assert cached.headers['X-Cache'] == 'HIT'
+
+    insert_library(app, library_name)
+
+    fresh = client.get('/libraries', headers={'If-None-Match': cached.headers['ETag']})
+    assert fresh.status_code == 200
+    assert fresh.headers['X-Cache'] == 'MISS'
+    assert fresh.headers['ETag'] != cached.headers['ETag']
+    assert library_name in names(fresh)
+
+    revalidated = client.get('/libraries', headers={'If-None-Match': fresh.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_api_write_invalidates_cached_list(client, library_name):
+    client.get('/libraries')
+    assert client.get('/libraries').headers['X-Cache'] == 'HIT'
+
+    response = client.post('/add/library', json={'name': library_name, 'address': None})
+    assert response.status_code == 201
+
+    after = client.get('/libraries')
+    assert after.headers['X-Cache'] == 'MISS'
+    assert library_name in names(after)
+
+
+def test_write_in_another_worker_invalidates_memory_cache(app, client, library_name):
+    from app.cache import cache
+
+    if cache.backend.shared:
+        pytest.skip('Проверка для бэкенда в памяти процесса')
+    client.get('/libraries')
+    assert client.get('/libraries').headers['X-Cache'] == 'HIT'
+
+    # Поколения этого процесса не меняются, меняется версия таблицы в БД
+    generations = cache.backend.generations(['libraries'])
+    insert_library(app, library_name)
+    assert cache.backend.generations(['libraries']) == generations
+
+    after = client.get('/libraries')
+    assert after.headers['X-Cache'] == 'MISS'
+    assert library_name in names(after)
@@ -0,0 +1,74 @@
+import gzip
+
+import pytest
+
+from app.compression import compression
+
+
+@pytest.fixture
+def algorithms(monkeypatch):
+    """Порядок предпочтения без проверки установленных библиотек."""
+    monkeypatch.setattr(compression, 'algorithms', ['zstd', 'br', 'gzip'])
+    monkeypatch.setattr(compression, 'min_size', 10)
+
+
+def choose(app, accept_encoding):
+    with app.test_request_context(headers={'Accept-Encoding': accept_encoding}):
+        return compression.choose()
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip, br, zstd', 'zstd'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+    ('br;q=0.8, gzip;q=0.8', 'br'),
+    ('*', 'zstd'),
+    ('zstd;q=0, gzip', 'gzip'),
+    ('gzip;q=0', None),
+    ('identity', None),
+    ('', None),
+])
+def test_choose_respects_quality_and_preference(app, algorithms, accept_encoding, expected):
+    assert choose(app, accept_encoding) == expected
+
+
+def compress(app, accept_encoding, body=b'{"data": "' + b'x' * 100 + b'"}', status=200,
+             mimetype='application/json'):
+    with app.test_request_context(headers={'Accept-Encoding': accept_encoding}):
+        response = app.response_class(body, status=status, mimetype=mimetype)
+        return compression.after_request(response)
+
+
+def test_gzip_response_round_trips(app, algorithms):
+    response = compress(app, 'gzip')
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert gzip.decompress(response.get_data()) == b'{"data": "' + b'x' * 100 + b'"}'
+
+
+def test_identity_leaves_body_but_varies(app, algorithms):
+    response = compress(app, 'identity')
+
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.vary
+    assert response.get_data().startswith(b'{"data"')
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'body': b'{}'},
+    {'status': 404},
+    {'mimetype': 'image/png'},
+])
+def test_small_error_and_binary_responses_are_not_compressed(app, algorithms, kwargs):
+    response = compress(app, 'gzip', **kwargs)
+
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_endpoint_response_is_compressed(client, algorithms, monkeypatch):
+    monkeypatch.setattr(compression, 'algorithms', ['gzip'])
+    plain = client.get('/libraries?format=columns')
+    packed = client.get('/libraries?format=columns', headers={'Accept-Encoding': 'gzip'})
+
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(packed.get_data()) == plain.get_data()
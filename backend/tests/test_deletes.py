@@ -0,0 +1,33 @@
+import threading
+import time
+
+from sqlalchemy import text
+
+from app import db
+
+
+def test_delete_reader_racing_new_loan(app, client, book_and_reader):
+    library_id, book_id, reader_id = book_and_reader
+    responses = []
+
+    with app.app_context():
+        with db.engine.connect() as connection:
+            transaction = connection.begin()
+            # Абонемент ещё не зафиксирован: удаление ждёт блокировку читателя
+            connection.execute(
+                text('''
+                    INSERT INTO loans (library_id, book_id, reader_id, issue_date, due_date)
+                    VALUES (:library_id, :book_id, :reader_id, CURRENT_DATE, CURRENT_DATE + 14)
+                '''),
+                {'library_id': library_id, 'book_id': book_id, 'reader_id': reader_id}
+            )
+            worker = threading.Thread(
+                target=lambda: responses.append(client.delete(f'/delete/reader/{reader_id}'))
+            )
+            worker.start()
+            time.sleep(0.5)
+            transaction.commit()
+            worker.join(10)
+
+    assert responses and responses[0].status_code == 400
+    assert 'активными абонементами' in responses[0].get_json()['error']
@@ -0,0 +1,56 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.encoding import FastJSONProvider
+
+pytest.importorskip('orjson')
+
+
+def test_dumps_keeps_flask_wire_format(app):
+    body = app.json.dumps({
+        'b': Decimal('12.50'),
+        'a': date(2024, 3, 5),
+        'c': datetime(2024, 3, 5, 10, 30),
+        'name': 'Библиотека'
+    })
+
+    assert body == (
+        '{"a":"Tue, 05 Mar 2024 00:00:00 GMT",'
+        '"b":"12.50",'
+        '"c":"Tue, 05 Mar 2024 10:30:00 GMT",'
+        '"name":"Библиотека"}'
+    )
+
+
+def test_iso_dates_option(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'JSON_ISO_DATES', True)
+    provider = FastJSONProvider(app)
+
+    body = provider.dumps({'day': date(2024, 3, 5), 'at': datetime(2024, 3, 5, 10, 30)})
+
+    assert body == '{"at":"2024-03-05T10:30:00","day":"2024-03-05"}'
+
+
+def test_response_is_utf8_json(app):
+    with app.test_request_context():
+        response = app.json.response({'name': 'Чтение', 'id': 1})
+
+    assert response.mimetype == 'application/json'
+    assert response.get_data() == '{"id":1,"name":"Чтение"}\n'.encode('utf-8')
+
+
+def test_columns_format_shape(client):
+    rows = client.get('/libraries').get_json()
+    columns = client.get('/libraries?format=columns').get_json()
+
+    assert set(columns) == {'columns', 'rows'}
+    assert [dict(zip(columns['columns'], row)) for row in columns['rows']] == rows
+
+
+def test_paginated_columns_format_keeps_cursor(client):
+    page = client.get('/libraries?format=columns&limit=1').get_json()
+
+    assert set(page) == {'columns', 'rows', 'next_cursor'}
+    assert len(page['rows']) <= 1
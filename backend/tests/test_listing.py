@@ -0,0 +1,131 @@
+import uuid
+
+import pytest
+
+from app import db
+
+
+@pytest.fixture
+def libraries(app):
+    with app.app_context():
+        prefix = f'test-list-{uuid.uuid4().hex[:8]}'
+        ids = db.session.execute(
+            '''
+                INSERT INTO libraries (name)
+                SELECT :prefix || n FROM generate_series(1, 3) AS n
+                RETURNING library_id
+            ''',
+            {'prefix': prefix}
+        ).scalars().all()
+        db.session.commit()
+    yield ids
+    with app.app_context():
+        db.session.execute('DELETE FROM libraries WHERE library_id = ANY(:ids)', {'ids': ids})
+        db.session.commit()
+
+
+def test_cached_arrow_page_keeps_cursor(client, libraries):
+    pytest.importorskip('pyarrow')
+    url = '/libraries?format=arrow&limit=1'
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers['X-Cache'] == 'MISS'
+    assert first.headers.get('X-Next-Cursor')
+
+    second = client.get(url)
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.headers.get('X-Next-Cursor') == first.headers['X-Next-Cursor']
+
+
+def test_books_search_matches_index_expression():
+    # Индекс используется, только если выражение запроса совпадает с выражением индекса
+    from benchmarks.index_plans import load_indexes
+    from app.listing import search_expression
+    from app.routes.routes import BOOKS
+
+    indexes = dict(load_indexes())
+    definition = indexes['books_search_trgm_idx']
+    assert 'books_key_genre_idx' not in indexes
+    columns = [BOOKS.columns[field].split('.', 1)[1] for field in BOOKS.search]
+    assert f'(({search_expression(columns)}) gin_trgm_ops)' in definition
+
+
+def test_books_search_by_author(client, app):
+    with app.app_context():
+        author = db.session.execute('SELECT author FROM books WHERE author IS NOT NULL LIMIT 1').scalar()
+    if author is None:
+        pytest.skip('В базе нет книг')
+    response = client.get('/books', query_string={'q': author[1:-1], 'limit': 5})
+    assert response.status_code == 200
+    assert response.get_json()['data']
+
+
+def library_names(app, ids):
+    with app.app_context():
+        names = db.session.execute(
+            'SELECT name FROM libraries WHERE library_id = ANY(:ids) ORDER BY name', {'ids': ids}
+        ).scalars().all()
+        db.session.rollback()
+    return names
+
+
+@pytest.mark.parametrize('query', [
+    {'sort': 'password'},
+    {'sort': 'name;DROP TABLE libraries'},
+    {'filter[password]': 'x'},
+    {'format': 'xml'},
+    {'limit': 'ten'},
+    {'limit': '0'},
+    {'limit': '2', 'after': 'not-a-cursor'},
+])
+def test_list_rejects_unknown_fields_and_bad_arguments(client, query):
+    response = client.get('/libraries', query_string=query)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_list_filter_values_are_combined_with_in(app, client, libraries):
+    first, _, third = library_names(app, libraries)
+    # DataTable отправляет значения фильтра "a|b" повторением параметра
+    response = client.get('/libraries', query_string=[
+        ('filter[name]', first), ('filter[name]', third), ('sort', '-name')
+    ])
+    assert response.status_code == 200
+    assert [row['name'] for row in response.get_json()] == [third, first]
+
+
+def test_list_sort_ignores_empty_items_and_duplicates(app, client, libraries):
+    names = library_names(app, libraries)
+    response = client.get('/libraries', query_string=[
+        ('filter[library_id]', str(library_id)) for library_id in libraries
+    ] + [('sort', ' ,-name,,name,+library_id')])
+    assert response.status_code == 200
+    assert [row['name'] for row in response.get_json()] == names[::-1]
+
+
+def test_list_search_treats_wildcards_literally(app, client, libraries):
+    names = library_names(app, libraries)
+    prefix = names[0][:-1]
+    assert len(client.get('/libraries', query_string={'q': prefix}).get_json()) == 3
+    assert client.get('/libraries', query_string={'q': prefix.replace('-', '_')}).get_json() == []
+    assert client.get('/libraries', query_string={'q': prefix + '%'}).get_json() == []
+
+
+def test_distinct_values_apply_other_filters(app, client, libraries):
+    names = library_names(app, libraries)
+    query = [('filter[library_id]', str(library_id)) for library_id in libraries]
+    response = client.get('/distinct/libraries/name', query_string=query)
+    assert response.status_code == 200
+    assert response.get_json() == names
+
+    # Фильтр по самому полю не сужает его значения: в списке остаются варианты выбора
+    response = client.get('/distinct/libraries/name', query_string=query + [('filter[name]', names[0])])
+    assert response.get_json() == names
+
+
+@pytest.mark.parametrize('url', ['/distinct/libraries/password', '/distinct/passwords/name'])
+def test_distinct_rejects_unknown_columns(client, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,39 @@
+import pytest
+
+from app import db
+
+
+def test_libraries_lookup_is_id_label_pairs(client, book_and_reader):
+    library_id, _, _ = book_and_reader
+    with client.application.app_context():
+        name = db.session.execute(
+            'SELECT name FROM libraries WHERE library_id = :id', {'id': library_id}
+        ).scalar()
+
+    response = client.get('/lookup/libraries')
+
+    assert response.status_code == 200
+    pairs = response.get_json()
+    assert all(isinstance(pair, list) and len(pair) == 2 for pair in pairs)
+    assert [library_id, name] in pairs
+
+
+def test_books_lookup_is_scoped_to_library(client, book_and_reader):
+    library_id, book_id, _ = book_and_reader
+
+    response = client.get('/lookup/books', query_string={'library_id': library_id})
+
+    assert response.status_code == 200
+    assert response.get_json() == [[book_id, 'Книга']]
+
+
+@pytest.mark.parametrize('query_string', [{}, {'library_id': 'abc'}])
+def test_books_lookup_requires_library_id(client, query_string):
+    response = client.get('/lookup/books', query_string=query_string)
+
+    assert response.status_code == 400
+    assert 'library_id' in response.get_json()['error']
+
+
+def test_unknown_lookup_is_not_found(client):
+    assert client.get('/lookup/unknown').status_code == 404
@@ -0,0 +1,22 @@
+import pytest
+
+from app.metrics import metrics
+
+
+def response_bytes(endpoint, encoding):
+    for (name, labels), histogram in metrics._histograms.items():
+        labels = dict(labels)
+        if name == 'librariesdb_response_bytes' and labels['endpoint'] == endpoint \
+                and labels['encoding'] == encoding:
+            return histogram.sum
+    return 0
+
+
+def test_response_size_is_measured_before_compression(client):
+    plain = client.get('/books', query_string={'limit': 200})
+    if plain.content_length < 2048:
+        pytest.skip('Ответ слишком мал для сжатия')
+    before = response_bytes('main.get_books', 'gzip')
+    compressed = client.get('/books', query_string={'limit': 200}, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert response_bytes('main.get_books', 'gzip') - before == plain.content_length
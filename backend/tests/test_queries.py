@@ -0,0 +1,73 @@
+import pytest
+
+from app.queries import queries
+
+ANY_QUERY = '''
+    SELECT n FROM unnest(CAST(:values AS int[])) AS n
+    WHERE n = ANY(:wanted)
+    ORDER BY n
+'''
+
+
+@pytest.mark.parametrize('prepare', [True, False])
+def test_list_param_through_registry(session, prepare):
+    previous, queries.prepare = queries.prepare, prepare
+    try:
+        query = queries.variant('test_any', 'list', lambda: ANY_QUERY)
+        rows = query.execute({'values': [1, 2, 3, 4], 'wanted': [2, 4, 5]}).fetchall()
+    finally:
+        queries.prepare = previous
+    assert [row[0] for row in rows] == [2, 4]
+
+
+def test_table_versions_etag(client):
+    response = client.get('/genres')
+    assert response.status_code == 200
+    assert response.headers.get('ETag')
+
+    revalidated = client.get('/genres', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_concurrent_writers_do_not_share_version_row(app):
+    from sqlalchemy import text
+
+    from app import db
+    from app.versions import table_versions
+
+    bump = text('UPDATE genres SET name = name WHERE genre_id = -1')
+    with app.app_context():
+        before = table_versions(['genres'])[0]
+        db.session.rollback()
+        connections = [db.engine.connect()]
+        shard = lambda connection: connection.execute(text('SELECT pg_backend_pid() % 16')).scalar()
+        try:
+            # Второе соединение с другим шардом счётчика
+            while len({shard(connection) for connection in connections}) < 2:
+                connections.append(db.engine.connect())
+            first, second = connections[0], connections[-1]
+            with first.begin():
+                first.execute(bump)
+                with second.begin():
+                    # С одной строкой версии второй оператор ждал бы фиксации первого
+                    second.execute(text("SET LOCAL lock_timeout = '1s'"))
+                    second.execute(bump)
+        finally:
+            for connection in connections:
+                connection.close()
+        assert table_versions(['genres'])[0] == before + 2
+        db.session.rollback()
+
+
+def test_variant_names_are_stable_after_eviction():
+    from app.queries import QueryRegistry
+
+    registry = QueryRegistry()
+    registry.variant_limit = 1
+    first = registry.variant('test', 'a', lambda: 'SELECT 1')
+    registry.variant('test', 'b', lambda: 'SELECT 2')
+    # Вариант 'a' вытеснен и построен заново: имя (и метка метрик) то же
+    again = registry.variant('test', 'a', lambda: 'SELECT 1')
+    assert again is not first
+    assert again.name == first.name and again.ident == first.ident
+    assert registry.variant('test', 'c', lambda: 'SELECT 2').name != first.name
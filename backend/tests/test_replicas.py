@@ -0,0 +1,49 @@
+import time
+
+from app.replicas import Replica, ReplicaRouter
+
+
+def router(**state):
+    router = ReplicaRouter()
+    replica = Replica('replica_0', 'postgresql://replica')
+    replica.checked_at = time.monotonic()
+    replica.lag = 0
+    replica.replay_lsn = 100
+    for name, value in state.items():
+        setattr(replica, name, value)
+    router.replicas = [replica]
+    return router
+
+
+def test_choose_uses_last_check_only():
+    assert router().choose() == 'replica_0'
+    # Ещё не проверена или проверка устарела - на основную базу, без проверки в запросе
+    assert router(checked_at=None).choose() is None
+    assert router(checked_at=time.monotonic() - 60).choose() is None
+    assert router(healthy=False).choose() is None
+    assert router(lag=30).choose() is None
+
+
+def test_replica_behind_last_write_is_skipped():
+    behind = router()
+    behind.write_lsn = 200
+    assert behind.choose() is None
+    # Фоновая проверка запрошена раньше срока
+    assert behind._wakeup.is_set()
+
+
+def test_primary_behind_replica_url_is_not_used(app):
+    from collections import namedtuple
+
+    State = namedtuple('State', ['replay_lsn', 'lag'])
+    misconfigured = router()
+    replica = misconfigured.replicas[0]
+    with app.app_context():
+        misconfigured.update(replica, State(None, 0))
+    assert not replica.healthy
+    assert 'не является репликой' in replica.error
+    assert misconfigured.choose() is None
+
+    with app.app_context():
+        misconfigured.update(replica, State(150, 0))
+    assert misconfigured.choose() == 'replica_0'
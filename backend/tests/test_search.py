@@ -0,0 +1,71 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app.search import parse_search, search_page, suggestions, ts_query
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('', None),
+    ('   ', None),
+    ('!!! ... ?', None),
+    ("') | !(:*", None),
+    ('Толстой', 'толстой:*'),
+    ('  Война и мир', 'война & и & мир:*'),
+    ("O'Brien & co:*", 'o & brien & co:*'),
+    ('ТОМ 2', 'том & 2:*'),
+])
+def test_ts_query_sanitises_input(text, expected):
+    assert ts_query(text) == expected
+
+
+@pytest.mark.parametrize('q', ['', '!!!', '&|:*'])
+def test_search_without_words_returns_empty_page(client, q):
+    response = client.get('/search', query_string={'q': q})
+
+    assert response.status_code == 200
+    assert response.get_json() == {'data': [], 'next_offset': None}
+
+
+def test_autocomplete_without_words_returns_empty_list(client):
+    response = client.get('/search/autocomplete/books', query_string={'q': '...'})
+
+    assert response.status_code == 200
+    assert response.get_json() == []
+
+
+@pytest.mark.parametrize('args', [
+    {'types': 'books,unknown'},
+    {'offset': '-1'},
+])
+def test_search_rejects_bad_arguments(client, args):
+    response = client.get('/search', query_string={'q': 'мир', **args})
+
+    assert response.status_code == 400
+
+
+def test_parse_search_defaults(app):
+    text, types, scopes, limit, offset = parse_search(MultiDict({'q': 'мир', 'library_id': '3'}), app.config)
+
+    assert text == 'мир'
+    assert types == ('books', 'readers', 'topics')
+    assert scopes == {'library_id': 3}
+    assert (limit, offset) == (20, 0)
+
+
+def test_search_page_reports_next_offset():
+    hits = [{'label': str(n)} for n in range(3)]
+
+    assert search_page(hits, 2, 4) == {'data': hits[:2], 'next_offset': 6}
+    assert search_page(hits[:2], 2, 4) == {'data': hits[:2], 'next_offset': None}
+
+
+def test_book_suggestions_shape():
+    hits = [
+        {'key': {'library_id': 1, 'book_id': 7}, 'label': 'Мир', 'detail': 'Автор'},
+        {'key': {'library_id': 1, 'book_id': 8}, 'label': 'Война', 'detail': None},
+    ]
+
+    assert suggestions('books', hits) == [
+        {'id': 7, 'library_id': 1, 'label': 'Мир — Автор'},
+        {'id': 8, 'library_id': 1, 'label': 'Война'},
+    ]
@@ -1,16 +1,28 @@
 import React, { useState, useEffect } from 'react';
 import { Form, Dropdown } from 'react-bootstrap';
 
-const ColumnFilter = ({ column, value, onChange, onClear, data }) => {
+const ColumnFilter = ({ table, column, value, onChange, onClear, filterParams }) => {
     const [isOpen, setIsOpen] = useState(false);
     const [uniqueValues, setUniqueValues] = useState([]);
     const [selectedValues, setSelectedValues] = useState(new Set());
+    const query = filterParams.toString();
 
     useEffect(() => {
-        // Получаем уникальные значения для столбца
-        const values = new Set(data.map(row => row[column]?.toString() || '').filter(Boolean));
-        setUniqueValues([...values].sort());
-    }, [data, column]);
+        if (!isOpen) return;
+        // Уникальные значения столбца запрашиваются у сервера с учётом остальных фильтров
+        const fetchValues = async () => {
+            try {
+                const response = await fetch(
+                    `http://localhost:5000/distinct/${table}/${column}?${query}`
+                );
+                if (!response.ok) throw new Error('Failed to fetch filter values');
+                setUniqueValues(await response.json());
+            } catch (err) {
+                setUniqueValues([]);
+            }
+        };
+        fetchValues();
+    }, [isOpen, table, column, query]);
 
     useEffect(() => {
         // Синхронизируем внешнее значение фильтра с внутренним состоянием
@@ -6,6 +6,8 @@ import EditDataForm from './EditDataForm';
 import ColumnFilter from './ColumnFilter';
 import ReportForm from './ReportForm';
 
+const PAGE_SIZE = 100;
+
 const DataTable = () => {
     const [data, setData] = useState([]);
     const [activeTable, setActiveTable] = useState('books');
@@ -22,7 +24,7 @@ const DataTable = () => {
     const [deleteType, setDeleteType] = useState(null);
     const [selectedId, setSelectedId] = useState(null);
     const [searchTerm, setSearchTerm] = useState('');
-    const [filteredData, setFilteredData] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [showDeleteByNameConfirm, setShowDeleteByNameConfirm] = useState(false);
     const [readerNameToDelete, setReaderNameToDelete] = useState('');
     const [deleteId, setDeleteId] = useState('');
@@ -91,33 +93,10 @@ const DataTable = () => {
     };
 
     useEffect(() => {
-        fetchData(activeTable);
-    }, [activeTable]);
-
-    useEffect(() => {
-        if (data.length > 0) {
-            let filtered = data;
-
-            if (searchTerm) {
-                filtered = filtered.filter(row => 
-                    Object.values(row).some(value => 
-                        value?.toString().toLowerCase().includes(searchTerm.toLowerCase())
-                    )
-                );
-            }
-
-            Object.entries(columnFilters).forEach(([column, filterValue]) => {
-                if (filterValue) {
-                    const selectedValues = new Set(filterValue.split('|'));
-                    filtered = filtered.filter(row => 
-                        selectedValues.has(row[column]?.toString() || '')
-                    );
-                }
-            });
-
-            setFilteredData(filtered);
-        }
-    }, [searchTerm, data, columnFilters, activeTable]);
+        // Фильтрация и сортировка выполняются на сервере, поиск ждёт паузы в вводе
+        const timeout = setTimeout(() => fetchData(activeTable), searchTerm ? 300 : 0);
+        return () => clearTimeout(timeout);
+    }, [activeTable, sortConfig, columnFilters, searchTerm]);
 
     useEffect(() => {
         const handleResize = () => {
@@ -136,22 +115,54 @@ const DataTable = () => {
         }
     }, [formType]);
 
-    const fetchData = async (table) => {
+    const buildFilterParams = (exceptColumn = null) => {
+        const params = new URLSearchParams();
+        if (searchTerm) {
+            params.append('q', searchTerm);
+        }
+        Object.entries(columnFilters).forEach(([column, filterValue]) => {
+            if (filterValue && column !== exceptColumn) {
+                filterValue.split('|').forEach(value => params.append(`filter[${column}]`, value));
+            }
+        });
+        return params;
+    };
+
+    const fetchData = async (table, cursor = null) => {
         setLoading(true);
         try {
-            const response = await fetch(`http://localhost:5000/${table}`);
+            const params = buildFilterParams();
+            params.append('limit', PAGE_SIZE);
+            if (cursor) {
+                params.append('after', cursor);
+            }
+            if (sortConfig.length > 0) {
+                params.append('sort', sortConfig
+                    .map(({ field, direction }) => (direction === 'desc' ? '-' : '') + field)
+                    .join(','));
+            }
+
+            const response = await fetch(`http://localhost:5000/${table}?${params}`);
             if (!response.ok) throw new Error('Network response was not ok');
             const result = await response.json();
-            setData(result);
+            setData(prev => cursor ? [...prev, ...result.data] : result.data);
+            setNextCursor(result.next_cursor);
             setError(null);
         } catch (err) {
             setError(err.message);
             setData([]);
+            setNextCursor(null);
         } finally {
             setLoading(false);
         }
     };
 
+    const switchTable = (table) => {
+        setActiveTable(table);
+        setSortConfig([]);
+        setColumnFilters({});
+    };
+
     const handleSort = (field, event) => {
         const newSortConfig = [...sortConfig];
         const existingSort = newSortConfig.find(sort => sort.field === field);
@@ -177,34 +188,6 @@ const DataTable = () => {
         }
         
         setSortConfig(newSortConfig);
-        
-        // Применяем сортировку
-        const sortedData = [...data].sort((a, b) => {
-            for (const sort of newSortConfig) {
-                const { field, direction } = sort;
-                let aVal = a[field];
-                let bVal = b[field];
-
-                // Приведение типов
-                if (!isNaN(aVal) && !isNaN(bVal)) {
-                    aVal = Number(aVal);
-                    bVal = Number(bVal);
-                } else if (field.includes('date')) {
-                    aVal = new Date(aVal);
-                    bVal = new Date(bVal);
-                }
-
-                // Сравнение
-                if (aVal !== bVal) {
-                    return direction === 'asc' 
-                        ? (aVal < bVal ? -1 : 1)
-                        : (aVal > bVal ? -1 : 1);
-                }
-            }
-            return 0;
-        });
-
-        setData(sortedData);
     };
 
     const handleResizeStart = (e, key) => {
@@ -302,6 +285,20 @@ const DataTable = () => {
             ];
         }
         
+        if (activeTable === 'book-genres-count') {
+            return [
+                'genre_name',
+                'book_count'
+            ];
+        }
+
+        if (activeTable === 'library-books-quantity') {
+            return [
+                'library_name',
+                'total_books'
+            ];
+        }
+
         if (activeTable === 'readers-with-loans') {
             return [
                 'reader_name',
@@ -442,11 +439,12 @@ const DataTable = () => {
                                 })}
                             </div>
                             <ColumnFilter
+                                table={activeTable}
                                 column={key}
                                 value={columnFilters[key]}
                                 onChange={(value) => handleFilterChange(key, value)}
                                 onClear={() => clearFilter(key)}
-                                data={data}
+                                filterParams={buildFilterParams(key)}
                             />
                             <div
                                 className="resize-handle"
@@ -465,7 +463,7 @@ const DataTable = () => {
     const renderTableBody = () => {
         return (
             <tbody>
-                {filteredData.map((row, index) => (
+                {data.map((row, index) => (
                     <tr key={index}>
                         {getOrderedColumns(data).map((key) => (
                             <td 
@@ -562,7 +560,6 @@ const DataTable = () => {
         setDeleteType(type);
         if (type === 'loan') {
             fetchLibraries();
-            fetchBooks();
             fetchReaders();
         }
         setShowDeleteByIdConfirm(true);
@@ -603,7 +600,7 @@ const DataTable = () => {
 
     const fetchLibraries = async () => {
         try {
-            const response = await fetch('http://localhost:5000/libraries');
+            const response = await fetch('http://localhost:5000/lookup/libraries');
             if (!response.ok) throw new Error('Failed to fetch libraries');
             const data = await response.json();
             setLibraries(data);
@@ -612,9 +609,9 @@ const DataTable = () => {
         }
     };
 
-    const fetchBooks = async () => {
+    const fetchBooks = async (libraryId) => {
         try {
-            const response = await fetch('http://localhost:5000/books');
+            const response = await fetch(`http://localhost:5000/lookup/books?library_id=${libraryId}`);
             if (!response.ok) throw new Error('Failed to fetch books');
             const data = await response.json();
             setBooks(data);
@@ -625,7 +622,7 @@ const DataTable = () => {
 
     const fetchReaders = async () => {
         try {
-            const response = await fetch('http://localhost:5000/readers');
+            const response = await fetch('http://localhost:5000/lookup/readers');
             if (!response.ok) throw new Error('Failed to fetch readers');
             const data = await response.json();
             setReaders(data);
@@ -672,7 +669,7 @@ const DataTable = () => {
                         <Nav.Item key={table}>
                             <Nav.Link 
                                 active={activeTable === table}
-                                onClick={() => setActiveTable(table)}
+                                onClick={() => switchTable(table)}
                                 className="px-2 px-sm-3"
                             >
                                 {getDisplayName(table)}
@@ -769,7 +766,7 @@ const DataTable = () => {
                         <div className="mb-2">
                             {searchTerm && (
                                 <small className="text-muted">
-                                    Найдено результатов: {filteredData.length}
+                                    Найдено результатов: {data.length}{nextCursor ? '+' : ''}
                                 </small>
                             )}
                         </div>
@@ -779,6 +776,14 @@ const DataTable = () => {
                                 {renderTableBody()}
                             </Table>
                         </div>
+                        {nextCursor && (
+                            <Button
+                                variant="outline-primary"
+                                onClick={() => fetchData(activeTable, nextCursor)}
+                            >
+                                Загрузить ещё
+                            </Button>
+                        )}
                     </>
                 )}
 
@@ -841,13 +846,18 @@ const DataTable = () => {
                                 <Form.Group className="mb-3">
                                     <Form.Label>Библиотека</Form.Label>
                                     <Form.Select 
-                                        onChange={(e) => setSelectedLoanLibrary(e.target.value)}
+                                        onChange={(e) => {
+                                            setSelectedLoanLibrary(e.target.value);
+                                            setSelectedLoanBook(null);
+                                            setBooks([]);
+                                            if (e.target.value) fetchBooks(e.target.value);
+                                        }}
                                         value={selectedLoanLibrary || ''}
                                     >
                                         <option value="">Выберите библиотеку</option>
-                                        {libraries.map(lib => (
-                                            <option key={lib.library_id} value={lib.library_id}>
-                                                {lib.name}
+                                        {libraries.map(([id, name]) => (
+                                            <option key={id} value={id}>
+                                                {name}
                                             </option>
                                         ))}
                                     </Form.Select>
@@ -861,9 +871,9 @@ const DataTable = () => {
                                         disabled={!selectedLoanLibrary}
                                     >
                                         <option value="">Выберите книгу</option>
-                                        {books.filter(book => book.library_id === parseInt(selectedLoanLibrary)).map(book => (
-                                            <option key={book.book_id} value={book.book_id}>
-                                                {book.title}
+                                        {books.map(([id, title]) => (
+                                            <option key={id} value={id}>
+                                                {title}
                                             </option>
                                         ))}
                                     </Form.Select>
@@ -877,9 +887,9 @@ const DataTable = () => {
                                         disabled={!selectedLoanBook}
                                     >
                                         <option value="">Выберите читателя</option>
-                                        {readers.map(reader => (
-                                            <option key={reader.reader_id} value={reader.reader_id}>
-                                                {reader.full_name}
+                                        {readers.map(([id, fullName]) => (
+                                            <option key={id} value={id}>
+                                                {fullName}
                                             </option>
                                         ))}
                                     </Form.Select>